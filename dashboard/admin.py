@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
-from .models import Faculty, Department, Subject, Student, Result, FacultySelection, COPO
+from .models import Faculty, Department, Subject, Student, Result, ResultSummary, GradeCutoff, StudentGPA, FacultySelection, COPO, ResultUploadJob
 
 
 # Custom User Admin to show Faculty info
@@ -53,9 +53,10 @@ class StudentAdmin(admin.ModelAdmin):
 
 @admin.register(Result)
 class ResultAdmin(admin.ModelAdmin):
-    list_display = ('student', 'subject', 'marks_obtained', 'total_marks', 'status', 'exam_type', 'semester')
-    list_filter = ('subject', 'exam_type', 'semester', 'marks_obtained')
+    list_display = ('student', 'subject', 'marks_obtained', 'total_marks', 'status', 'grade', 'exam_type', 'semester', 'term')
+    list_filter = ('subject', 'exam_type', 'semester', 'term', 'marks_obtained')
     search_fields = ('student__roll_number', 'student__name', 'subject__name')
+    readonly_fields = ('grade',)
     ordering = ('-created_at',)
 
 
@@ -75,7 +76,40 @@ class COPOAdmin(admin.ModelAdmin):
     ordering = ('subject', 'co_number')
 
 
+@admin.register(ResultUploadJob)
+class ResultUploadJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'filename', 'faculty', 'status', 'mode', 'rows_processed', 'error_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'mode')
+    search_fields = ('filename', 'faculty__user__username', 'faculty__employee_id')
+    readonly_fields = ('worker', 'rows_processed', 'created_count', 'updated_count', 'error_count', 'errors', 'summary', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(ResultSummary)
+class ResultSummaryAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'exam_type', 'semester', 'count', 'pass_count', 'min_marks', 'max_marks', 'updated_at')
+    list_filter = ('exam_type', 'semester')
+    search_fields = ('subject__code', 'subject__name')
+    readonly_fields = ('count', 'marks_sum', 'marks_sq_sum', 'pass_count', 'min_marks', 'max_marks', 'histogram', 'updated_at')
+
+
+
+@admin.register(GradeCutoff)
+class GradeCutoffAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'exam_type', 'semester', 'method', 'mean', 'std_dev', 'computed_at')
+    list_filter = ('method', 'exam_type', 'semester')
+    search_fields = ('subject__code', 'subject__name')
+    readonly_fields = ('method', 'cutoffs', 'grade_counts', 'mean', 'std_dev', 'summary_updated_at', 'computed_at')
+
+
+@admin.register(StudentGPA)
+class StudentGPAAdmin(admin.ModelAdmin):
+    list_display = ('student', 'semester', 'credits', 'sgpa', 'cumulative_credits', 'cgpa', 'computed_at')
+    list_filter = ('semester', 'student__department', 'student__year', 'student__scheme')
+    search_fields = ('student__roll_number', 'student__name')
+    readonly_fields = ('credits', 'credit_points', 'sgpa', 'cumulative_credits', 'cgpa', 'computed_at')
+
 # Customize admin site
 admin.site.site_header = "Faculty Portal Administration"
 admin.site.site_title = "Faculty Portal Admin"
-admin.site.index_title = "Welcome to Faculty Portal Administration"
\ No newline at end of file
+admin.site.index_title = "Welcome to Faculty Portal Administration"
@@ -0,0 +1,194 @@
+"""
+Aggregate queries behind the results analytics API.
+
+Per-course statistics are read from ``ResultSummary``, which holds running
+totals per subject, exam type and semester, so a dashboard load costs one
+query over O(subjects) rows rather than a scan of every result. The overall
+totals are folded from the per-course rows in Python.
+"""
+import hashlib
+import math
+
+from django.db.models import Case, CharField, Count, ExpressionWrapper, F, FloatField, Max, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+from .models import Result, ResultSummary
+
+
+def _pct(part, whole):
+    return round((part / whole) * 100, 2) if whole > 0 else 0
+
+
+def _std_dev(total, marks_sum, marks_sq_sum):
+    if not total:
+        return 0
+    mean = marks_sum / total
+    return round(math.sqrt(max(marks_sq_sum / total - mean * mean, 0)), 2)
+
+
+def course_breakdown(subjects):
+    """Per-subject totals, pass/fail counts, average, spread, min and max marks."""
+    courses = {}
+    for row in (
+        ResultSummary.objects.filter(subject__in=subjects)
+        .values('subject_id', 'subject__code', 'subject__name', 'count', 'marks_sum',
+                'marks_sq_sum', 'pass_count', 'min_marks', 'max_marks')
+        .order_by('subject__code', 'subject_id')
+    ):
+        # One subject can have several exam types and semesters
+        course = courses.setdefault(row['subject_id'], {
+            'subject_id': row['subject_id'],
+            'course_code': row['subject__code'],
+            'course_name': row['subject__name'],
+            'total_students': 0,
+            'pass_count': 0,
+            'marks_sum': 0,
+            'marks_sq_sum': 0,
+            'highest_marks': row['max_marks'],
+            'lowest_marks': row['min_marks'],
+        })
+        course['total_students'] += row['count']
+        course['pass_count'] += row['pass_count']
+        course['marks_sum'] += row['marks_sum']
+        course['marks_sq_sum'] += row['marks_sq_sum']
+        course['highest_marks'] = max(course['highest_marks'], row['max_marks'])
+        course['lowest_marks'] = min(course['lowest_marks'], row['min_marks'])
+
+    breakdown = list(courses.values())
+    for course in breakdown:
+        total = course['total_students']
+        course['average_marks'] = round(course['marks_sum'] / total, 2) if total else 0
+        course['std_dev'] = _std_dev(total, course['marks_sum'], course['marks_sq_sum'])
+        course['fail_count'] = total - course['pass_count']
+        course['pass_percentage'] = _pct(course['pass_count'], total)
+    return breakdown
+
+
+def overall_summary(breakdown):
+    """Fold per-course rows into the department/subject-wide totals."""
+    total = sum(course['total_students'] for course in breakdown)
+    passed = sum(course['pass_count'] for course in breakdown)
+    marks_sum = sum(course['marks_sum'] for course in breakdown)
+    marks_sq_sum = sum(course['marks_sq_sum'] for course in breakdown)
+    return {
+        'total_students': total,
+        'pass_count': passed,
+        'fail_count': total - passed,
+        'average_marks': round(marks_sum / total, 2) if total else 0,
+        'std_dev': _std_dev(total, marks_sum, marks_sq_sum),
+        'highest_marks': max((c['highest_marks'] for c in breakdown), default=0),
+        'lowest_marks': min((c['lowest_marks'] for c in breakdown), default=0),
+        'pass_percentage': _pct(passed, total),
+    }
+
+
+def results_analytics(subjects):
+    """Summary plus ``per_course_breakdown`` for a Subject queryset, in one query."""
+    breakdown = course_breakdown(subjects)
+    summary = overall_summary(breakdown)
+    for course in breakdown:
+        del course['marks_sum']
+        del course['marks_sq_sum']
+    summary['per_course_breakdown'] = breakdown
+    return summary
+
+
+def results_validator(subjects, scope):
+    """
+    Return ``(etag, last_modified)`` for the results of ``subjects``.
+
+    Read from the subjects' summaries rather than from ``Result``: every
+    insert, update and delete of a result goes through a ``SummaryDelta``,
+    which changes the count or touches ``updated_at`` of its summary. One
+    grouped query over the subject and summary tables gives each subject's
+    result count and latest change. The subject fields the responses show
+    or scope by are part of the digest, and the subject's ``updated_at``
+    counts towards ``last_modified``, so renaming a subject or moving it to
+    another faculty or department invalidates the validator too. ``scope``
+    names what the request covers (the URL does not say, the session does)
+    so two scopes never share a validator.
+    """
+    rows = list(
+        subjects.order_by('id')
+        .annotate(results=Sum('resultsummary__count'), results_modified=Max('resultsummary__updated_at'))
+        .values_list(
+            'id', 'code', 'name', 'year', 'scheme', 'credits', 'department_id', 'faculty_id',
+            'results', 'results_modified', 'updated_at',
+        )
+    )
+    stamps = [stamp for row in rows for stamp in row[-2:] if stamp is not None]
+    last_modified = max(stamps) if stamps else None
+    digest = hashlib.sha1(repr(rows).encode()).hexdigest()[:20]
+    return f'results-{scope}-{digest}', last_modified
+
+
+# Sort keys accepted by the student results list; each ends in the primary
+# key so keyset pagination has a total order.
+STUDENT_RESULT_SORTS = {
+    'roll_no': ['student__roll_number', 'id'],
+    'course': ['subject__code', 'student__roll_number', 'id'],
+    'marks': ['marks_obtained', 'id'],
+}
+# (response key, queryset field) pairs of a student list row; status and
+# percentage come from ``annotate_outcome``
+STUDENT_RESULT_COLUMNS = [
+    ('id', 'id'),
+    ('roll_no', 'student__roll_number'),
+    ('name', 'student__name'),
+    ('course_code', 'subject__code'),
+    ('course_name', 'subject__name'),
+    ('marks', 'marks_obtained'),
+    ('status', 'result_status'),
+    ('percentage', 'result_percentage'),
+    ('grade', 'grade'),
+]
+STUDENT_RESULT_FIELDS = [field for _, field in STUDENT_RESULT_COLUMNS]
+
+
+def annotate_outcome(results):
+    """
+    Add ``result_status`` (Pass/Fail) and ``result_percentage`` computed by the
+    database, named so they do not clash with the ``Result`` properties.
+    """
+    percentage = ExpressionWrapper(
+        F('marks_obtained') * 100.0 / NullIf(F('total_marks'), 0), output_field=FloatField()
+    )
+    return results.annotate(
+        # ROUND needs numeric input on PostgreSQL; cast back so rows hold floats
+        result_percentage=Coalesce(Cast(Round(percentage, 2), FloatField()), Value(0.0)),
+        result_status=Case(
+            When(marks_obtained__gte=Result.PASS_MARKS, then=Value('Pass')),
+            default=Value('Fail'),
+            output_field=CharField(),
+        ),
+    )
+
+
+def filter_student_results(results, status=None, course_code=None, min_marks=None,
+                           max_marks=None, roll_prefix=None):
+    """Narrow a Result queryset by the student list's filter parameters."""
+    if status == 'pass':
+        results = results.filter(marks_obtained__gte=Result.PASS_MARKS)
+    elif status == 'fail':
+        results = results.filter(marks_obtained__lt=Result.PASS_MARKS)
+    if course_code:
+        results = results.filter(subject__code__iexact=course_code)
+    if min_marks is not None:
+        results = results.filter(marks_obtained__gte=min_marks)
+    if max_marks is not None:
+        results = results.filter(marks_obtained__lte=max_marks)
+    if roll_prefix:
+        results = results.filter(student__roll_number__istartswith=roll_prefix)
+    return results
+
+
+def student_result_row(row):
+    """Response dict for a ``values(*STUDENT_RESULT_FIELDS)`` row."""
+    return {key: row[field] for key, field in STUDENT_RESULT_COLUMNS}
+
+
+def student_result_rows(results):
+    """Lazily yield response dicts from a ``values_list(*STUDENT_RESULT_FIELDS)`` query."""
+    keys = [key for key, _ in STUDENT_RESULT_COLUMNS]
+    for row in results:
+        yield dict(zip(keys, row))
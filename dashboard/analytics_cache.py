@@ -0,0 +1,117 @@
+"""
+Versioned cache for the results analytics payload.
+
+Every subject has a data version in the cache that is bumped after any
+transaction that changes its results commits (see ``SummaryDelta.apply``).
+Payloads are cached under the faculty, the selected subject and a digest of
+the versions of the subjects in scope, so a write makes the old entries
+unreachable instead of having to find and delete them. Unknown versions are
+seeded with a timestamp rather than zero, so an evicted version can never
+collide with one that was used before.
+
+While reads go to a replica, payloads computed within
+``DATABASE_REPLICA_LAG`` seconds of a write are served but not stored, as
+the replica may not have caught up with the bumped version yet.
+
+The key also holds the validator of the results in scope (their count and
+latest change, read from their summaries), so a write committed by an
+upload worker in another process changes the key even when that process
+bumped the versions in its own local-memory cache.
+
+Hit and miss counters live in the same cache. With the local-memory backend
+both versions and counters are per process; use the file-based cache when
+upload workers run separately from the web server, so writes that leave the
+validator alone (``QuerySet.update()`` of grades, summary rebuilds) reach
+the web server too.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .routers import reading_replica
+
+VERSION_KEY = 'dashboard:results-version:{}'
+GENERATION_KEY = 'dashboard:results-version:all'
+WRITTEN_KEY = 'dashboard:results-version:written-at'
+PAYLOAD_KEY = 'dashboard:analytics:{faculty}:{scope}:{digest}'
+HITS_KEY = 'dashboard:analytics-cache:hits'
+MISSES_KEY = 'dashboard:analytics-cache:misses'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_versions(subject_ids):
+    """Invalidate the cached analytics of every scope containing these subjects."""
+    for subject_id in set(subject_ids):
+        _bump(VERSION_KEY.format(subject_id))
+    cache.set(WRITTEN_KEY, time.time(), None)
+
+
+def bump_all():
+    """Invalidate every cached analytics payload."""
+    _bump(GENERATION_KEY)
+    cache.set(WRITTEN_KEY, time.time(), None)
+
+
+def _versions(subject_ids):
+    keys = [VERSION_KEY.format(subject_id) for subject_id in subject_ids] + [GENERATION_KEY]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def cached_analytics(faculty, selected_subject_id, subject_ids, validator, compute):
+    """
+    Return ``(payload, hit)``, calling ``compute()`` only on a miss.
+
+    ``subject_ids`` are the subjects in scope; their versions and
+    ``validator``, the ETag of their results, form the key.
+    """
+    subject_ids = sorted(set(subject_ids))
+    *versions, generation = _versions(subject_ids)
+    digest = hashlib.sha1(f'{validator};{generation};'.encode())
+    for subject_id, version in zip(subject_ids, versions):
+        digest.update(f'{subject_id}:{version};'.encode())
+    key = PAYLOAD_KEY.format(
+        faculty=faculty.pk, scope=selected_subject_id or 'all', digest=digest.hexdigest()
+    )
+
+    payload = cache.get(key)
+    if payload is not None:
+        _incr(HITS_KEY)
+        return payload, True
+
+    payload = compute()
+    if not reading_replica() or time.time() - cache.get(WRITTEN_KEY, 0) >= settings.DATABASE_REPLICA_LAG:
+        cache.set(key, payload, settings.ANALYTICS_CACHE_TIMEOUT)
+    _incr(MISSES_KEY)
+    return payload, False
+
+
+def cache_stats():
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0,
+        'backend': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+    }
@@ -0,0 +1,31 @@
+"""
+Usage counters of the psycopg connection pools (``DB_POOL``).
+
+Every process has its own pools, so the numbers describe the process that
+serves the request. ``utilisation`` is the share of ``max_size`` checked
+out right now; ``avg_wait_ms`` is the mean wait of the requests that found
+no free connection. A steadily growing ``requests_queued`` or a high
+utilisation calls for a larger ``DB_POOL_MAX_SIZE``; ``requests_errors``
+counts requests that timed out after ``DB_POOL_TIMEOUT``.
+"""
+from django.db import connections
+
+
+def pool_stats():
+    """``{alias: stats}`` of every database with an open connection pool."""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        # Pools open on the first query; until then their sizes mean nothing
+        if pool is None or pool.closed:
+            continue
+        counters = pool.get_stats()
+        in_use = counters['pool_size'] - counters['pool_available']
+        queued = counters.get('requests_queued', 0)
+        stats[alias] = {
+            **counters,
+            'in_use': in_use,
+            'utilisation': round(in_use / counters['pool_max'], 4) if counters['pool_max'] else 0,
+            'avg_wait_ms': round(counters.get('requests_wait_ms', 0) / queued, 1) if queued else 0,
+        }
+    return stats
@@ -0,0 +1,196 @@
+"""
+Marks distribution: histogram buckets, quartiles, median, standard deviation
+and the top and bottom decile per subject and for the whole scope.
+
+On PostgreSQL everything is computed by the database in two grouped queries:
+``percentile_cont`` for the quantiles and ``width_bucket`` for the histogram,
+with ``GROUPING SETS`` adding the scope-wide row. Other backends read the
+per-mark histograms kept in ``ResultSummary`` and derive the same figures
+with vectorised NumPy, so no backend walks the result rows in Python.
+
+Quantiles use linear interpolation between ranks, which is what
+``percentile_cont`` does, so both paths agree.
+"""
+import math
+
+import numpy as np
+
+from .models import Result, ResultSummary
+from .routers import read_connection
+from .summaries import HISTOGRAM_BINS
+
+QUANTILES = {
+    'bottom_decile': 0.1,
+    'q1': 0.25,
+    'median': 0.5,
+    'q3': 0.75,
+    'top_decile': 0.9,
+}
+MAX_MARKS = HISTOGRAM_BINS - 1
+DEFAULT_BUCKETS = 10
+
+
+def bucket_edges(buckets):
+    """Inclusive whole-mark ``(low, high)`` ranges matching ``width_bucket(m, 0, 100, n)``."""
+    edges = []
+    for i in range(buckets):
+        low = math.ceil(MAX_MARKS * i / buckets)
+        high = math.ceil(MAX_MARKS * (i + 1) / buckets) - 1
+        edges.append((low, MAX_MARKS if i == buckets - 1 else high))
+    return edges
+
+
+def _empty_stats(buckets):
+    stats = {'count': 0, 'mean': None, 'std_dev': None, 'min': None, 'max': None}
+    stats.update({name: None for name in QUANTILES})
+    stats['histogram'] = [0] * buckets
+    return stats
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def distribution(subjects, buckets=DEFAULT_BUCKETS, exam_type=None, semester=None):
+    """
+    Distribution of the marks of ``subjects``.
+
+    Returns ``{'buckets', 'overall', 'subjects', 'backend'}`` where every stats
+    dict holds count, mean, std_dev, min, max, the ``QUANTILES`` and a
+    ``histogram`` list with one count per bucket.
+    """
+    subjects = {s['id']: s for s in subjects.values('id', 'code', 'name')}
+    if not subjects:
+        backend = None
+        per_subject, overall = {}, None
+    elif read_connection(Result).vendor == 'postgresql':
+        backend = 'postgresql'
+        per_subject, overall = _postgres_distribution(list(subjects), buckets, exam_type, semester)
+    else:
+        backend = 'numpy'
+        per_subject, overall = _histogram_distribution(list(subjects), buckets, exam_type, semester)
+
+    return {
+        'buckets': [{'label': f'{low}-{high}', 'low': low, 'high': high} for low, high in bucket_edges(buckets)],
+        'overall': overall or _empty_stats(buckets),
+        'subjects': [
+            {'subject_id': subject_id, 'course_code': subjects[subject_id]['code'],
+             'course_name': subjects[subject_id]['name'], **stats}
+            for subject_id, stats in sorted(per_subject.items(), key=lambda item: subjects[item[0]]['code'])
+        ],
+        'backend': backend,
+    }
+
+
+def _postgres_distribution(subject_ids, buckets, exam_type, semester):
+    connection = read_connection(Result)
+    table = connection.ops.quote_name(Result._meta.db_table)
+    where = ['subject_id = ANY(%s)']
+    params = [subject_ids]
+    # Unknown labels have no code and match nothing
+    if exam_type:
+        where.append('exam_type = %s')
+        params.append(Result._meta.get_field('exam_type').code_of(exam_type))
+    if semester:
+        where.append('semester = %s')
+        params.append(Result._meta.get_field('semester').code_of(semester))
+    where = ' AND '.join(where)
+    fractions = list(QUANTILES.values())
+
+    stats = {}
+    with connection.cursor() as cursor:
+        # GROUPING(subject_id) is 1 on the scope-wide row of the grouping set
+        cursor.execute(f"""
+            SELECT GROUPING(subject_id), subject_id, COUNT(*), AVG(marks_obtained),
+                   STDDEV_POP(marks_obtained), MIN(marks_obtained), MAX(marks_obtained),
+                   percentile_cont(%s::float8[]) WITHIN GROUP (ORDER BY marks_obtained)
+            FROM {table}
+            WHERE {where}
+            GROUP BY GROUPING SETS ((subject_id), ())
+        """, [fractions] + params)
+        for is_total, subject_id, count, mean, std_dev, low, high, quantiles in cursor.fetchall():
+            if not count:
+                continue
+            row = {'count': count, 'mean': _round(mean), 'std_dev': _round(std_dev), 'min': low, 'max': high}
+            row.update({name: _round(q) for name, q in zip(QUANTILES, quantiles)})
+            row['histogram'] = [0] * buckets
+            stats[None if is_total else subject_id] = row
+
+        # Marks of exactly 100 fall in width_bucket's overflow bucket n + 1
+        cursor.execute(f"""
+            SELECT GROUPING(subject_id), subject_id, bucket, COUNT(*)
+            FROM (
+                SELECT subject_id,
+                       LEAST(width_bucket(marks_obtained::numeric, 0, {MAX_MARKS}, %s), %s) AS bucket
+                FROM {table}
+                WHERE {where}
+            ) AS bucketed
+            GROUP BY GROUPING SETS ((subject_id, bucket), (bucket))
+        """, [buckets, buckets] + params)
+        for is_total, subject_id, bucket, count in cursor.fetchall():
+            row = stats.get(None if is_total else subject_id)
+            if row is not None:
+                row['histogram'][max(bucket, 1) - 1] += count
+
+    overall = stats.pop(None, None)
+    return stats, overall
+
+
+def _histogram_distribution(subject_ids, buckets, exam_type, semester):
+    summaries = ResultSummary.objects.filter(subject_id__in=subject_ids)
+    if exam_type:
+        summaries = summaries.filter(exam_type=exam_type)
+    if semester:
+        summaries = summaries.filter(semester=semester)
+
+    histograms = {}
+    for subject_id, histogram in summaries.values_list('subject_id', 'histogram'):
+        counts = np.zeros(max(HISTOGRAM_BINS, len(histogram)), dtype=np.int64)
+        counts[:len(histogram)] = histogram
+        if subject_id in histograms:
+            previous = histograms[subject_id]
+            size = max(len(previous), len(counts))
+            counts = np.pad(counts, (0, size - len(counts))) + np.pad(previous, (0, size - len(previous)))
+        histograms[subject_id] = counts
+
+    per_subject = {
+        subject_id: _histogram_stats(counts, buckets)
+        for subject_id, counts in histograms.items() if counts.sum()
+    }
+    if not per_subject:
+        return per_subject, None
+    size = max(len(counts) for counts in histograms.values())
+    total = np.sum([np.pad(counts, (0, size - len(counts))) for counts in histograms.values()], axis=0)
+    return per_subject, _histogram_stats(total, buckets)
+
+
+def _histogram_stats(counts, buckets):
+    """Stats of the marks described by ``counts[m]`` = results scoring ``m``."""
+    marks = np.arange(len(counts))
+    n = int(counts.sum())
+    mean = float((marks * counts).sum()) / n
+    variance = float((marks * marks * counts).sum()) / n - mean * mean
+    scored = np.flatnonzero(counts)
+
+    # percentile_cont: interpolate between the values at ranks floor(p(n-1))
+    # and ceil(p(n-1)); the value at rank k is the first mark whose running
+    # count exceeds k
+    cumulative = np.cumsum(counts)
+    ranks = np.array(list(QUANTILES.values())) * (n - 1)
+    lower = np.searchsorted(cumulative, np.floor(ranks), side='right')
+    upper = np.searchsorted(cumulative, np.ceil(ranks), side='right')
+    quantiles = lower + (upper - lower) * (ranks - np.floor(ranks))
+
+    bucket_of = np.minimum(marks * buckets // MAX_MARKS, buckets - 1)
+    histogram = np.bincount(bucket_of, weights=counts, minlength=buckets)
+
+    stats = {
+        'count': n,
+        'mean': _round(mean),
+        'std_dev': _round(math.sqrt(max(variance, 0))),
+        'min': int(scored[0]),
+        'max': int(scored[-1]),
+    }
+    stats.update({name: _round(q) for name, q in zip(QUANTILES, quantiles)})
+    stats['histogram'] = [int(c) for c in histogram[:buckets]]
+    return stats
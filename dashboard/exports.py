@@ -0,0 +1,119 @@
+"""
+Streaming exports of results.
+
+Rows are read as plain tuples through a server-side cursor, with status and
+percentage computed by the database, and written out as they arrive, so
+memory use and time to first byte do not depend on how many results are
+exported.
+"""
+import csv
+import json
+import tempfile
+
+from django.db import transaction
+from openpyxl import Workbook
+
+from .analytics import annotate_outcome
+from .ingest import REQUIRED_HEADERS
+
+# The template columns come first so an export can be edited and re-uploaded.
+EXPORT_HEADERS = REQUIRED_HEADERS + [
+    'Course Name', 'Total Marks', 'Percentage', 'Status', 'Exam Type', 'Semester', 'Grade',
+]
+EXPORT_FIELDS = [
+    'student__roll_number', 'student__name', 'subject__code', 'marks_obtained',
+    'subject__name', 'total_marks', 'result_percentage', 'result_status', 'exam_type', 'semester', 'grade',
+]
+
+CHUNK_SIZE = 2000
+ROWS_PER_WRITE = 500
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the value straight back."""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(rows):
+    """
+    Iterate a ``values``/``values_list`` query through a server-side cursor.
+
+    The iteration runs inside a transaction so PostgreSQL's server-side
+    cursor also works behind a transaction-pooling proxy such as Supabase's
+    pooler.
+    """
+    with transaction.atomic(using=rows.db):
+        yield from rows.iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_rows(results):
+    """Yield one export row (a tuple in ``EXPORT_HEADERS`` order) per result."""
+    rows = annotate_outcome(results).order_by('subject__code', 'student__roll_number').values_list(*EXPORT_FIELDS)
+    return iter_rows(rows)
+
+
+def stream_json(items, key='results', extra=None):
+    """
+    Yield a JSON document ``{key: [items...], **extra}`` a few hundred items
+    per chunk, without holding the list in memory.
+    """
+    encoder = json.JSONEncoder(separators=(',', ':'), default=str)
+    yield f'{{{encoder.encode(key)}:['
+    buffer = []
+    first = True
+    for item in items:
+        buffer.append(encoder.encode(item) if first else ',' + encoder.encode(item))
+        first = False
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    buffer.append(']')
+    for name, value in (extra or {}).items():
+        buffer.append(f',{encoder.encode(name)}:{encoder.encode(value)}')
+    buffer.append('}')
+    yield ''.join(buffer)
+
+
+def stream_csv(results):
+    """Yield CSV text, a few hundred rows per chunk."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADERS)
+    buffer = []
+    for row in export_rows(results):
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= ROWS_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_xlsx(results, block_size=64 * 1024):
+    """
+    Yield the bytes of an xlsx export.
+
+    openpyxl's write-only mode spools each appended row to a temporary file
+    and only zips the sheet on save, so the workbook is assembled on disk and
+    then streamed back in blocks.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Results')
+    ws.append(EXPORT_HEADERS)
+    for row in export_rows(results):
+        ws.append(row)
+
+    with tempfile.TemporaryFile() as spool:
+        wb.save(spool)
+        spool.seek(0)
+        while True:
+            block = spool.read(block_size)
+            if not block:
+                break
+            yield block
+
+
+def stream_export_json(results):
+    """Yield a JSON export: one object per result keyed by ``EXPORT_HEADERS``."""
+    return stream_json(dict(zip(EXPORT_HEADERS, row)) for row in export_rows(results))
@@ -0,0 +1,57 @@
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils.functional import cached_property
+
+
+class LabelCodeField(models.SmallIntegerField):
+    """
+    One of a fixed list of labels, stored as the label's position in the
+    list. Models, forms and queries use the label ('Mid Term'); only the
+    column holds the small-integer code, which keeps large tables and their
+    indexes compact.
+
+    Codes are list positions, so ``labels`` is append-only: never reorder or
+    remove an entry once rows use it.
+    """
+
+    def __init__(self, *args, labels=(), **kwargs):
+        self.labels = list(labels)
+        self.codes = {label: code for code, label in enumerate(self.labels)}
+        kwargs['choices'] = [(label, label) for label in self.labels]
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        del kwargs['choices']
+        kwargs['labels'] = self.labels
+        return name, path, args, kwargs
+
+    @cached_property
+    def validators(self):
+        # The integer range validators would compare labels with numbers
+        return list(self._validators)
+
+    def code_of(self, label):
+        """Code of ``label``, or None if it is not one of the labels."""
+        return self.codes.get(label)
+
+    def label_of(self, code):
+        return None if code is None else self.labels[code]
+
+    def from_db_value(self, value, expression, connection):
+        return self.label_of(value)
+
+    def to_python(self, value):
+        if value is None or value in self.codes:
+            return value
+        if isinstance(value, int) and 0 <= value < len(self.labels):
+            return self.labels[value]
+        raise ValidationError(f'"{value}" is not a valid {self.verbose_name}.', code='invalid')
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, int):
+            return super().get_prep_value(value)
+        code = self.code_of(str(value))
+        if code is None:
+            raise ValueError(f'"{value}" is not a valid {self.verbose_name}.')
+        return code
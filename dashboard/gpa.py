@@ -0,0 +1,144 @@
+"""
+Credit-weighted SGPA/CGPA.
+
+Each result is mapped to a grade point by the grade scale of its subject's
+scheme, and every student of a cohort (department, year and scheme) gets an
+SGPA per semester and a running CGPA. Grading, credit weighting and the
+cumulative sums are done by one SQL query with window functions; the
+figures are then stored in ``StudentGPA`` so transcripts are a plain read.
+
+Grade scales can be overridden with a ``GRADE_SCALES`` setting of the same
+shape as ``DEFAULT_GRADE_SCALES``.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Result, Student, StudentGPA, Subject
+
+# scheme -> [(minimum percentage, grade point, letter)], highest band first;
+# anything below the last band is an F with no grade points
+DEFAULT_GRADE_SCALES = {
+    'R19-20': [
+        (80, 10, 'O'), (75, 9, 'A+'), (70, 8, 'A'), (60, 7, 'B+'),
+        (50, 6, 'B'), (45, 5, 'C'), (40, 4, 'D'),
+    ],
+    'NEP': [
+        (90, 10, 'O'), (80, 9, 'A+'), (70, 8, 'A'), (60, 7, 'B+'),
+        (55, 6, 'B'), (50, 5, 'C'), (40, 4, 'P'),
+    ],
+    'AUTONOMOUS': [
+        (85, 10, 'O'), (75, 9, 'A+'), (65, 8, 'A'), (55, 7, 'B+'),
+        (50, 6, 'B'), (45, 5, 'C'), (40, 4, 'P'),
+    ],
+}
+FAIL_GRADE = (0, 'F')
+
+
+def grade_scales():
+    return getattr(settings, 'GRADE_SCALES', DEFAULT_GRADE_SCALES)
+
+
+def _grade_point_case(scheme_column, percentage_column):
+    branches, params = [], []
+    for scheme, bands in grade_scales().items():
+        # Typed so PostgreSQL does not resolve the CASE to text
+        inner = ' '.join(f'WHEN {percentage_column} >= %s THEN CAST(%s AS NUMERIC)' for _ in bands)
+        branches.append(f'WHEN {scheme_column} = %s THEN CASE {inner} ELSE {FAIL_GRADE[0]} END')
+        params.append(scheme)
+        for minimum, point, _ in bands:
+            params.extend([minimum, point])
+    return f"CASE {' '.join(branches)} ELSE {FAIL_GRADE[0]} END", params
+
+
+def cohort_gpa_rows(department_id, year, scheme, exam_type=None):
+    """
+    Return ``(student_id, semester, credits, credit_points, cumulative
+    credits, cumulative credit points)`` for every student and semester of
+    the cohort.
+
+    Only one result per student, subject and semester counts: the one of
+    ``exam_type``, or else of the latest exam type in ``Result.EXAM_TYPES``.
+    """
+    if exam_type and exam_type not in Result.EXAM_TYPES:
+        raise ValueError(f'Unknown exam type "{exam_type}".')
+    result_table = connection.ops.quote_name(Result._meta.db_table)
+    subject_table = connection.ops.quote_name(Subject._meta.db_table)
+    student_table = connection.ops.quote_name(Student._meta.db_table)
+    grade_case, grade_params = _grade_point_case('scheme', 'percentage')
+
+    exam_filter = ''
+    filter_params = [department_id, year, scheme]
+    if exam_type:
+        exam_filter = 'AND r.exam_type = %s'
+        filter_params.append(Result._meta.get_field('exam_type').code_of(exam_type))
+
+    sql = f"""
+        WITH scoped AS (
+            SELECT r.student_id, r.semester, sub.credits, sub.scheme,
+                   COALESCE(r.marks_obtained * 100.0 / NULLIF(r.total_marks, 0), 0) AS percentage,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY r.student_id, r.subject_id, r.semester
+                       ORDER BY r.exam_type DESC
+                   ) AS pick
+            FROM {result_table} r
+            JOIN {subject_table} sub ON sub.id = r.subject_id
+            JOIN {student_table} st ON st.id = r.student_id
+            WHERE st.department_id = %s AND st.year = %s AND st.scheme = %s {exam_filter}
+        ),
+        graded AS (
+            SELECT student_id, semester, credits, {grade_case} AS grade_point
+            FROM scoped
+            WHERE pick = 1
+        ),
+        semesters AS (
+            SELECT student_id, semester, SUM(credits) AS credits, SUM(credits * grade_point) AS credit_points
+            FROM graded
+            GROUP BY student_id, semester
+        )
+        SELECT student_id, semester, credits, credit_points,
+               SUM(credits) OVER w, SUM(credit_points) OVER w
+        FROM semesters
+        WINDOW w AS (PARTITION BY student_id ORDER BY semester ROWS UNBOUNDED PRECEDING)
+    """
+    params = filter_params + grade_params
+    semesters = Result._meta.get_field('semester')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(student_id, semesters.label_of(semester), *sums) for student_id, semester, *sums in cursor.fetchall()]
+
+
+def _ratio(points, credits):
+    # PostgreSQL sums the window's bigint credits as numeric
+    return round(float(points) / float(credits), 2) if credits else 0.0
+
+
+def compute_cohort_gpa(department_id, year, scheme):
+    """
+    Compute and store SGPA/CGPA for a cohort; returns the number of rows
+    stored.
+
+    ``StudentGPA`` has one row per student and semester, so the stored
+    figures always count the latest exam type of every subject; per-exam
+    figures come from ``cohort_gpa_rows(exam_type=...)`` without being
+    stored.
+    """
+    gpas = [
+        StudentGPA(
+            student_id=student_id,
+            semester=semester,
+            credits=credits,
+            credit_points=float(credit_points),
+            sgpa=_ratio(credit_points, credits),
+            cumulative_credits=int(cumulative_credits),
+            cgpa=_ratio(cumulative_points, cumulative_credits),
+        )
+        for student_id, semester, credits, credit_points, cumulative_credits, cumulative_points
+        in cohort_gpa_rows(department_id, year, scheme)
+    ]
+    with transaction.atomic():
+        # Semesters whose results were all deleted must not linger
+        StudentGPA.objects.filter(
+            student__department_id=department_id, student__year=year, student__scheme=scheme
+        ).delete()
+        StudentGPA.objects.bulk_create(gpas, batch_size=1000)
+    return len(gpas)
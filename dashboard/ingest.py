@@ -0,0 +1,619 @@
+"""
+Set-based ingest of results spreadsheets.
+
+Rows are buffered and written in batches: every roll number and course code in
+a batch is resolved with a single query each, and ``Result`` rows are written
+with ``bulk_create``/``bulk_update`` instead of a ``get_or_create`` per row.
+"""
+import csv
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+from decimal import Decimal, InvalidOperation
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Student, Subject, Result
+from .sheets import parse_sheet, sheet_names
+from .summaries import SummaryDelta
+from .terms import current_term
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_HEADERS = ['Roll No', 'Name', 'Course Code', 'Marks']
+DEFAULT_EXAM_TYPE = 'Mid Term'
+DEFAULT_SEMESTER = '1st'
+DEFAULT_BATCH_SIZE = getattr(settings, 'RESULTS_UPLOAD_BATCH_SIZE', 1000)
+# Times a batch is written before a unique-key conflict fails the upload
+WRITE_ATTEMPTS = 3
+
+# Mirrors the validators on Result.marks_obtained
+MIN_MARKS = 0
+MAX_MARKS = 100
+
+# Delimited-text uploads, keyed by file extension; anything else is read as xlsx.
+DELIMITERS = {
+    '.csv': ',',
+    '.tsv': '\t',
+    '.tab': '\t',
+}
+
+
+class HeaderError(ValueError):
+    """Raised when a sheet does not carry the template's header row."""
+
+
+def header_indices(headers):
+    """Return the column positions of ``REQUIRED_HEADERS`` within ``headers``."""
+    headers = list(headers)
+    if not all(header in headers for header in REQUIRED_HEADERS):
+        raise HeaderError(f'Excel file must contain columns: {", ".join(REQUIRED_HEADERS)}')
+    return [headers.index(header) for header in REQUIRED_HEADERS]
+
+
+def _cell(row, idx):
+    return row[idx] if idx < len(row) else None
+
+
+def whole_number(raw):
+    """
+    ``raw`` as an int if it is a whole number, else None.
+
+    Workbook cells arrive as int or float, delimited text as str; 50, 50.0
+    and "50.0" are all 50, while 50.7 and "50.7" are rejected rather than
+    truncated.
+    """
+    if isinstance(raw, bool):
+        return None
+    if isinstance(raw, int):
+        return raw
+    try:
+        value = Decimal(raw.strip() if isinstance(raw, str) else raw)
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if not value.is_finite() or value != value.to_integral_value():
+        return None
+    return int(value)
+
+
+def check_row(row, indices):
+    """
+    Validate one row column by column.
+
+    Returns ``(values, problems)`` where ``values`` is
+    ``[roll_no, name, course_code, marks]`` (None where a cell is unusable)
+    and ``problems`` lists ``(column, raw_value, message)`` tuples.
+    """
+    values = []
+    problems = []
+    for header, idx in zip(REQUIRED_HEADERS, indices):
+        raw = _cell(row, idx)
+        if raw is None or (isinstance(raw, str) and not raw.strip()):
+            problems.append((header, raw, f'{header} is missing'))
+            values.append(None)
+            continue
+        if header != 'Marks':
+            values.append(str(raw).strip())
+            continue
+        marks = whole_number(raw)
+        if marks is None:
+            problems.append((header, raw, f'Marks "{raw}" is not a whole number'))
+        elif not MIN_MARKS <= marks <= MAX_MARKS:
+            problems.append((header, raw, f'Marks {marks} must be between {MIN_MARKS} and {MAX_MARKS}'))
+        values.append(marks)
+    return values, problems
+
+
+def iter_workbook_rows(excel_file, streaming=False):
+    """
+    Yield the active sheet's rows as value tuples, header row first.
+
+    In streaming mode the workbook is opened read-only, so openpyxl parses
+    the sheet XML lazily and only the current row is held in memory.
+    """
+    from openpyxl import load_workbook
+    wb = load_workbook(excel_file, read_only=streaming, data_only=streaming)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def iter_delimited_rows(text_file, delimiter=','):
+    """
+    Yield the rows of a CSV/TSV upload, header row first.
+
+    ``text_file`` may be a binary file object; it is decoded as UTF-8 with an
+    optional BOM (as written by Excel's "CSV UTF-8" export). Blank lines are
+    skipped.
+    """
+    if not isinstance(text_file, io.TextIOBase):
+        text_file = io.TextIOWrapper(text_file, encoding='utf-8-sig', newline='')
+    for row in csv.reader(text_file, delimiter=delimiter):
+        if row:
+            yield row
+
+
+def upload_format(filename):
+    """Return 'csv', 'tsv' or 'xlsx' for an uploaded file name."""
+    delimiter = DELIMITERS.get(os.path.splitext(filename or '')[1].lower())
+    if delimiter is None:
+        return 'xlsx'
+    return 'csv' if delimiter == ',' else 'tsv'
+
+
+def iter_upload_rows(upload, filename, streaming=False):
+    """Dispatch to the delimited-text or workbook reader based on ``filename``."""
+    delimiter = DELIMITERS.get(os.path.splitext(filename or '')[1].lower())
+    if delimiter is not None:
+        return iter_delimited_rows(upload, delimiter)
+    return iter_workbook_rows(upload, streaming=streaming)
+
+
+def _rss_bytes():
+    """Current resident set size of this process, or None without /proc."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        # getrusage's ru_maxrss is a lifetime high-water mark, not usable per job
+        return None
+
+
+class MemoryProbe:
+    """
+    Tracks how far the worker process's RSS grows above its level at creation.
+
+    This is approximate and process-wide: other worker threads' jobs, and
+    memory the allocator keeps after a job frees it, are included. Sampling
+    reads a single /proc file, so it is cheap enough to call once per write
+    batch; tracemalloc would be exact but slows parsing severalfold. Without
+    /proc (macOS, Windows) nothing is measured.
+    """
+
+    def __init__(self):
+        self.baseline = _rss_bytes()
+        self.peak = self.baseline
+
+    def sample(self):
+        if self.baseline is not None:
+            self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def peak_growth_bytes(self):
+        """Approximate process RSS growth, or None where it cannot be measured."""
+        if self.baseline is None:
+            return None
+        return max(self.peak - self.baseline, 0)
+
+
+def row_fingerprint(roll_no, course_code, marks, exam_type, semester, term):
+    """8-byte digest identifying one applied (student, course, exam, term) mark."""
+    key = f'{roll_no}\x1f{course_code}\x1f{marks}\x1f{exam_type}\x1f{semester}\x1f{term.isoformat()}'
+    return hashlib.blake2b(key.encode(), digest_size=8).digest()
+
+
+def pack_fingerprints(fingerprints):
+    return b''.join(sorted(set(fingerprints)))
+
+
+def unpack_fingerprints(data):
+    data = bytes(data or b'')
+    return {data[i:i + 8] for i in range(0, len(data), 8)}
+
+
+class ResultIngestor:
+    """
+    Accumulates parsed rows and upserts them into ``Result`` batch by batch.
+
+    Callers feed raw sheet rows with ``feed()`` and must call ``flush()`` once
+    the sheet is exhausted; ``on_flush`` is called with the ingestor after
+    every written batch. Rows are recorded in ``term``, by default the
+    current academic term. Counters mirror the historical upload summary: a
+    row whose (student, subject, exam, semester, term) already exists counts
+    as updated, or as unchanged when that result already holds its marks,
+    and everything else as created.
+
+    Existing rows are read before each batch is written. If a concurrent
+    upload inserts one of the keys in between, the batch's insert hits the
+    unique key; the batch is then rolled back and written again, and the
+    colliding rows become updates.
+
+    ``fingerprints`` collects every row this upload applied and
+    ``subject_ids`` the subjects those rows belong to.
+    """
+
+    def __init__(self, faculty, headers, exam_type=DEFAULT_EXAM_TYPE,
+                 semester=DEFAULT_SEMESTER, term=None, batch_size=DEFAULT_BATCH_SIZE, on_flush=None):
+        self.faculty = faculty
+        self.indices = header_indices(headers)
+        self.exam_type = exam_type
+        self.semester = semester
+        self.term = term or current_term()
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.fingerprints = []
+        self.subject_ids = set()
+        self.rows_seen = 0
+        self.course_codes = set()
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+        self._pending = []
+
+    def feed(self, row_num, row):
+        self.rows_seen += 1
+        (roll_no, name, course_code, marks), problems = check_row(row, self.indices)
+        if problems:
+            self.errors.append(f'Row {row_num}: ' + '; '.join(message for _, _, message in problems))
+            return
+
+        self.course_codes.add(course_code)
+        self._pending.append((row_num, roll_no, name, course_code, marks))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            counters = self._counters()
+            try:
+                with transaction.atomic():
+                    self._write(rows)
+                break
+            except IntegrityError:
+                # Another upload inserted some of these results after we read
+                # them; roll the batch back and write it again as updates
+                self._restore(counters)
+                if attempt == WRITE_ATTEMPTS:
+                    raise
+                logger.info("Result batch conflicted with a concurrent upload; retrying (%d)", attempt)
+        if self.on_flush is not None:
+            self.on_flush(self)
+
+    def summary(self):
+        message = f'Successfully processed {self.created} new results and updated {self.updated} existing results.'
+        if self.unchanged:
+            message += f' {self.unchanged} rows already had these marks.'
+        return {
+            'success': True,
+            'message': message,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+        }
+
+    def _counters(self):
+        return (self.created, self.updated, self.unchanged, len(self.errors), len(self.fingerprints),
+                set(self.subject_ids))
+
+    def _restore(self, counters):
+        self.created, self.updated, self.unchanged, errors, fingerprints, self.subject_ids = counters
+        del self.errors[errors:]
+        del self.fingerprints[fingerprints:]
+
+    def _existing(self, students, valid_rows):
+        return {
+            (r.student_id, r.subject_id): r
+            for r in Result.objects.filter(
+                student_id__in={students[roll_no] for roll_no, _, _, _ in valid_rows},
+                subject_id__in={subject_id for _, _, subject_id, _ in valid_rows},
+                exam_type=self.exam_type,
+                semester=self.semester,
+                term=self.term,
+            ).only('id', 'student_id', 'subject_id', 'marks_obtained')
+        }
+
+    def _resolve_students(self, rows):
+        roll_numbers = {roll_no for roll_no, _, _, _ in rows}
+        students = {
+            s.roll_number: s.id
+            for s in Student.objects.filter(roll_number__in=roll_numbers).only('id', 'roll_number')
+        }
+
+        missing = {}
+        for roll_no, name, _, _ in rows:
+            if roll_no not in students and roll_no not in missing:
+                missing[roll_no] = Student(
+                    roll_number=roll_no,
+                    name=name,
+                    department=self.faculty.department,
+                    year=2,  # Default year, can be made dynamic
+                    scheme='R19-20',  # Default scheme
+                )
+        if missing:
+            # A concurrent upload may insert the same roll numbers; ignore those
+            # conflicts and read the ids back instead of trusting returned pks.
+            Student.objects.bulk_create(missing.values(), ignore_conflicts=True)
+            students.update(
+                Student.objects.filter(roll_number__in=missing.keys()).values_list('roll_number', 'id')
+            )
+        return students
+
+    def _resolve_subjects(self, rows):
+        codes = {course_code for _, _, _, course_code, _ in rows}
+        subjects = {}
+        for subject_id, code in Subject.objects.filter(code__in=codes).values_list('id', 'code'):
+            subjects.setdefault(code, []).append(subject_id)
+        return subjects
+
+    def _write(self, rows):
+        subjects = self._resolve_subjects(rows)
+
+        valid_rows = []
+        for row_num, roll_no, name, course_code, marks in rows:
+            subject_ids = subjects.get(course_code)
+            if not subject_ids:
+                self.errors.append(f'Row {row_num}: Course code "{course_code}" not found')
+            elif len(subject_ids) > 1:
+                self.errors.append(f'Row {row_num}: Course code "{course_code}" matches more than one subject')
+            else:
+                valid_rows.append((roll_no, name, subject_ids[0], marks))
+                self.subject_ids.add(subject_ids[0])
+                self.fingerprints.append(
+                    row_fingerprint(roll_no, course_code, marks, self.exam_type, self.semester, self.term)
+                )
+        if not valid_rows:
+            return
+
+        students = self._resolve_students(valid_rows)
+
+        existing = self._existing(students, valid_rows)
+
+        to_create = {}
+        to_update = {}
+        previous_marks = {}
+        for roll_no, _, subject_id, marks in valid_rows:
+            key = (students[roll_no], subject_id)
+            result = existing.get(key) or to_create.get(key)
+            if result is None:
+                to_create[key] = Result(
+                    student_id=key[0],
+                    subject_id=subject_id,
+                    exam_type=self.exam_type,
+                    semester=self.semester,
+                    term=self.term,
+                    marks_obtained=marks,
+                )
+                self.created += 1
+                continue
+
+            if result.marks_obtained == marks:
+                self.unchanged += 1
+                continue
+            self.updated += 1
+            if result.pk is not None:
+                previous_marks.setdefault(key, result.marks_obtained)
+                to_update[key] = result
+            result.marks_obtained = marks
+
+        if to_create:
+            Result.objects.bulk_create(to_create.values(), batch_size=self.batch_size)
+        if to_update:
+            now = timezone.now()
+            for result in to_update.values():
+                result.updated_at = now
+            Result.objects.bulk_update(
+                to_update.values(), ['marks_obtained', 'updated_at'], batch_size=self.batch_size
+            )
+
+        # bulk_create/bulk_update send no signals, so the summaries are
+        # updated here, inside the batch's transaction
+        delta = SummaryDelta()
+        for result in to_create.values():
+            delta.add(result.subject_id, self.exam_type, self.semester, result.marks_obtained)
+        for key, result in to_update.items():
+            delta.remove(result.subject_id, self.exam_type, self.semester, previous_marks[key])
+            delta.add(result.subject_id, self.exam_type, self.semester, result.marks_obtained)
+        delta.apply()
+        logger.debug(
+            "Ingested batch of %d rows: %d inserted, %d changed",
+            len(rows), len(to_create), len(to_update),
+        )
+
+
+def ingest_upload(faculty, upload, filename, streaming=False, on_flush=None):
+    """
+    Feed every row of an xlsx, CSV or TSV upload through a ``ResultIngestor``.
+
+    Raises ``HeaderError`` for a file without the template headers. Each
+    batch commits on its own unless the caller wraps the call in a
+    transaction, so an error partway through the file leaves the batches
+    before it written; the ingestor's counters covered exactly those.
+    """
+    rows = iter_upload_rows(upload, filename, streaming=streaming)
+    try:
+        ingestor = ResultIngestor(faculty, next(rows, ()), on_flush=on_flush)
+        for row_num, row in enumerate(rows, 2):
+            ingestor.feed(row_num, row)
+        ingestor.flush()
+    finally:
+        rows.close()
+    return ingestor
+
+
+class WorkbookIngest:
+    """
+    Per-sheet summaries and running totals for a multi-sheet workbook.
+
+    Exposes the same counters as ``ResultIngestor`` so progress callbacks
+    can treat both alike.
+    """
+
+    def __init__(self, faculty, on_flush=None):
+        self.faculty = faculty
+        self.on_flush = on_flush
+        self.term = current_term()  # one term for every sheet
+        self.fingerprints = []
+        self.subject_ids = set()
+        self.sheets = []
+        self.rows_seen = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+    def add_sheet(self, name, rows):
+        if not any(any(value is not None for value in row) for row in rows):
+            self.sheets.append({'sheet': name, 'skipped': True})
+            return
+        try:
+            ingestor = ResultIngestor(self.faculty, rows[0], term=self.term)
+        except HeaderError as e:
+            self.errors.append(f'Sheet "{name}": {str(e)}')
+            self.sheets.append({'sheet': name, 'error': str(e)})
+            return
+
+        # One commit per sheet; the ingestor's batch transactions become savepoints
+        with transaction.atomic():
+            for row_num, row in enumerate(rows[1:], 2):
+                ingestor.feed(row_num, row)
+            ingestor.flush()
+
+        self.rows_seen += ingestor.rows_seen
+        self.created += ingestor.created
+        self.updated += ingestor.updated
+        self.unchanged += ingestor.unchanged
+        self.fingerprints.extend(ingestor.fingerprints)
+        self.subject_ids.update(ingestor.subject_ids)
+        self.errors.extend(f'Sheet "{name}": {error}' for error in ingestor.errors)
+        self.sheets.append({
+            'sheet': name,
+            'course_codes': sorted(ingestor.course_codes),
+            'rows': ingestor.rows_seen,
+            'created': ingestor.created,
+            'updated': ingestor.updated,
+            'unchanged': ingestor.unchanged,
+            'errors': ingestor.errors[:10],
+        })
+        if self.on_flush is not None:
+            self.on_flush(self)
+
+    def summary(self):
+        return {
+            'success': True,
+            'message': (
+                f'Successfully processed {self.created} new results and updated {self.updated} '
+                f'existing results across {len(self.sheets)} sheets.'
+            ),
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'errors': self.errors,
+            'sheets': self.sheets,
+        }
+
+
+def ingest_all_sheets(faculty, path, on_flush=None, max_workers=None):
+    """
+    Ingest every sheet of the workbook at ``path``.
+
+    Sheets are parsed concurrently in a process pool and written as each one
+    finishes parsing, so the database work for early sheets overlaps the
+    parsing of later ones. Spawned (not forked) processes keep this safe to
+    call from the threaded upload workers.
+    """
+    names = sheet_names(path)
+    workbook = WorkbookIngest(faculty, on_flush=on_flush)
+    if not names:
+        return workbook
+
+    workers = min(len(names), max_workers or os.cpu_count() or 1)
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(parse_sheet, path, name) for name in names]
+        for future in as_completed(futures):
+            workbook.add_sheet(*future.result())
+
+    workbook.sheets.sort(key=lambda sheet: names.index(sheet['sheet']))
+    return workbook
+
+
+def _chunked(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def validate_upload(upload, filename):
+    """
+    Check a whole upload without writing anything.
+
+    Every row is checked locally first; roll numbers and course codes are
+    then resolved against the database in a handful of set-based queries.
+    Returns a report listing every problem with its row and column. Unknown
+    roll numbers are warnings, since the real upload creates those students.
+    """
+    rows = iter_upload_rows(upload, filename, streaming=True)
+    try:
+        indices = header_indices(next(rows, ()))
+        errors = []
+        candidates = []
+        row_count = 0
+        for row_num, row in enumerate(rows, 2):
+            row_count += 1
+            (roll_no, _, course_code, _), problems = check_row(row, indices)
+            for column, value, message in problems:
+                errors.append((row_num, column, value, message))
+            if not problems:
+                candidates.append((row_num, roll_no, course_code))
+    finally:
+        rows.close()
+
+    subject_counts = {}
+    for code in Subject.objects.filter(
+        code__in={code for _, _, code in candidates}
+    ).values_list('code', flat=True):
+        subject_counts[code] = subject_counts.get(code, 0) + 1
+
+    known_students = set()
+    for chunk in _chunked({roll_no for _, roll_no, _ in candidates}, 5000):
+        known_students.update(
+            Student.objects.filter(roll_number__in=chunk).values_list('roll_number', flat=True)
+        )
+
+    warnings = []
+    failed_rows = {row_num for row_num, _, _, _ in errors}
+    for row_num, roll_no, course_code in candidates:
+        matches = subject_counts.get(course_code, 0)
+        if matches == 0:
+            errors.append((row_num, 'Course Code', course_code, f'Course code "{course_code}" not found'))
+            failed_rows.add(row_num)
+        elif matches > 1:
+            errors.append((row_num, 'Course Code', course_code,
+                           f'Course code "{course_code}" matches more than one subject'))
+            failed_rows.add(row_num)
+        if roll_no not in known_students:
+            warnings.append((row_num, 'Roll No', roll_no,
+                             f'Roll No "{roll_no}" is not registered; a student record will be created'))
+
+    errors.sort(key=lambda error: error[0])
+    errors_by_column = {header: 0 for header in REQUIRED_HEADERS}
+    for _, column, _, _ in errors:
+        errors_by_column[column] += 1
+
+    def as_dicts(problems):
+        return [
+            {'row': row_num, 'column': column, 'value': None if value is None else str(value), 'message': message}
+            for row_num, column, value, message in problems
+        ]
+
+    return {
+        'dry_run': True,
+        'valid': not errors,
+        'rows': row_count,
+        'valid_rows': row_count - len(failed_rows),
+        'error_count': len(errors),
+        'errors_by_column': errors_by_column,
+        'errors': as_dicts(errors),
+        'warnings': as_dicts(warnings),
+    }
@@ -0,0 +1,345 @@
+"""
+Database-backed queue for results uploads.
+
+The upload view stores the file as a queued ``ResultUploadJob`` and returns
+straight away; workers started with ``manage.py process_result_uploads``
+claim jobs and run them through the batched ingest engine. A job whose
+worker dies is requeued once its heartbeat is older than
+``RESULTS_UPLOAD_JOB_TIMEOUT``; the stored file is deleted when the job
+finishes.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .ingest import (
+    DEFAULT_EXAM_TYPE, DEFAULT_SEMESTER, HeaderError, MemoryProbe, ingest_all_sheets, ingest_upload,
+    pack_fingerprints, row_fingerprint, unpack_fingerprints, upload_format,
+)
+from .models import Result, ResultUploadJob
+from .relative_grading import regrade_stale
+from .terms import current_term
+
+logger = logging.getLogger(__name__)
+
+
+def upload_mode(uploaded_file, requested_mode=None):
+    """
+    Pick how a workbook is read: 'sheets' ingests every sheet in parallel,
+    'stream' reads the active sheet read-only (large files, or on request)
+    and 'full' loads it whole.
+    """
+    if upload_format(uploaded_file.name) != 'xlsx':
+        return 'stream'  # delimited text is always parsed line by line
+    if requested_mode == 'sheets':
+        return 'sheets'
+    if requested_mode == 'stream' or uploaded_file.size >= settings.RESULTS_UPLOAD_STREAMING_THRESHOLD:
+        return 'stream'
+    return 'full'
+
+
+def content_hash(uploaded_file):
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def previous_upload(faculty, subject_id):
+    """Latest completed upload for a faculty and selected-subject scope."""
+    return ResultUploadJob.objects.filter(
+        faculty=faculty, subject_id=subject_id, status=ResultUploadJob.STATUS_DONE
+    ).order_by('-finished_at', '-id').first()
+
+
+def still_applied(job):
+    """
+    True if every row ``job`` applied still holds in the database, i.e. no
+    later upload, edit or deletion changed one of those results. Rows of an
+    earlier term never match, so a re-upload in a new term is run.
+    """
+    if job.row_fingerprints is None:
+        return False
+    expected = unpack_fingerprints(job.row_fingerprints)
+    term = current_term()
+    rows = Result.objects.filter(
+        subject_id__in=job.result_subjects, exam_type=DEFAULT_EXAM_TYPE, semester=DEFAULT_SEMESTER, term=term,
+    ).values_list('student__roll_number', 'subject__code', 'marks_obtained')
+    for roll_no, course_code, marks in rows.iterator():
+        if not expected:
+            break
+        expected.discard(row_fingerprint(roll_no, course_code, marks, DEFAULT_EXAM_TYPE, DEFAULT_SEMESTER, term))
+    return not expected
+
+
+def enqueue_upload(faculty, uploaded_file, requested_mode=None, subject_id=None):
+    """
+    Queue ``uploaded_file`` and return ``(job, duplicate)``.
+
+    A byte-identical copy of an upload in the same scope is not queued, and
+    that earlier job is returned with ``duplicate`` set, if the earlier job
+    is still queued or running, or is the latest completed upload, applied
+    every row without errors and none of its results changed since.
+    """
+    digest = content_hash(uploaded_file)
+    mode = upload_mode(uploaded_file, requested_mode)
+    identical = ResultUploadJob.objects.filter(
+        faculty=faculty, subject_id=subject_id, content_hash=digest, mode=mode,
+    )
+    pending = identical.filter(
+        status__in=[ResultUploadJob.STATUS_QUEUED, ResultUploadJob.STATUS_RUNNING]
+    ).order_by('created_at', 'id').first()
+    if pending is not None:
+        logger.info(f"Upload {uploaded_file.name} is identical to pending job {pending.pk}; skipping")
+        return pending, True
+    previous = previous_upload(faculty, subject_id)
+    if (previous is not None and previous.content_hash == digest and previous.mode == mode
+            and previous.error_count == 0 and still_applied(previous)):
+        logger.info(f"Upload {uploaded_file.name} is identical to job {previous.pk}; skipping")
+        return previous, True
+
+    job = ResultUploadJob(
+        faculty=faculty,
+        subject_id=subject_id,
+        filename=uploaded_file.name[:255],
+        content_hash=digest,
+        mode=mode,
+    )
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+    logger.info(f"Queued upload job {job.pk} ({job.filename}) for {faculty}")
+    return job, False
+
+
+def claim_job(job, worker_name):
+    """Move ``job`` from queued to running; False if someone else got it."""
+    now = timezone.now()
+    claimed = ResultUploadJob.objects.filter(
+        pk=job.pk, status=ResultUploadJob.STATUS_QUEUED
+    ).update(
+        status=ResultUploadJob.STATUS_RUNNING, worker=worker_name, started_at=now, heartbeat_at=now,
+        attempts=F('attempts') + 1,
+    )
+    if claimed:
+        job.refresh_from_db()
+    return bool(claimed)
+
+
+def requeue_stale_jobs():
+    """
+    Requeue running jobs whose worker has not reported progress for
+    ``RESULTS_UPLOAD_JOB_TIMEOUT`` seconds, i.e. was killed or crashed.
+    Jobs that already used ``RESULTS_UPLOAD_MAX_ATTEMPTS`` runs fail
+    instead. Running a job again is safe as every write is an upsert.
+
+    Returns the number of jobs requeued.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.RESULTS_UPLOAD_JOB_TIMEOUT)
+    stale = ResultUploadJob.objects.filter(status=ResultUploadJob.STATUS_RUNNING).filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+
+    exhausted = stale.filter(attempts__gte=settings.RESULTS_UPLOAD_MAX_ATTEMPTS)
+    for job in exhausted:
+        error = f'The worker stopped responding {job.attempts} times; giving up.'
+        if exhausted.filter(pk=job.pk).update(
+            status=ResultUploadJob.STATUS_FAILED, errors=[error], error_count=1, finished_at=now,
+            summary=failure_summary(job),
+        ):
+            logger.warning(f"Upload job {job.pk} failed: {error}")
+            _delete_upload(job)
+
+    requeued = stale.update(
+        status=ResultUploadJob.STATUS_QUEUED, worker='', started_at=None, heartbeat_at=None,
+    )
+    if requeued:
+        logger.warning(f"Requeued {requeued} upload jobs whose worker stopped responding")
+    return requeued
+
+
+def claim_next_job(worker_name):
+    """
+    Claim the oldest queued job and return it, or None if the queue is empty.
+    Stale running jobs are requeued first.
+
+    ``skip_locked`` lets concurrent workers on PostgreSQL pass over rows that
+    another worker is claiming; the conditional update in ``claim_job`` keeps
+    the claim safe on backends without row locks.
+    """
+    requeue_stale_jobs()
+    while True:
+        with transaction.atomic():
+            job = (ResultUploadJob.objects.select_for_update(skip_locked=True)
+                   .filter(status=ResultUploadJob.STATUS_QUEUED)
+                   .order_by('created_at', 'id')
+                   .first())
+            if job is None:
+                return None
+            if claim_job(job, worker_name):
+                return job
+
+
+def run_job(job):
+    """
+    Ingest a claimed job's workbook, publishing progress after every batch.
+
+    Batches commit independently so the progress endpoint can observe them;
+    re-running an interrupted job is safe because every write is an upsert. Rows
+    whose result already holds their marks are not written. A job that fails
+    mid-file therefore keeps the batches written before the failure, and its
+    summary says how many results those were.
+    """
+    memory = MemoryProbe()
+
+    def report_progress(ingestor):
+        memory.sample()
+        ResultUploadJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now(),
+            rows_processed=ingestor.rows_seen,
+            created_count=ingestor.created,
+            updated_count=ingestor.updated,
+            error_count=len(ingestor.errors),
+        )
+
+    try:
+        if job.mode == 'sheets':
+            ingestor = ingest_all_sheets(
+                job.faculty, job.file.path, on_flush=report_progress,
+                max_workers=settings.RESULTS_UPLOAD_SHEET_WORKERS,
+            )
+        else:
+            with job.file.open('rb') as f:
+                ingestor = ingest_upload(
+                    job.faculty, f, job.filename, streaming=job.mode == 'stream',
+                    on_flush=report_progress,
+                )
+    except HeaderError as e:
+        _finish(job, ResultUploadJob.STATUS_FAILED, errors=[str(e)])
+        return job
+    except Exception as e:
+        logger.error(f"Upload job {job.pk} failed: {str(e)}", exc_info=True)
+        # Keep the counters of batches that committed before the failure
+        job.refresh_from_db(fields=['rows_processed', 'created_count', 'updated_count'])
+        _finish(
+            job, ResultUploadJob.STATUS_FAILED, errors=[f'Error processing file: {str(e)}'],
+            summary=failure_summary(job),
+        )
+        _regrade(job)
+        return job
+
+    summary = ingestor.summary()
+    summary['errors'] = summary['errors'][:10]  # Limit errors to first 10
+    summary['mode'] = job.mode
+    summary['format'] = upload_format(job.filename)
+    # Whole-process RSS growth: includes jobs running on other worker threads
+    growth = memory.peak_growth_bytes
+    summary['approx_process_memory_growth_bytes'] = growth
+    if growth is not None:
+        summary['message'] += (
+            f' Approximate worker process RSS growth: {growth / 2**20:.1f} MB'
+            ' (process-wide, so it includes other jobs on this worker).'
+        )
+    job.rows_processed = ingestor.rows_seen
+    job.created_count = ingestor.created
+    job.updated_count = ingestor.updated
+    job.row_fingerprints = pack_fingerprints(ingestor.fingerprints)
+    job.result_subjects = sorted(ingestor.subject_ids)
+    _finish(job, ResultUploadJob.STATUS_DONE, errors=ingestor.errors, summary=summary)
+
+    # Only the latest upload of a scope is ever checked for a re-upload
+    ResultUploadJob.objects.filter(
+        faculty=job.faculty, subject_id=job.subject_id, row_fingerprints__isnull=False
+    ).exclude(pk=job.pk).update(row_fingerprints=None, result_subjects=[])
+    _regrade(job)
+    return job
+
+
+def failure_summary(job):
+    """Summary of a job that failed mid-file, whose earlier batches stay written."""
+    applied = job.created_count + job.updated_count
+    if applied:
+        message = (
+            f'The upload stopped partway: {job.created_count} new and {job.updated_count} updated results '
+            f'from the first {job.rows_processed} rows were saved and the rest of the file was not. '
+            'Upload the file again to finish; rows already saved are not written twice.'
+        )
+    else:
+        message = 'No results were saved.'
+    return {
+        'success': False,
+        'partial': bool(applied),
+        'message': message,
+        'created': job.created_count,
+        'updated': job.updated_count,
+        'rows_processed': job.rows_processed,
+    }
+
+
+def _regrade(job):
+    """Regrade the relatively graded subjects whose marks the job changed."""
+    try:
+        regraded = regrade_stale()
+    except Exception as e:
+        # The marks are in; grades catch up on the next write or regrade_results run
+        logger.error(f"Regrading after upload job {job.pk} failed: {str(e)}", exc_info=True)
+        return
+    if regraded:
+        logger.info(f"Upload job {job.pk}: regraded {regraded} subject groups")
+
+
+def _finish(job, status, errors, summary=None):
+    job.status = status
+    job.errors = errors
+    job.error_count = len(errors)
+    job.summary = summary
+    job.finished_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'errors', 'error_count', 'summary', 'finished_at',
+        'rows_processed', 'created_count', 'updated_count', 'row_fingerprints', 'result_subjects',
+    ])
+    logger.info(f"Upload job {job.pk} {status}: {job.rows_processed} rows at {job.rows_per_second} rows/s")
+    _delete_upload(job)
+
+
+def _delete_upload(job):
+    """Delete a finished job's stored file; only a running job reads it."""
+    if not job.file:
+        return
+    try:
+        job.file.delete(save=False)
+    except OSError as e:
+        logger.warning(f"Could not delete the file of upload job {job.pk}: {str(e)}")
+        return
+    job.file = ''
+    ResultUploadJob.objects.filter(pk=job.pk).update(file='')
+
+
+def job_payload(job):
+    """Progress document served by the job status endpoint."""
+    return {
+        'job_id': job.pk,
+        'filename': job.filename,
+        'status': job.status,
+        'mode': job.mode,
+        'rows_processed': job.rows_processed,
+        'rows_per_second': job.rows_per_second,
+        'created': job.created_count,
+        'updated': job.updated_count,
+        'error_count': job.error_count,
+        'errors': job.errors[:10],
+        'summary': job.summary,
+        # A failed job keeps the batches it wrote before failing
+        'partially_applied': (
+            job.status == ResultUploadJob.STATUS_FAILED and bool(job.created_count + job.updated_count)
+        ),
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
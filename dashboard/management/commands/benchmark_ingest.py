@@ -0,0 +1,80 @@
+import csv
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from openpyxl import Workbook
+
+from dashboard.ingest import REQUIRED_HEADERS, check_row, header_indices, ingest_upload, iter_upload_rows
+from dashboard.models import Department, Faculty, Subject
+
+
+class Command(BaseCommand):
+    help = 'Compare results-ingest throughput (rows/s) for xlsx, CSV and TSV uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Rows in the synthetic sheet')
+        parser.add_argument('--write', action='store_true',
+                            help='Also write rows to the database (rolled back afterwards)')
+
+    def handle(self, *args, **options):
+        rows = [
+            (f'BENCH{i:06d}', f'Student {i}', 'BENCH101', i % 101)
+            for i in range(options['rows'])
+        ]
+        cases = [
+            ('xlsx (full)', 'bench.xlsx', self.build_xlsx(rows), False),
+            ('xlsx (stream)', 'bench.xlsx', self.build_xlsx(rows), True),
+            ('csv', 'bench.csv', self.build_delimited(rows, ','), False),
+            ('tsv', 'bench.tsv', self.build_delimited(rows, '\t'), False),
+        ]
+
+        self.stdout.write(f'{len(rows)} rows per file')
+        for label, filename, payload, streaming in cases:
+            elapsed = self.time_parse(payload, filename, streaming)
+            self.stdout.write(f'{label:<14} parse  {len(rows) / elapsed:>10,.0f} rows/s  ({elapsed:.2f}s)')
+            if options['write']:
+                elapsed = self.time_write(payload, filename, streaming)
+                self.stdout.write(f'{label:<14} ingest {len(rows) / elapsed:>10,.0f} rows/s  ({elapsed:.2f}s)')
+
+    def build_xlsx(self, rows):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(REQUIRED_HEADERS)
+        for row in rows:
+            ws.append(row)
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
+
+    def build_delimited(self, rows, delimiter):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=delimiter)
+        writer.writerow(REQUIRED_HEADERS)
+        writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def time_parse(self, payload, filename, streaming):
+        started = time.perf_counter()
+        rows = iter_upload_rows(io.BytesIO(payload), filename, streaming=streaming)
+        indices = header_indices(next(rows))
+        for row in rows:
+            check_row(row, indices)
+        return time.perf_counter() - started
+
+    def time_write(self, payload, filename, streaming):
+        with transaction.atomic():
+            department, _ = Department.objects.get_or_create(code='BENCH', defaults={'name': 'Benchmark Department'})
+            Subject.objects.get_or_create(
+                code='BENCH101', year=2, scheme='R19-20',
+                defaults={'name': 'Benchmark', 'department': department},
+            )
+            faculty = Faculty(department=department)
+
+            started = time.perf_counter()
+            ingest_upload(faculty, io.BytesIO(payload), filename, streaming=streaming)
+            elapsed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+        return elapsed
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.gpa import compute_cohort_gpa
+from dashboard.models import Department, Student
+
+
+class Command(BaseCommand):
+    help = ('Compute and store credit-weighted SGPA/CGPA for every student of a cohort from the latest '
+            'exam type of every subject')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', help='Department code (default: every cohort)')
+        parser.add_argument('--year', type=int)
+        parser.add_argument('--scheme')
+
+    def handle(self, *args, **options):
+        cohorts = Student.objects.values_list('department_id', 'year', 'scheme').distinct()
+        if options['department']:
+            department = Department.objects.filter(code=options['department']).first()
+            if department is None:
+                raise CommandError(f"Department {options['department']} not found")
+            cohorts = cohorts.filter(department=department)
+        if options['year']:
+            cohorts = cohorts.filter(year=options['year'])
+        if options['scheme']:
+            cohorts = cohorts.filter(scheme=options['scheme'])
+
+        for department_id, year, scheme in cohorts.order_by('department_id', 'year', 'scheme'):
+            count = compute_cohort_gpa(department_id, year, scheme)
+            self.stdout.write(f'department {department_id}, year {year}, {scheme}: {count} semester records')
+        self.stdout.write(self.style.SUCCESS('GPA computation complete'))
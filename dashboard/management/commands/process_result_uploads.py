@@ -0,0 +1,71 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from dashboard.jobs import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of workers that process queued results uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker threads')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{prefix}:{n}', options['poll_interval'], options['once']),
+                daemon=True,
+            )
+            for n in range(max(options['workers'], 1))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f'Started {len(threads)} upload workers'))
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Stopping workers after their current job...'))
+            self.stop.set()
+            for thread in threads:
+                thread.join()
+
+    def work(self, worker_name, poll_interval, once):
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    job = claim_next_job(worker_name)
+                except DatabaseError as e:
+                    # e.g. a dropped connection or a locked SQLite file; retry later
+                    self.stderr.write(f'[{worker_name}] could not claim a job: {e}')
+                    self.stop.wait(poll_interval)
+                    continue
+                if job is None:
+                    if once:
+                        return
+                    self.stop.wait(poll_interval)
+                    continue
+
+                started = time.monotonic()
+                run_job(job)
+                self.stdout.write(
+                    f'[{worker_name}] job {job.pk} {job.status}: '
+                    f'{job.rows_processed} rows in {time.monotonic() - started:.1f}s'
+                )
+        finally:
+            connection.close()
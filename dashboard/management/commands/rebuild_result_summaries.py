@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.summaries import rebuild_summaries, verify_summaries
+
+
+class Command(BaseCommand):
+    help = 'Verify the ResultSummary table against the raw results and rebuild it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report mismatches; exit with an error if there are any')
+
+    def handle(self, *args, **options):
+        mismatches = verify_summaries()
+        for (subject_id, exam_type, semester), field, stored, expected in mismatches:
+            self.stdout.write(
+                f'subject {subject_id} / {exam_type} / {semester}: {field} is {stored!r}, expected {expected!r}'
+            )
+
+        if options['check']:
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} summary mismatches found')
+            self.stdout.write(self.style.SUCCESS('Result summaries match the raw results'))
+            return
+
+        count = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} result summaries ({len(mismatches)} mismatches fixed)'
+        ))
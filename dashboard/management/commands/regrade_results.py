@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from dashboard.models import Department, Subject
+from dashboard.relative_grading import METHODS, regrade_stale
+
+
+class Command(BaseCommand):
+    help = 'Recompute relative-grading cut-offs and letter grades of subjects whose marks changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--department', help='Department code (default: every department)')
+        parser.add_argument('--all', action='store_true', help='Regrade every subject, not only changed ones')
+        parser.add_argument('--method', choices=METHODS,
+                            help='Cut-off method (default: the one each subject was last graded with)')
+
+    def handle(self, *args, **options):
+        subject_ids = None
+        if options['department']:
+            department = Department.objects.filter(code=options['department']).first()
+            if department is None:
+                raise CommandError(f"Department {options['department']} not found")
+            subject_ids = list(Subject.objects.filter(department=department).values_list('id', flat=True))
+
+        regraded = regrade_stale(subject_ids, method=options['method'], force=options['all'])
+        self.stdout.write(self.style.SUCCESS(f'Regraded {regraded} subject groups'))
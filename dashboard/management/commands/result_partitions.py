@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from dashboard.partitions import (
+    convert_to_partitioned, detach_partitions, ensure_partitions, is_partitioned, partitions,
+)
+from dashboard.relative_grading import regrade_stale
+from dashboard.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = ('Partition the results table by academic term (PostgreSQL): create the partitions of '
+            'upcoming terms and detach, archive or drop the partitions of old ones')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild the results table as a partitioned table first')
+        parser.add_argument('--ahead', type=int,
+                            help='Upcoming terms to create partitions for (default: RESULT_PARTITIONS_AHEAD)')
+        parser.add_argument('--keep-terms', type=int, metavar='N',
+                            help='Detach the partitions of terms older than the latest N, the current one included')
+        parser.add_argument('--archive-schema', help='Move detached partitions to this schema')
+        parser.add_argument('--drop', action='store_true', help='Drop detached partitions')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Result partitioning needs PostgreSQL.')
+        if options['drop'] and options['archive_schema']:
+            raise CommandError('Use either --archive-schema or --drop, not both.')
+        if options['keep_terms'] is not None and options['keep_terms'] < 1:
+            raise CommandError('--keep-terms must keep at least the current term.')
+
+        if options['convert']:
+            convert_to_partitioned(options['ahead'])
+            self.stdout.write(self.style.SUCCESS('Converted the results table to a partitioned table'))
+        elif not is_partitioned():
+            raise CommandError('The results table is not partitioned; run with --convert first.')
+        else:
+            for name in ensure_partitions(options['ahead']):
+                self.stdout.write(f'Created {name}')
+
+        if options['keep_terms'] is not None:
+            detached = detach_partitions(options['keep_terms'], options['archive_schema'], options['drop'])
+            for name in detached:
+                self.stdout.write(f'Detached {name}')
+            if detached:
+                # Results of the detached terms no longer count towards summaries and grades
+                rebuild_summaries()
+                regrade_stale()
+
+        for name, term in partitions():
+            self.stdout.write(f'{name:<40} {term or "DEFAULT"}')
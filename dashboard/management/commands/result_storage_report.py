@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from dashboard.models import Result
+
+
+class Command(BaseCommand):
+    help = 'Report the on-disk size of the results table and each of its indexes'
+
+    def handle(self, *args, **options):
+        table = Result._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("""
+                    SELECT %s, pg_relation_size(%s::regclass)
+                    UNION ALL
+                    SELECT indexname, pg_relation_size(quote_ident(indexname)::regclass)
+                    FROM pg_indexes WHERE tablename = %s AND schemaname = current_schema()
+                """, [table, connection.ops.quote_name(table), table])
+            elif connection.vendor == 'sqlite':
+                # Needs SQLite built with the dbstat virtual table
+                cursor.execute("""
+                    SELECT s.name, SUM(s.pgsize)
+                    FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+                    WHERE m.tbl_name = %s
+                    GROUP BY s.name
+                """, [table])
+            else:
+                raise CommandError(f'Size reporting is not supported on {connection.vendor}')
+            sizes = cursor.fetchall()
+
+        total = 0
+        for name, size in sorted(sizes, key=lambda row: (row[0] != table, row[0])):
+            self.stdout.write(f'{name:<70} {size / 1024:>10,.0f} KiB')
+            total += size
+        self.stdout.write(self.style.SUCCESS(f"{'total':<70} {total / 1024:>10,.0f} KiB"))
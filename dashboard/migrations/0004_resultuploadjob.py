@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_auto_20250921_1426'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultUploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='result_uploads/%Y/%m/')),
+                ('filename', models.CharField(max_length=255)),
+                ('mode', models.CharField(choices=[('full', 'Full'), ('stream', 'Stream')], default='full', max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('rows_processed', models.IntegerField(default=0)),
+                ('created_count', models.IntegerField(default=0)),
+                ('updated_count', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('errors', models.JSONField(default=list)),
+                ('summary', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('faculty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.faculty')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='dashboard_r_status_eb8a66_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_resultuploadjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resultuploadjob',
+            name='mode',
+            field=models.CharField(choices=[('full', 'Full'), ('stream', 'Stream'), ('sheets', 'All sheets')], default='full', max_length=10),
+        ),
+    ]
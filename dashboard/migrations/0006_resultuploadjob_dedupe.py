@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_resultuploadjob_mode_sheets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultuploadjob',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='resultuploadjob',
+            name='row_fingerprints',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='resultuploadjob',
+            name='subject',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='dashboard.subject'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:40
+
+import django.db.models.deletion
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_summaries(apps, schema_editor):
+    # Seed the table from the existing results; later writes keep it current
+    Result = apps.get_model('dashboard', 'Result')
+    ResultSummary = apps.get_model('dashboard', 'ResultSummary')
+    counts = defaultdict(Counter)
+    for subject_id, exam_type, semester, marks, n in (
+        Result.objects.order_by()
+        .values_list('subject_id', 'exam_type', 'semester', 'marks_obtained')
+        .annotate(n=Count('id'))
+    ):
+        counts[(subject_id, exam_type, semester)][marks] += n
+
+    summaries = []
+    for (subject_id, exam_type, semester), marks_counts in counts.items():
+        histogram = [0] * max(101, max(marks_counts) + 1)
+        for marks, n in marks_counts.items():
+            histogram[marks] = n
+        summaries.append(ResultSummary(
+            subject_id=subject_id, exam_type=exam_type, semester=semester,
+            count=sum(marks_counts.values()),
+            marks_sum=sum(m * n for m, n in marks_counts.items()),
+            marks_sq_sum=sum(m * m * n for m, n in marks_counts.items()),
+            pass_count=sum(n for m, n in marks_counts.items() if m >= 40),
+            min_marks=min(marks_counts), max_marks=max(marks_counts),
+            histogram=histogram,
+        ))
+    ResultSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_resultuploadjob_dedupe'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_type', models.CharField(max_length=50)),
+                ('semester', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('marks_sum', models.BigIntegerField(default=0)),
+                ('marks_sq_sum', models.BigIntegerField(default=0)),
+                ('pass_count', models.PositiveIntegerField(default=0)),
+                ('min_marks', models.IntegerField(blank=True, null=True)),
+                ('max_marks', models.IntegerField(blank=True, null=True)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.subject')),
+            ],
+            options={
+                'unique_together': {('subject', 'exam_type', 'semester')},
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
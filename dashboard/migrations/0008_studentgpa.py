@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_resultsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentGPA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(max_length=20)),
+                ('credits', models.PositiveIntegerField()),
+                ('credit_points', models.FloatField()),
+                ('sgpa', models.FloatField()),
+                ('cumulative_credits', models.PositiveIntegerField()),
+                ('cgpa', models.FloatField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.student')),
+            ],
+            options={
+                'unique_together': {('student', 'semester')},
+            },
+        ),
+    ]
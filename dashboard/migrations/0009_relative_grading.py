@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0008_studentgpa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='result',
+            name='grade',
+            field=models.CharField(blank=True, default='', max_length=2),
+        ),
+        migrations.CreateModel(
+            name='GradeCutoff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_type', models.CharField(max_length=50)),
+                ('semester', models.CharField(max_length=20)),
+                ('method', models.CharField(choices=[('percentile', 'Percentile shares'), ('sd', 'Mean and standard deviation')], max_length=10)),
+                ('cutoffs', models.JSONField(default=list)),
+                ('grade_counts', models.JSONField(default=dict)),
+                ('mean', models.FloatField(null=True)),
+                ('std_dev', models.FloatField(null=True)),
+                ('summary_updated_at', models.DateTimeField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.subject')),
+            ],
+            options={
+                'unique_together': {('subject', 'exam_type', 'semester')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0009_relative_grading'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(condition=models.Q(('marks_obtained__gte', 40)), fields=['subject', 'marks_obtained'], name='result_subject_pass_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['subject', 'exam_type', 'semester', 'marks_obtained'], include=('student', 'total_marks'), name='result_subject_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['subject', 'updated_at'], name='result_subject_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department', 'year', 'scheme'], name='student_cohort_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(fields=['faculty', 'name'], name='subject_faculty_name_idx'),
+        ),
+    ]
@@ -0,0 +1,139 @@
+# Store Result.exam_type and Result.semester as small-integer codes.
+
+import dashboard.fields
+from django.db import migrations
+
+# Frozen copies of Result.EXAM_TYPES / Result.SEMESTERS at this migration
+EXAM_TYPES = ['Unit Test', 'Mid Term', 'Internal', 'End Term', 'End Sem']
+SEMESTERS = ['1st', '2nd', '3rd', '4th', '5th', '6th', '7th', '8th']
+COLUMNS = [
+    # (column, labels, default, previous max_length)
+    ('exam_type', EXAM_TYPES, 'Mid Term', 50),
+    ('semester', SEMESTERS, '1st', 20),
+]
+
+
+def _case(schema_editor, column, pairs):
+    whens = ' '.join(
+        f'WHEN {schema_editor.quote_value(old)} THEN {schema_editor.quote_value(new)}' for old, new in pairs
+    )
+    return f'CASE {schema_editor.quote_name(column)} {whens} END'
+
+
+def _code_field(name, labels, default, model):
+    field = dashboard.fields.LabelCodeField(labels=labels, default=default)
+    field.set_attributes_from_name(name)
+    field.model = model
+    return field
+
+
+def _is_postgresql(schema_editor):
+    return schema_editor.connection.vendor == 'postgresql'
+
+
+def _encode(apps, schema_editor, columns):
+    Result = apps.get_model('dashboard', 'Result')
+    for column, labels, _, _ in columns:
+        unknown = list(
+            Result.objects.exclude(**{f'{column}__in': labels}).values_list(column, flat=True).distinct()[:20]
+        )
+        if unknown:
+            raise RuntimeError(
+                f'Result.{column} has values without a code: {unknown}. '
+                f'Append them to the labels of Result.{column} and to this migration first.'
+            )
+
+    table = schema_editor.quote_name(Result._meta.db_table)
+    if _is_postgresql(schema_editor):
+        # One rewrite of the table and its indexes, straight from label to code
+        alters = ', '.join(
+            f'ALTER COLUMN {schema_editor.quote_name(column)} TYPE smallint '
+            f'USING ({_case(schema_editor, column, [(label, code) for code, label in enumerate(labels)])})'
+            for column, labels, _, _ in columns
+        )
+        schema_editor.execute(f'ALTER TABLE {table} {alters}')
+        return
+
+    # Elsewhere store the code as text, then let the schema editor convert
+    # the column type (SQLite rebuilds the table from the historical model,
+    # hence one column per operation)
+    for column, labels, default, max_length in columns:
+        pairs = [(label, str(code)) for code, label in enumerate(labels)]
+        schema_editor.execute(
+            f'UPDATE {table} SET {schema_editor.quote_name(column)} = {_case(schema_editor, column, pairs)}'
+        )
+        schema_editor.alter_field(
+            Result, Result._meta.get_field(column), _code_field(column, labels, default, Result),
+        )
+
+
+def _decode(apps, schema_editor, columns):
+    Result = apps.get_model('dashboard', 'Result')
+    table = schema_editor.quote_name(Result._meta.db_table)
+    if _is_postgresql(schema_editor):
+        alters = ', '.join(
+            f'ALTER COLUMN {schema_editor.quote_name(column)} TYPE varchar({max_length}) '
+            f'USING ({_case(schema_editor, column, list(enumerate(labels)))})'
+            for column, labels, _, max_length in columns
+        )
+        schema_editor.execute(f'ALTER TABLE {table} {alters}')
+        return
+
+    for column, labels, default, _ in columns:
+        # ``apps`` is the state before this operation, where the column is text
+        schema_editor.alter_field(
+            Result, _code_field(column, labels, default, Result), Result._meta.get_field(column),
+        )
+        pairs = [(str(code), label) for code, label in enumerate(labels)]
+        schema_editor.execute(
+            f'UPDATE {table} SET {schema_editor.quote_name(column)} = {_case(schema_editor, column, pairs)}'
+        )
+
+
+# PostgreSQL converts both columns in the first operation
+def encode_exam_type(apps, schema_editor):
+    _encode(apps, schema_editor, COLUMNS if _is_postgresql(schema_editor) else COLUMNS[:1])
+
+
+def decode_exam_type(apps, schema_editor):
+    _decode(apps, schema_editor, COLUMNS if _is_postgresql(schema_editor) else COLUMNS[:1])
+
+
+def encode_semester(apps, schema_editor):
+    if not _is_postgresql(schema_editor):
+        _encode(apps, schema_editor, COLUMNS[1:])
+
+
+def decode_semester(apps, schema_editor):
+    if not _is_postgresql(schema_editor):
+        _decode(apps, schema_editor, COLUMNS[1:])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0010_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(encode_exam_type, decode_exam_type)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='result',
+                    name='exam_type',
+                    field=dashboard.fields.LabelCodeField(default='Mid Term', labels=EXAM_TYPES),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(encode_semester, decode_semester)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='result',
+                    name='semester',
+                    field=dashboard.fields.LabelCodeField(default='1st', labels=SEMESTERS),
+                ),
+            ],
+        ),
+    ]
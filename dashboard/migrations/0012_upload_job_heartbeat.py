@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_result_label_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultuploadjob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resultuploadjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Faculty.department_name was added to the live database by hand; create
+# it wherever it is missing so migrated databases match the models.
+
+from django.db import migrations, models
+
+
+def add_department_name(apps, schema_editor):
+    Faculty = apps.get_model('dashboard', 'Faculty')
+    table = Faculty._meta.db_table
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, table)}
+    if 'department_name' in columns:
+        return
+    field = models.CharField(max_length=100, default='')
+    field.set_attributes_from_name('department_name')
+    schema_editor.add_field(Faculty, field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_upload_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                # The column may predate this migration, so it stays when reversed
+                migrations.RunPython(add_department_name, migrations.RunPython.noop),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='faculty',
+                    name='department_name',
+                    field=models.CharField(default='', max_length=100),
+                    preserve_default=False,
+                ),
+            ],
+        ),
+    ]
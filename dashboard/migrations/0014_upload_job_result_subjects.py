@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_faculty_department_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultuploadjob',
+            name='result_subjects',
+            field=models.JSONField(default=list, editable=False),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-17 11:51
+
+from datetime import timedelta
+
+import dashboard.terms
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+from dashboard.terms import term_start
+
+
+def backfill_terms(apps, schema_editor):
+    # Existing results belong to the term they were created in; terms
+    # start on the first of a month, so one update per month suffices
+    Result = apps.get_model('dashboard', 'Result')
+    months = (Result.objects.order_by().annotate(month=TruncMonth('created_at'))
+              .values_list('month', flat=True).distinct())
+    for month in list(months):
+        following = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+        Result.objects.filter(created_at__gte=month, created_at__lt=following).update(
+            term=term_start(month.date())
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_upload_job_result_subjects'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='result',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='term',
+            field=models.DateField(default=dashboard.terms.current_term),
+        ),
+        migrations.RunPython(backfill_terms, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='result',
+            unique_together={('student', 'subject', 'exam_type', 'semester', 'term')},
+        ),
+    ]
@@ -1,6 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+from .fields import LabelCodeField
+from .terms import current_term
 
 
 class Faculty(models.Model):
@@ -45,9 +49,11 @@ class Subject(models.Model):
     scheme = models.CharField(max_length=20, choices=SCHEME_CHOICES)
     credits = models.IntegerField(default=3)
     faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # part of the results validator
     
     class Meta:
-        unique_together = ['code', 'year', 'scheme']
+        unique_together = ['code', 'year', 'scheme']  # its index also serves lookups by code alone
+        indexes = [models.Index(fields=['faculty', 'name'], name='subject_faculty_name_idx')]
     
     def __str__(self):
         return f"{self.name} ({self.code}) - {self.get_year_display()}"
@@ -62,37 +68,130 @@ class Student(models.Model):
     email = models.EmailField(blank=True)
     phone = models.CharField(max_length=15, blank=True)
     
+    class Meta:
+        indexes = [models.Index(fields=['department', 'year', 'scheme'], name='student_cohort_idx')]
+    
     def __str__(self):
         return f"{self.name} ({self.roll_number})"
 
 
+PASS_MARKS = 40
+
+
 class Result(models.Model):
+    PASS_MARKS = PASS_MARKS
+    # Stored as their position in these lists, which are therefore
+    # append-only; the initial entries are in chronological order
+    EXAM_TYPES = ['Unit Test', 'Mid Term', 'Internal', 'End Term', 'End Sem']
+    SEMESTERS = ['1st', '2nd', '3rd', '4th', '5th', '6th', '7th', '8th']
+
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     marks_obtained = models.IntegerField(
         validators=[MinValueValidator(0), MaxValueValidator(100)]
     )
     total_marks = models.IntegerField(default=100)
-    exam_type = models.CharField(max_length=50, default='Mid Term')
-    semester = models.CharField(max_length=20, default='1st')
+    exam_type = LabelCodeField(labels=EXAM_TYPES, default='Mid Term')
+    semester = LabelCodeField(labels=SEMESTERS, default='1st')
+    # Start date of the academic term the result was entered in
+    term = models.DateField(default=current_term)
+    grade = models.CharField(max_length=2, blank=True, default='')  # set by dashboard.relative_grading
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     @property
     def status(self):
-        return 'Pass' if self.marks_obtained >= 40 else 'Fail'
+        return 'Pass' if self.marks_obtained >= self.PASS_MARKS else 'Fail'
     
     @property
     def percentage(self):
         return round((self.marks_obtained / self.total_marks) * 100, 2)
     
     class Meta:
-        unique_together = ['student', 'subject', 'exam_type', 'semester']
+        unique_together = ['student', 'subject', 'exam_type', 'semester', 'term']
+        indexes = [
+            # Pass counts per subject
+            models.Index(fields=['subject', 'marks_obtained'], condition=models.Q(marks_obtained__gte=PASS_MARKS),
+                         name='result_subject_pass_idx'),
+            # Analytics projection per subject and period, read from the index
+            # alone on PostgreSQL (INCLUDE is dropped on other backends)
+            models.Index(fields=['subject', 'exam_type', 'semester', 'marks_obtained'],
+                         include=['student', 'total_marks'], name='result_subject_period_idx'),
+            # Change validators: latest update within a scope
+            models.Index(fields=['subject', 'updated_at'], name='result_subject_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.subject.name}: {self.marks_obtained}"
 
 
+class ResultSummary(models.Model):
+    """
+    Running aggregates of the Result marks of one subject, exam type and
+    semester, kept up to date by dashboard.summaries on every write.
+    """
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    exam_type = models.CharField(max_length=50)
+    semester = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    marks_sum = models.BigIntegerField(default=0)
+    marks_sq_sum = models.BigIntegerField(default=0)
+    pass_count = models.PositiveIntegerField(default=0)
+    min_marks = models.IntegerField(null=True, blank=True)
+    max_marks = models.IntegerField(null=True, blank=True)
+    histogram = models.JSONField(default=list)  # histogram[m] = results scoring m marks
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['subject', 'exam_type', 'semester']
+
+    def __str__(self):
+        return f"{self.subject.code} {self.exam_type} {self.semester}: {self.count} results"
+
+
+class GradeCutoff(models.Model):
+    """Relative-grading cut-offs of one subject, exam type and semester."""
+    METHOD_CHOICES = [
+        ('percentile', 'Percentile shares'),
+        ('sd', 'Mean and standard deviation'),
+    ]
+
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    exam_type = models.CharField(max_length=50)
+    semester = models.CharField(max_length=20)
+    method = models.CharField(max_length=10, choices=METHOD_CHOICES)
+    cutoffs = models.JSONField(default=list)  # [[letter, minimum marks], ...], best grade first
+    grade_counts = models.JSONField(default=dict)
+    mean = models.FloatField(null=True)
+    std_dev = models.FloatField(null=True)
+    summary_updated_at = models.DateTimeField()  # ResultSummary.updated_at the grades were computed from
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['subject', 'exam_type', 'semester']
+
+    def __str__(self):
+        return f"{self.subject.code} {self.exam_type} {self.semester} ({self.method})"
+
+
+class StudentGPA(models.Model):
+    """Credit-weighted SGPA and running CGPA of a student, stored by dashboard.gpa."""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    semester = models.CharField(max_length=20)
+    credits = models.PositiveIntegerField()
+    credit_points = models.FloatField()
+    sgpa = models.FloatField()
+    cumulative_credits = models.PositiveIntegerField()
+    cgpa = models.FloatField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'semester']
+
+    def __str__(self):
+        return f"{self.student.roll_number} {self.semester}: SGPA {self.sgpa}, CGPA {self.cgpa}"
+
+
 class COPO(models.Model):
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
     co_number = models.CharField(max_length=10)  # CO1, CO2, etc.
@@ -119,4 +218,62 @@ class FacultySelection(models.Model):
         unique_together = ['faculty', 'year', 'scheme', 'department']
     
     def __str__(self):
-        return f"{self.faculty.user.get_full_name()} - {self.get_year_display()} {self.scheme}"
\ No newline at end of file
+        return f"{self.faculty.user.get_full_name()} - {self.get_year_display()} {self.scheme}"
+
+class ResultUploadJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    MODE_CHOICES = [
+        ('full', 'Full'),
+        ('stream', 'Stream'),
+        ('sheets', 'All sheets'),
+    ]
+
+    faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.SET_NULL, null=True, blank=True)  # Selected subject at upload time
+    file = models.FileField(upload_to='result_uploads/%Y/%m/')
+    filename = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True)  # SHA-256 of the uploaded bytes
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='full')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    worker = models.CharField(max_length=100, blank=True)
+    rows_processed = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    updated_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    summary = models.JSONField(null=True, blank=True)
+    # Packed 8-byte digests of the rows this upload applied, and the subjects
+    # they belong to; kept only on the latest completed upload of a scope so
+    # an identical re-upload can be checked against the current results.
+    row_fingerprints = models.BinaryField(null=True, editable=False)
+    result_subjects = models.JSONField(default=list, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched on claim and after every batch; a running job that stops
+    # beating is requeued (see dashboard.jobs.requeue_stale_jobs)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    @property
+    def rows_per_second(self):
+        if not self.started_at:
+            return 0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else 0
+
+    def __str__(self):
+        return f"Upload #{self.pk} {self.filename} ({self.status})"
@@ -0,0 +1,92 @@
+"""
+Keyset (cursor) pagination.
+
+A page is fetched with ``WHERE (sort columns) > (last row's values)`` instead
+of ``OFFSET``, so every page costs the same however deep the client scrolls,
+and rows inserted while paging do not shift later pages.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+
+
+class CursorError(ValueError):
+    """Raised for a cursor that was not produced by ``encode_cursor``."""
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise CursorError('Invalid cursor.')
+    if not isinstance(values, list) or len(values) != length:
+        raise CursorError('Invalid cursor.')
+    return values
+
+
+def _model_field(model, path):
+    *relations, name = path.split(LOOKUP_SEP)
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def check_cursor_values(model, fields, values):
+    """
+    Raise ``CursorError`` unless every value is exactly what its field
+    holds: an int for an integer column, a str for a text column and so on.
+    A mistyped value would otherwise be coerced and silently land on the
+    wrong page.
+    """
+    for path, value in zip(fields, values):
+        if value is None or isinstance(value, bool):
+            raise CursorError('Invalid cursor.')
+        try:
+            parsed = _model_field(model, path).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise CursorError('Invalid cursor.')
+        if type(parsed) is not type(value) or parsed != value:
+            raise CursorError('Invalid cursor.')
+
+
+def keyset_after(fields, values, descending=False):
+    """
+    Q matching rows that sort strictly after ``values`` on ``fields``.
+
+    ``fields`` must end in a unique column so that the ordering is total.
+    """
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for prev_field, prev_value in zip(fields[:i], values[:i]):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    return condition
+
+
+def keyset_page(queryset, fields, limit, cursor=None, descending=False):
+    """
+    Return ``(rows, next_cursor)`` for one page of ``queryset``.
+
+    ``queryset`` should be a ``values()`` query that includes every field in
+    ``fields``; ``next_cursor`` is None on the last page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(fields))
+        check_cursor_values(queryset.model, fields, values)
+        queryset = queryset.filter(keyset_after(fields, values, descending))
+    ordering = [f'-{field}' if descending else field for field in fields]
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][field] for field in fields])
@@ -0,0 +1,201 @@
+"""
+Optional PostgreSQL partitioning of ``dashboard_result`` by academic term.
+
+A result's term is ``Result.term``, the start of the academic term it was
+entered in (see ``dashboard.terms``). ``convert_to_partitioned()`` rebuilds
+the table as ``PARTITION BY LIST (term)`` with a partition for every term
+that has results, the current term and ``RESULT_PARTITIONS_AHEAD`` upcoming
+ones, plus a DEFAULT partition for results of any other term.
+``ensure_partitions()`` keeps the upcoming partitions ready, and
+``detach_partitions()`` detaches the terms older than the latest few,
+optionally archiving them to another schema or dropping them.
+``manage.py result_partitions`` drives all three.
+
+The ORM is unaffected, and queries that filter on ``term`` only read the
+partitions of those terms. PostgreSQL requires unique constraints of a
+partitioned table to include the partition key: the ``(student, subject,
+exam_type, semester, term)`` constraint already does and is kept as it is,
+so duplicates are still rejected across the whole table. The primary key
+becomes ``(id, term)``; ids stay unique as they all come from the table's
+identity sequence.
+"""
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Result
+from .terms import current_term, next_term, previous_term
+
+TABLE = Result._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_KEY = Result._meta.get_field('term').column
+_NAME = re.compile(rf'^{re.escape(TABLE)}_(\d{{4}})_(\d{{2}})$')
+
+
+def partition_name(term):
+    """Name of the partition holding the results of ``term``, e.g. ``dashboard_result_2026_07``."""
+    return f'{TABLE}_{term:%Y_%m}'
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [_quote(TABLE)]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions():
+    """
+    ``[(name, term)]`` of the attached partitions this module created,
+    oldest term first; ``term`` is None for the DEFAULT partition, which
+    comes last.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+        """, [_quote(TABLE)])
+        names = [name for name, in cursor.fetchall()]
+    found = []
+    for name in names:
+        match = _NAME.match(name)
+        if match:
+            found.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    found.sort(key=lambda partition: partition[1])
+    if DEFAULT_PARTITION in names:
+        found.append((DEFAULT_PARTITION, None))
+    return found
+
+
+def upcoming_terms(ahead=None):
+    """The current term and the ``ahead`` (``RESULT_PARTITIONS_AHEAD``) terms after it."""
+    ahead = settings.RESULT_PARTITIONS_AHEAD if ahead is None else ahead
+    terms = [current_term()]
+    for _ in range(ahead):
+        terms.append(next_term(terms[-1]))
+    return terms
+
+
+def _create_partition(cursor, term):
+    """
+    Create the partition of ``term``. Rows of that term already in the
+    DEFAULT partition would violate its new bounds, so they are moved while
+    it is detached.
+    """
+    name = partition_name(term)
+    table, default = _quote(TABLE), _quote(DEFAULT_PARTITION)
+    cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {default}')
+    cursor.execute(f"CREATE TABLE {_quote(name)} PARTITION OF {table} FOR VALUES IN ('{term.isoformat()}')")
+    cursor.execute(f'INSERT INTO {table} SELECT * FROM {default} WHERE {_quote(PARTITION_KEY)} = %s', [term])
+    cursor.execute(f'DELETE FROM {default} WHERE {_quote(PARTITION_KEY)} = %s', [term])
+    cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT')
+    return name
+
+
+def ensure_partitions(ahead=None):
+    """
+    Create the missing partitions of the current term and the ``ahead``
+    upcoming ones; returns the names created. Each new partition holds an
+    exclusive lock on the table while its rows leave the DEFAULT partition.
+    """
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for term in upcoming_terms(ahead):
+            cursor.execute('SELECT to_regclass(%s)', [_quote(partition_name(term))])
+            if cursor.fetchone()[0] is None:
+                created.append(_create_partition(cursor, term))
+    return created
+
+
+def convert_to_partitioned(ahead=None):
+    """
+    Rebuild ``dashboard_result`` as a partitioned table, keeping its rows,
+    identity sequence, indexes and constraints. Runs in one transaction and
+    holds an exclusive lock on the table while it copies the rows.
+    """
+    if connection.vendor != 'postgresql':
+        raise RuntimeError('Result partitioning needs PostgreSQL.')
+    if is_partitioned():
+        raise RuntimeError(f'{TABLE} is already partitioned.')
+
+    table, old = _quote(TABLE), _quote(f'{TABLE}_unpartitioned')
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Deferred foreign key checks of earlier writes in this transaction
+        # would keep the old table from being dropped
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        # Constraints and plain indexes, to be recreated on the new table
+        cursor.execute("""
+            SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = %s::regclass ORDER BY contype, conname
+        """, [table])
+        constraints = cursor.fetchall()
+        cursor.execute("""
+            SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i
+            WHERE i.indrelid = %s::regclass
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+        """, [table])
+        indexes = [definition for definition, in cursor.fetchall()]
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM ' + table)
+        max_id = cursor.fetchone()[0]
+        cursor.execute(f'SELECT DISTINCT {_quote(PARTITION_KEY)} FROM {table}')
+        terms = {term for term, in cursor.fetchall()}.union(upcoming_terms(ahead))
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+            f'PARTITION BY LIST ({_quote(PARTITION_KEY)})'
+        )
+        cursor.execute(f'CREATE TABLE {_quote(DEFAULT_PARTITION)} PARTITION OF {table} DEFAULT')
+        for term in sorted(terms):
+            cursor.execute(
+                f"CREATE TABLE {_quote(partition_name(term))} PARTITION OF {table} "
+                f"FOR VALUES IN ('{term.isoformat()}')"
+            )
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old}')
+
+        for name, kind, definition in constraints:
+            # The primary key must include the partition key; the unique
+            # constraints already do
+            if kind == 'p':
+                definition = re.sub(r'\)$', f', {_quote(PARTITION_KEY)})', definition)
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {_quote(name)} {definition}')
+        for definition in indexes:
+            cursor.execute(definition)
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, %s)", [table, max(max_id, 1), max_id > 0]
+        )
+        cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+def detach_partitions(keep_terms, archive_schema=None, drop=False):
+    """
+    Detach the partitions of terms older than the latest ``keep_terms``
+    (the current term included). They are moved to ``archive_schema`` when
+    given, dropped with ``drop``, and otherwise left in place as plain
+    tables. Returns the detached names.
+    """
+    if keep_terms < 1:
+        raise ValueError('At least the current term must be kept.')
+    oldest = current_term()
+    for _ in range(keep_terms - 1):
+        oldest = previous_term(oldest)
+    names = [name for name, term in partitions() if term is not None and term < oldest]
+    with transaction.atomic(), connection.cursor() as cursor:
+        if archive_schema:
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {_quote(archive_schema)}')
+        for name in names:
+            cursor.execute(f'ALTER TABLE {_quote(TABLE)} DETACH PARTITION {_quote(name)}')
+            if drop:
+                cursor.execute(f'DROP TABLE {_quote(name)}')
+            elif archive_schema:
+                cursor.execute(f'ALTER TABLE {_quote(name)} SET SCHEMA {_quote(archive_schema)}')
+    return names
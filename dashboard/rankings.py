@@ -0,0 +1,134 @@
+"""
+Class ranks and toppers.
+
+``RANK()``, ``DENSE_RANK()`` and ``PERCENT_RANK()`` are computed by the
+database, either over results partitioned by subject (and exam), or over
+each student's aggregated marks partitioned by year within the department.
+Top-N and single-student lookups filter the ranked rows in the same query,
+so ranks are always taken over the whole partition.
+"""
+
+from .models import Result, Student, Subject
+from .routers import read_connection
+
+DEFAULT_TOP = 10
+
+
+def _filters(exam_type, semester):
+    # Unknown labels have no code and match nothing
+    sql, params = '', []
+    if exam_type:
+        sql += ' AND r.exam_type = %s'
+        params.append(Result._meta.get_field('exam_type').code_of(exam_type))
+    if semester:
+        sql += ' AND r.semester = %s'
+        params.append(Result._meta.get_field('semester').code_of(semester))
+    return sql, params
+
+
+def _pick(top, student_id):
+    if student_id is not None:
+        return 'WHERE student_id = %s', [student_id]
+    return 'WHERE ranking <= %s', [top]
+
+
+def _fetch(sql, params):
+    with read_connection(Result).cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def _tables():
+    quote = read_connection(Result).ops.quote_name
+    return quote(Result._meta.db_table), quote(Student._meta.db_table), quote(Subject._meta.db_table)
+
+
+def subject_rankings(subjects, top=DEFAULT_TOP, student_id=None, exam_type=None, semester=None):
+    """
+    Ranks of results within each subject, exam type and semester: the top
+    ``top`` ranks (ties included), or ``student_id``'s rank in every
+    partition they appear in.
+    """
+    result_table, student_table, subject_table = _tables()
+    subject_sql, subject_params = subjects.values('id').query.sql_with_params()
+    filter_sql, filter_params = _filters(exam_type, semester)
+    pick_sql, pick_params = _pick(top, student_id)
+
+    rows = _fetch(f"""
+        WITH ranked AS (
+            SELECT r.subject_id, r.exam_type, r.semester, r.student_id, r.marks_obtained, r.total_marks,
+                   RANK() OVER p AS ranking,
+                   DENSE_RANK() OVER p AS dense_ranking,
+                   PERCENT_RANK() OVER p AS percent_ranking,
+                   COUNT(*) OVER (PARTITION BY r.subject_id, r.exam_type, r.semester) AS out_of
+            FROM {result_table} r
+            WHERE r.subject_id IN ({subject_sql}){filter_sql}
+            WINDOW p AS (PARTITION BY r.subject_id, r.exam_type, r.semester ORDER BY r.marks_obtained DESC)
+        ),
+        picked AS (
+            SELECT * FROM ranked {pick_sql}
+        )
+        SELECT sub.code AS course_code, sub.name AS course_name, picked.exam_type, picked.semester,
+               st.roll_number AS roll_no, st.name, picked.marks_obtained AS marks, picked.total_marks,
+               picked.ranking, picked.dense_ranking, picked.percent_ranking, picked.out_of
+        FROM picked
+        JOIN {student_table} st ON st.id = picked.student_id
+        JOIN {subject_table} sub ON sub.id = picked.subject_id
+        ORDER BY sub.code, picked.semester, picked.exam_type, picked.ranking, st.roll_number
+    """, list(subject_params) + filter_params + pick_params)
+    return [_finish(row) for row in rows]
+
+
+def department_rankings(subjects, top=DEFAULT_TOP, student_id=None, exam_type=None, semester=None):
+    """
+    Ranks of students by their aggregate percentage over ``subjects``,
+    partitioned by year (one class per year of the department).
+    """
+    result_table, student_table, _ = _tables()
+    subject_sql, subject_params = subjects.values('id').query.sql_with_params()
+    filter_sql, filter_params = _filters(exam_type, semester)
+    pick_sql, pick_params = _pick(top, student_id)
+
+    rows = _fetch(f"""
+        WITH totals AS (
+            SELECT r.student_id, st.year, COUNT(*) AS subjects,
+                   SUM(r.marks_obtained) AS marks, SUM(r.total_marks) AS total_marks,
+                   COALESCE(SUM(r.marks_obtained) * 100.0 / NULLIF(SUM(r.total_marks), 0), 0) AS percentage
+            FROM {result_table} r
+            JOIN {student_table} st ON st.id = r.student_id
+            WHERE r.subject_id IN ({subject_sql}){filter_sql}
+            GROUP BY r.student_id, st.year
+        ),
+        ranked AS (
+            SELECT totals.*,
+                   RANK() OVER p AS ranking,
+                   DENSE_RANK() OVER p AS dense_ranking,
+                   PERCENT_RANK() OVER p AS percent_ranking,
+                   COUNT(*) OVER (PARTITION BY year) AS out_of
+            FROM totals
+            WINDOW p AS (PARTITION BY year ORDER BY percentage DESC)
+        ),
+        picked AS (
+            SELECT * FROM ranked {pick_sql}
+        )
+        SELECT picked.year, st.roll_number AS roll_no, st.name, picked.subjects, picked.marks,
+               picked.total_marks, picked.percentage, picked.ranking, picked.dense_ranking,
+               picked.percent_ranking, picked.out_of
+        FROM picked
+        JOIN {student_table} st ON st.id = picked.student_id
+        ORDER BY picked.year, picked.ranking, st.roll_number
+    """, list(subject_params) + filter_params + pick_params)
+    return [_finish(row) for row in rows]
+
+
+def _finish(row):
+    row['rank'] = row.pop('ranking')
+    row['dense_rank'] = row.pop('dense_ranking')
+    row['percent_rank'] = round(float(row.pop('percent_ranking')), 4)
+    if 'exam_type' in row:
+        row['exam_type'] = Result._meta.get_field('exam_type').label_of(row['exam_type'])
+        row['semester'] = Result._meta.get_field('semester').label_of(row['semester'])
+    if 'percentage' in row:
+        row['percentage'] = round(float(row['percentage']), 2)
+    return row
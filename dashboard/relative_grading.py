@@ -0,0 +1,219 @@
+"""
+Relative (curved) grading.
+
+Subjects of the relatively graded schemes get letter grade cut-offs derived
+from their own class distribution, per exam type and semester: either by
+percentile shares (the top 5% of passing students get an O, and so on) or by
+offsets from the mean in standard deviations. Results below
+``Result.PASS_MARKS`` are always an F.
+
+Cut-offs are computed from the per-mark histograms in ``ResultSummary``
+without reading the result rows, and every result of a subject is graded by
+a single ``UPDATE ... CASE``. Cut-offs are stored in ``GradeCutoff`` and the
+letters in ``Result.grade``, so reading grades is a plain column read.
+
+Each ``GradeCutoff`` remembers the ``ResultSummary.updated_at`` it was
+computed from; since every marks change moves that timestamp,
+``regrade_stale()`` regrades exactly the subjects whose marks changed.
+
+The defaults can be overridden with the ``RELATIVE_GRADE_BANDS``,
+``RELATIVE_GRADING_SCHEMES`` and ``RELATIVE_GRADING_METHOD`` settings.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Subquery, Value, When
+
+from .gpa import FAIL_GRADE
+from .models import GradeCutoff, Result, ResultSummary
+
+# (letter, percentage of passing students, mean + k standard deviations),
+# best grade first; the last band runs down to the pass mark
+DEFAULT_RELATIVE_BANDS = [
+    ('O', 5, 1.5), ('A+', 10, 1.0), ('A', 15, 0.5), ('B+', 20, 0.0),
+    ('B', 20, -0.5), ('C', 15, -1.0), ('P', 15, None),
+]
+DEFAULT_SCHEMES = ['AUTONOMOUS']
+METHODS = [method for method, _ in GradeCutoff.METHOD_CHOICES]
+
+
+def relative_bands():
+    return getattr(settings, 'RELATIVE_GRADE_BANDS', DEFAULT_RELATIVE_BANDS)
+
+
+def relative_schemes():
+    return getattr(settings, 'RELATIVE_GRADING_SCHEMES', DEFAULT_SCHEMES)
+
+
+def default_method():
+    return getattr(settings, 'RELATIVE_GRADING_METHOD', 'percentile')
+
+
+def _quantile(counts, fraction):
+    """``percentile_cont(fraction)`` of the marks described by ``counts[m]``."""
+    cumulative = np.cumsum(counts)
+    rank = fraction * (int(cumulative[-1]) - 1)
+    lower = np.searchsorted(cumulative, math.floor(rank), side='right')
+    upper = np.searchsorted(cumulative, math.ceil(rank), side='right')
+    return lower + (upper - lower) * (rank - math.floor(rank))
+
+
+def compute_cutoffs(histogram, method):
+    """
+    Cut-offs for the marks in ``histogram``: ``(cutoffs, mean, std_dev)``
+    where ``cutoffs`` is ``[[letter, minimum marks], ...]`` best grade first.
+
+    Only passing marks shape the curve. Cut-offs are whole marks, never
+    below the pass mark and never above the cut-off of a better grade, so
+    equal marks always get the same letter.
+    """
+    if method not in METHODS:
+        raise ValueError(f'Unknown grading method "{method}".')
+    counts = np.zeros(max(len(histogram), Result.PASS_MARKS + 1), dtype=np.int64)
+    counts[:len(histogram)] = histogram
+    passing = counts.copy()
+    passing[:Result.PASS_MARKS] = 0
+    n = int(passing.sum())
+    bands = relative_bands()
+    if not n:
+        return [[letter, Result.PASS_MARKS] for letter, _, _ in bands], None, None
+
+    marks = np.arange(len(passing))
+    mean = float((marks * passing).sum()) / n
+    std_dev = math.sqrt(max(float((marks * marks * passing).sum()) / n - mean * mean, 0))
+
+    cutoffs, share, ceiling = [], 0, None
+    for i, (letter, percent, offset) in enumerate(bands):
+        share += percent
+        if i == len(bands) - 1:
+            minimum = Result.PASS_MARKS
+        elif method == 'percentile':
+            minimum = math.ceil(_quantile(passing, max(0, 1 - share / 100)))
+        else:
+            minimum = math.ceil(round(mean + offset * std_dev, 6))
+        minimum = max(minimum, Result.PASS_MARKS)
+        if ceiling is not None:
+            minimum = min(minimum, ceiling)
+        cutoffs.append([letter, minimum])
+        ceiling = minimum
+    return cutoffs, round(mean, 2), round(std_dev, 2)
+
+
+def grade_counts(histogram, cutoffs):
+    """Number of results per letter (and F) under ``cutoffs``."""
+    # below[m] = results scoring less than m
+    below = np.concatenate([[0], np.cumsum(histogram, dtype=np.int64)])
+    total = int(below[-1])
+    counts, graded = {}, 0
+    for letter, minimum in cutoffs:
+        at_least = total - int(below[min(minimum, len(histogram))])
+        counts[letter] = at_least - graded
+        graded = at_least
+    counts[FAIL_GRADE[1]] = total - graded
+    return counts
+
+
+def grade_case(cutoffs):
+    """``Result.grade`` expression assigning the letters of ``cutoffs``."""
+    return Case(
+        *[When(marks_obtained__gte=minimum, then=Value(letter)) for letter, minimum in cutoffs],
+        default=Value(FAIL_GRADE[1]),
+    )
+
+
+def regrade(summary, method=None):
+    """
+    Recompute the cut-offs of one ``ResultSummary`` and grade its results,
+    by ``method``, else the method it was last graded with, else the default.
+    """
+    method = method or getattr(summary, 'graded_method', None) or default_method()
+    cutoffs, mean, std_dev = compute_cutoffs(summary.histogram, method)
+    with transaction.atomic():
+        Result.objects.filter(
+            subject_id=summary.subject_id, exam_type=summary.exam_type, semester=summary.semester,
+        ).update(grade=grade_case(cutoffs))
+        cutoff, _ = GradeCutoff.objects.update_or_create(
+            subject_id=summary.subject_id, exam_type=summary.exam_type, semester=summary.semester,
+            defaults={
+                'method': method,
+                'cutoffs': cutoffs,
+                'grade_counts': grade_counts(summary.histogram, cutoffs),
+                'mean': mean,
+                'std_dev': std_dev,
+                'summary_updated_at': summary.updated_at,
+            },
+        )
+    return cutoff
+
+
+def _same_group():
+    return {'subject_id': OuterRef('subject_id'), 'exam_type': OuterRef('exam_type'), 'semester': OuterRef('semester')}
+
+
+def graded_summaries(subject_ids=None):
+    """
+    Summaries of the relatively graded subjects, annotated with the
+    ``graded_from`` timestamp and ``graded_method`` of their cut-offs.
+    """
+    summaries = ResultSummary.objects.filter(subject__scheme__in=relative_schemes())
+    if subject_ids is not None:
+        summaries = summaries.filter(subject_id__in=subject_ids)
+    graded = GradeCutoff.objects.filter(**_same_group())
+    return summaries.annotate(
+        graded_from=Subquery(graded.values('summary_updated_at')[:1]),
+        graded_method=Subquery(graded.values('method')[:1]),
+    )
+
+
+def stale_summaries(subject_ids=None):
+    """Graded summaries whose marks changed since they were last graded."""
+    return graded_summaries(subject_ids).filter(
+        Q(graded_from__isnull=True) | ~Q(graded_from=F('updated_at'))
+    )
+
+
+def regrade_stale(subject_ids=None, method=None, force=False):
+    """
+    Regrade the subjects (optionally only ``subject_ids``) whose marks
+    changed since they were last graded, or all of them with ``force``.
+    Returns the number of subject/exam/semester groups regraded.
+    """
+    summaries = graded_summaries(subject_ids) if force else stale_summaries(subject_ids)
+    regraded = 0
+    for summary in summaries.only('subject_id', 'exam_type', 'semester', 'histogram', 'updated_at'):
+        regrade(summary, method)
+        regraded += 1
+
+    # Cut-offs whose results were all deleted, or whose subject is no longer
+    # relatively graded
+    orphans = GradeCutoff.objects.exclude(Exists(
+        ResultSummary.objects.filter(subject__scheme__in=relative_schemes(), **_same_group())
+    ))
+    if subject_ids is not None:
+        orphans = orphans.filter(subject_id__in=subject_ids)
+    orphans.delete()
+    return regraded
+
+
+def regrade_on_commit(subject_ids):
+    """
+    Regrade the stale groups of ``subject_ids`` once the current transaction
+    commits. Every call within one transaction joins the same regrade, which
+    covers the union of their subjects.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_pending_regrade', None)
+    # A callback that already ran, or went with a rolled back savepoint, is
+    # no longer queued
+    queued = pending is not None and any(func is pending for _, func, _ in connection.run_on_commit)
+    if not queued:
+        def pending():
+            regrade_stale(pending.subject_ids)
+        pending.subject_ids = set()
+        connection._pending_regrade = pending
+    pending.subject_ids.update(subject_ids)
+    if not queued:
+        # Outside a transaction this runs right away
+        transaction.on_commit(pending)
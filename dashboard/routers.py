@@ -0,0 +1,100 @@
+"""
+Read-replica routing.
+
+When ``DATABASE_REPLICA_URL`` is set, the views wrapped in
+``read_from_replica`` (analytics, exports and reports) read from the
+``replica`` database; every other read and all writes use ``default``.
+A session that has just written stays on the primary for
+``DATABASE_REPLICA_LAG`` seconds so it always sees its own changes: any
+non-GET request starts that window, and so does a finished upload job
+(``pin_to_primary(request, since=job.finished_at)``).
+
+Raw SQL goes through ``read_connection(model)`` to follow the same routing.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+
+REPLICA = 'replica'
+PIN_KEY = '_db_primary_until'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def reading_replica():
+    """True while reads are routed to the replica."""
+    return _use_replica.get() and replica_configured()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return REPLICA if reading_replica() else None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from replication
+        return db != REPLICA
+
+
+@contextmanager
+def replica_reads():
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_connection(model):
+    """Connection an ORM read of ``model`` would use right now."""
+    return connections[router.db_for_read(model)]
+
+
+def pin_to_primary(request, since=None):
+    """Keep the session's reads on the primary for the replica lag after a write."""
+    until = (since.timestamp() if since else time.time()) + settings.DATABASE_REPLICA_LAG
+    if until > request.session.get(PIN_KEY, 0):
+        request.session[PIN_KEY] = until
+
+
+def read_from_replica(view):
+    """
+    Route the view's reads to the replica unless the session is pinned to
+    the primary. Streaming views must bind their querysets with
+    ``.using(queryset.db)`` before returning, as the stream is read after
+    the view exits.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or request.session.get(PIN_KEY, 0) > time.time():
+            return view(request, *args, **kwargs)
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class PrimaryAfterWriteMiddleware:
+    """Pin the session to the primary after every request that may write."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_configured():
+            pin_to_primary(request)
+        return response
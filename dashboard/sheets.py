@@ -0,0 +1,24 @@
+"""
+Workbook helpers that run in worker processes.
+
+This module deliberately imports nothing from Django so that spawned
+processes can unpickle and call ``parse_sheet`` without configuring settings.
+"""
+from openpyxl import load_workbook
+
+
+def sheet_names(path):
+    wb = load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def parse_sheet(path, name):
+    """Return ``(name, rows)`` with every row of one sheet as a value tuple."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return name, list(wb[name].iter_rows(values_only=True))
+    finally:
+        wb.close()
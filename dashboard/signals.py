@@ -0,0 +1,80 @@
+"""
+Keep ``ResultSummary`` and the relative grades in step with single-row
+``Result`` writes (admin, marks entry). Bulk writers apply a ``SummaryDelta``
+themselves, since ``bulk_create``/``bulk_update`` do not send these signals.
+
+Deleting a subject or a student cascades to its results. Those are handled
+in bulk when the subject or student is deleted, and the per-result handler
+skips every deletion that did not start from a ``Result``.
+"""
+from django.db import transaction
+from django.db.models import Count, QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .analytics_cache import bump_versions
+from .models import Result, Student, Subject
+from .relative_grading import regrade_on_commit
+from .summaries import SummaryDelta
+
+
+@receiver(pre_save, sender=Result)
+def remember_previous_marks(sender, instance, raw=False, **kwargs):
+    instance._summary_previous = None
+    if raw or instance.pk is None:
+        return
+    instance._summary_previous = (
+        Result.objects.filter(pk=instance.pk)
+        .values_list('subject_id', 'exam_type', 'semester', 'marks_obtained')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Result)
+def update_summary_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    delta = SummaryDelta()
+    previous = getattr(instance, '_summary_previous', None)
+    if previous is not None:
+        delta.remove(*previous)
+    delta.add(instance.subject_id, instance.exam_type, instance.semester, instance.marks_obtained)
+    delta.apply()
+    regrade_on_commit({instance.subject_id} | ({previous[0]} if previous else set()))
+
+
+def _deleting_results(origin):
+    return isinstance(origin, Result) or (isinstance(origin, QuerySet) and origin.model is Result)
+
+
+@receiver(post_delete, sender=Result)
+def update_summary_on_delete(sender, instance, origin=None, **kwargs):
+    if not _deleting_results(origin):
+        return  # part of a subject or student cascade, see below
+    delta = SummaryDelta()
+    delta.remove(instance.subject_id, instance.exam_type, instance.semester, instance.marks_obtained)
+    delta.apply()
+    regrade_on_commit({instance.subject_id})
+
+
+@receiver(pre_delete, sender=Subject)
+def drop_subject_summaries(sender, instance, **kwargs):
+    # The summaries and cut-offs go with the subject in the same cascade;
+    # only the cached analytics need to know
+    subject_id = instance.pk
+    transaction.on_commit(lambda: bump_versions({subject_id}))
+
+
+@receiver(pre_delete, sender=Student)
+def remove_student_from_summaries(sender, instance, **kwargs):
+    delta, subject_ids = SummaryDelta(), set()
+    for subject_id, exam_type, semester, marks, n in (
+        Result.objects.filter(student=instance).order_by()
+        .values_list('subject_id', 'exam_type', 'semester', 'marks_obtained')
+        .annotate(n=Count('id'))
+    ):
+        delta.add(subject_id, exam_type, semester, marks, n=-n)
+        subject_ids.add(subject_id)
+    delta.apply()
+    if subject_ids:
+        regrade_on_commit(subject_ids)
@@ -0,0 +1,178 @@
+"""
+Incremental maintenance of ``ResultSummary`` rows.
+
+Every summary keeps a histogram of marks (``histogram[m]`` results scored
+``m``) and the count, sum, sum of squares, pass count, min and max derived
+from it, so applying a change only touches the histogram and min/max stay
+exact when results are deleted. Single-row saves and deletes are picked up
+by the signal handlers in ``dashboard.signals``; bulk writers (the upload
+ingest) collect a ``SummaryDelta`` and apply it in the same transaction.
+
+``QuerySet.update()`` bypasses both, so code that rewrites marks that way
+must apply a delta itself; ``manage.py rebuild_result_summaries`` checks and
+repairs the table from the raw rows.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .analytics_cache import bump_all, bump_versions
+from .models import Result, ResultSummary
+
+HISTOGRAM_BINS = 101  # marks 0..100
+
+
+def _key(summary):
+    return (summary.subject_id, summary.exam_type, summary.semester)
+
+
+def _trim(histogram):
+    while len(histogram) > HISTOGRAM_BINS and not histogram[-1]:
+        histogram.pop()
+    return histogram
+
+
+def _fill(summary, histogram):
+    """Set every aggregate field of ``summary`` from ``histogram``."""
+    histogram = _trim(histogram)
+    scored = [marks for marks, n in enumerate(histogram) if n]
+    summary.histogram = histogram
+    summary.count = sum(histogram)
+    summary.marks_sum = sum(marks * n for marks, n in enumerate(histogram))
+    summary.marks_sq_sum = sum(marks * marks * n for marks, n in enumerate(histogram))
+    summary.pass_count = sum(histogram[Result.PASS_MARKS:])
+    summary.min_marks = scored[0] if scored else None
+    summary.max_marks = scored[-1] if scored else None
+
+
+def _apply_counts(histogram, counts):
+    histogram = list(histogram) + [0] * (HISTOGRAM_BINS - len(histogram))
+    for marks, n in counts.items():
+        if marks >= len(histogram):
+            histogram.extend([0] * (marks + 1 - len(histogram)))
+        histogram[marks] += n
+    return histogram
+
+
+class SummaryDelta:
+    """Pending changes to the summaries, keyed by subject, exam type and semester."""
+
+    def __init__(self):
+        self._changes = defaultdict(Counter)
+
+    def add(self, subject_id, exam_type, semester, marks, n=1):
+        if marks < 0:
+            raise ValueError(f'Marks must not be negative (got {marks})')
+        self._changes[(subject_id, exam_type, semester)][marks] += n
+
+    def remove(self, subject_id, exam_type, semester, marks):
+        self.add(subject_id, exam_type, semester, marks, n=-1)
+
+    def __bool__(self):
+        return any(any(counts.values()) for counts in self._changes.values())
+
+    def apply(self):
+        """Fold the pending changes into the summary table and reset."""
+        # Keys whose changes cancel out (a save that keeps the marks, two
+        # results swapping marks) are still touched: the results validator
+        # relies on every write moving ``updated_at``
+        changes = {key: counts for key, counts in self._changes.items() if counts}
+        self._changes = defaultdict(Counter)
+        if not changes:
+            return
+
+        with transaction.atomic():
+            # Create the rows that gain results first so concurrent writers
+            # then serialise on the row lock instead of racing on the insert.
+            # Removal-only keys are not created: their summary may already be
+            # gone with a subject that is being deleted.
+            ResultSummary.objects.bulk_create([
+                ResultSummary(subject_id=subject_id, exam_type=exam_type, semester=semester)
+                for (subject_id, exam_type, semester), counts in changes.items()
+                if any(n > 0 for n in counts.values())
+            ], ignore_conflicts=True)
+
+            summaries = ResultSummary.objects.select_for_update().filter(
+                subject_id__in={key[0] for key in changes},
+                exam_type__in={key[1] for key in changes},
+                semester__in={key[2] for key in changes},
+            )
+            now = timezone.now()
+            changed, emptied = [], []
+            for summary in summaries:
+                counts = changes.get(_key(summary))
+                if counts is None:
+                    continue
+                _fill(summary, _apply_counts(summary.histogram, counts))
+                summary.updated_at = now
+                (changed if summary.count > 0 else emptied).append(summary)
+
+            if emptied:
+                ResultSummary.objects.filter(pk__in=[s.pk for s in emptied]).delete()
+            if changed:
+                ResultSummary.objects.bulk_update(changed, [
+                    'count', 'marks_sum', 'marks_sq_sum', 'pass_count',
+                    'min_marks', 'max_marks', 'histogram', 'updated_at',
+                ])
+
+            # Readers must not cache the old figures under the new version,
+            # so the bump waits for the outermost transaction to commit
+            subject_ids = {key[0] for key in changes}
+            transaction.on_commit(lambda: bump_versions(subject_ids))
+
+
+def summaries_from_results(results=None):
+    """Build unsaved summaries from raw Result rows with one grouped query."""
+    results = Result.objects.all() if results is None else results
+    counts = defaultdict(Counter)
+    for subject_id, exam_type, semester, marks, n in (
+        results.order_by()
+        .values_list('subject_id', 'exam_type', 'semester', 'marks_obtained')
+        .annotate(n=Count('id'))
+    ):
+        counts[(subject_id, exam_type, semester)][marks] += n
+
+    summaries = {}
+    for (subject_id, exam_type, semester), marks_counts in counts.items():
+        summary = ResultSummary(subject_id=subject_id, exam_type=exam_type, semester=semester)
+        _fill(summary, _apply_counts([], marks_counts))
+        summaries[(subject_id, exam_type, semester)] = summary
+    return summaries
+
+
+SUMMARY_FIELDS = ['count', 'marks_sum', 'marks_sq_sum', 'pass_count', 'min_marks', 'max_marks', 'histogram']
+
+
+def verify_summaries():
+    """
+    Compare the stored summaries with the raw rows.
+
+    Returns a list of ``(key, field, stored, expected)`` mismatches; a whole
+    summary that is missing or stale reports its ``count``.
+    """
+    expected = summaries_from_results()
+    stored = {_key(s): s for s in ResultSummary.objects.all()}
+    mismatches = []
+    for key in sorted(expected.keys() | stored.keys(), key=str):
+        have, want = stored.get(key), expected.get(key)
+        if have is None or want is None:
+            mismatches.append((key, 'count', have.count if have else None, want.count if want else None))
+            continue
+        for field in SUMMARY_FIELDS:
+            value = getattr(have, field)
+            if field == 'histogram':
+                value = _trim(_apply_counts(value, {}))
+            if value != getattr(want, field):
+                mismatches.append((key, field, value, getattr(want, field)))
+    return mismatches
+
+
+def rebuild_summaries():
+    """Replace the whole summary table with one computed from the raw rows."""
+    with transaction.atomic():
+        ResultSummary.objects.all().delete()
+        summaries = ResultSummary.objects.bulk_create(summaries_from_results().values(), batch_size=1000)
+        transaction.on_commit(bump_all)
+    return len(summaries)
@@ -0,0 +1,41 @@
+"""
+Academic terms.
+
+A term starts on the first day of one of the ``RESULT_TERM_START_MONTHS``
+and lasts until the next such day; it is identified by its start date,
+which ``Result.term`` stores. Unlike ``Result.semester`` (a student's year
+of study), the term says when a result was recorded.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def _months():
+    return sorted(settings.RESULT_TERM_START_MONTHS)
+
+
+def term_start(day=None):
+    """Start of the term containing ``day`` (default: today)."""
+    day = day or timezone.localdate()
+    months = [month for month in _months() if month <= day.month]
+    if months:
+        return date(day.year, months[-1], 1)
+    return date(day.year - 1, _months()[-1], 1)
+
+
+def next_term(start):
+    later = [month for month in _months() if month > start.month]
+    if later:
+        return date(start.year, later[0], 1)
+    return date(start.year + 1, _months()[0], 1)
+
+
+def previous_term(start):
+    return term_start(start - timedelta(days=1))
+
+
+def current_term():
+    """Start of the term in progress; the default of ``Result.term``."""
+    return term_start()
@@ -1,3 +1,1482 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import unittest
+from collections import Counter
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import workbooks
+from .analytics import results_validator
+from .db_pool import pool_stats
+from .distribution import QUANTILES, _histogram_distribution, _postgres_distribution, bucket_edges
+from .exports import EXPORT_HEADERS, ROWS_PER_WRITE, stream_json
+from .gpa import cohort_gpa_rows, compute_cohort_gpa
+from .ingest import (
+    DEFAULT_BATCH_SIZE, REQUIRED_HEADERS, ResultIngestor, ingest_all_sheets, ingest_upload, iter_upload_rows,
+    validate_upload,
+)
+from .jobs import claim_next_job, enqueue_upload, job_payload, requeue_stale_jobs, run_job
+from .models import Department, Faculty, GradeCutoff, Result, ResultUploadJob, Student, StudentGPA, Subject
+from .pagination import encode_cursor
+from .partitions import (
+    DEFAULT_PARTITION, convert_to_partitioned, detach_partitions, ensure_partitions, is_partitioned,
+    partition_name, partitions,
+)
+from .rankings import department_rankings, subject_rankings
+from .relative_grading import METHODS, regrade_on_commit, regrade_stale, stale_summaries
+from .routers import PIN_KEY, REPLICA, replica_configured
+from .summaries import rebuild_summaries, verify_summaries
+from .trends import student_trend, subject_trends
+from .terms import current_term, next_term, previous_term
+
+
+def create_faculty(username, department_code='CE'):
+    department, _ = Department.objects.get_or_create(
+        code=department_code, defaults={'name': f'Department {department_code}'}
+    )
+    return Faculty.objects.create(
+        user=User.objects.create(username=username), employee_id=username, department=department,
+        department_name='', designation='Professor',
+    )
+
+
+def create_subject(faculty, code='CE301', scheme='R19-20'):
+    return Subject.objects.create(
+        name=f'Subject {code}', code=code, department=faculty.department, year=3, scheme=scheme,
+        faculty=faculty,
+    )
+
+
+def create_results(subject, marks, prefix='S', **fields):
+    """One result per entry of ``marks``, each for a new student ``<prefix>1``, ``<prefix>2``..."""
+    results = []
+    for n, mark in enumerate(marks, 1):
+        student, _ = Student.objects.get_or_create(
+            roll_number=f'{prefix}{n}',
+            defaults={'name': f'Student {prefix}{n}', 'department': subject.department, 'year': 3, 'scheme': 'R19-20'},
+        )
+        results.append(Result.objects.create(student=student, subject=subject, marks_obtained=mark, **fields))
+    return results
+
+
+def read_from_primary(client):
+    """Keep the client's reads off the replica, which cannot see the data of a TestCase."""
+    session = client.session
+    session[PIN_KEY] = time.time() + 3600
+    session.save()
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    The hot query paths must be answered from an index, not a sequential
+    scan, once the tables are large enough for the planner to care.
+    """
+    DEPARTMENTS = 20
+    FACULTY_PER_DEPARTMENT = 5
+    SUBJECTS_PER_FACULTY = 30
+    STUDENTS_PER_COHORT = 25
+    RESULTS_PER_SUBJECT = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        schemes = [scheme for scheme, _ in Subject.SCHEME_CHOICES]
+        years = [year for year, _ in Subject.YEAR_CHOICES]
+        departments = Department.objects.bulk_create(
+            Department(name=f'Department {d}', code=f'D{d}') for d in range(cls.DEPARTMENTS)
+        )
+        users = User.objects.bulk_create(
+            User(username=f'faculty{d}-{f}')
+            for d in range(cls.DEPARTMENTS) for f in range(cls.FACULTY_PER_DEPARTMENT)
+        )
+        faculties = Faculty.objects.bulk_create(
+            Faculty(user=user, employee_id=f'E{i}', department=departments[i // cls.FACULTY_PER_DEPARTMENT],
+                    department_name='', designation='Professor')
+            for i, user in enumerate(users)
+        )
+        subjects = Subject.objects.bulk_create(
+            Subject(name=f'Subject {f}-{s}', code=f'C{f}-{s}', department=faculty.department,
+                    year=years[s % len(years)], scheme=schemes[s % len(schemes)], faculty=faculty)
+            for f, faculty in enumerate(faculties) for s in range(cls.SUBJECTS_PER_FACULTY)
+        )
+        students = Student.objects.bulk_create(
+            Student(roll_number=f'R{d}-{year}-{scheme}-{n}', name=f'Student {n}',
+                    department=department, year=year, scheme=scheme)
+            for d, department in enumerate(departments) for year in years for scheme in schemes
+            for n in range(cls.STUDENTS_PER_COHORT)
+        )
+        Result.objects.bulk_create(
+            (
+                Result(student=students[(s * 7 + n) % len(students)], subject=subject,
+                       marks_obtained=(s * 13 + n * 17) % 101, exam_type='Mid Term', semester='1st')
+                for s, subject in enumerate(subjects) for n in range(cls.RESULTS_PER_SUBJECT)
+            ),
+            batch_size=2000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        cls.faculty = faculties[0]
+        cls.subject = subjects[len(subjects) // 2]
+        cls.student = students[len(students) // 3]
+
+    def assertIndexed(self, queryset, lookup_tables=()):
+        """``lookup_tables`` are joined tables small enough to be read whole."""
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            full_scans = [table for table in re.findall(r'Seq Scan on (\w+)', plan) if table not in lookup_tables]
+        else:
+            # SQLite: "SCAN <table>" reads every row; "SEARCH" or a scan of a
+            # covering index does not
+            full_scans = [line for line in plan.splitlines()
+                          if re.search(r'\bSCAN \S+$', line.strip())]
+        self.assertEqual(full_scans, [], plan)
+
+    def test_pass_count_by_subject(self):
+        self.assertIndexed(
+            Result.objects.filter(subject=self.subject, marks_obtained__gte=Result.PASS_MARKS).values('id')
+        )
+
+    def test_analytics_projection(self):
+        self.assertIndexed(
+            Result.objects.filter(subject=self.subject)
+            .values('subject_id', 'exam_type', 'semester', 'marks_obtained', 'student_id', 'total_marks')
+        )
+
+    def test_latest_update_of_scope(self):
+        self.assertIndexed(
+            Result.objects.filter(subject=self.subject).order_by('-updated_at').values('updated_at')[:1]
+        )
+
+    def test_subjects_of_faculty_by_name(self):
+        self.assertIndexed(
+            Subject.objects.filter(faculty=self.faculty).select_related('department').order_by('name'),
+            lookup_tables=[Department._meta.db_table],
+        )
+
+    def test_subject_by_code(self):
+        self.assertIndexed(Subject.objects.filter(code=self.subject.code).values('id', 'code'))
+
+    def test_students_of_cohort(self):
+        self.assertIndexed(
+            Student.objects.filter(
+                department_id=self.student.department_id, year=self.student.year, scheme=self.student.scheme,
+            )
+        )
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Result partitioning needs PostgreSQL')
+class ResultPartitionTests(TestCase):
+    """Run against a local PostgreSQL, e.g. DATABASE_URL=postgres://localhost/college."""
+
+    @classmethod
+    def setUpTestData(cls):
+        faculty = create_faculty('partitions')
+        cls.subject = create_subject(faculty)
+        cls.students = Student.objects.bulk_create(
+            Student(roll_number=f'P{n}', name=f'Student {n}', department=faculty.department, year=3, scheme='R19-20')
+            for n in range(4)
+        )
+        cls.current = current_term()
+        cls.last = previous_term(cls.current)
+        cls.older = previous_term(cls.last)
+        cls.old = [
+            Result.objects.create(student=student, subject=cls.subject, marks_obtained=50 + n, term=term)
+            for n, (student, term) in enumerate(zip(cls.students, [cls.older, cls.last]))
+        ]
+
+    def partition_of(self, result):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT tableoid::regclass::text FROM {connection.ops.quote_name(Result._meta.db_table)} '
+                f'WHERE id = %s', [result.pk]
+            )
+            return cursor.fetchone()[0]
+
+    def test_convert_puts_rows_in_their_term(self):
+        convert_to_partitioned(ahead=2)
+        self.assertTrue(is_partitioned())
+        upcoming = [next_term(self.current), next_term(next_term(self.current))]
+        self.assertEqual(
+            partitions(),
+            [(partition_name(term), term) for term in [self.older, self.last, self.current] + upcoming]
+            + [(DEFAULT_PARTITION, None)],
+        )
+        self.assertEqual(Result.objects.count(), 2)
+        self.assertEqual([self.partition_of(result) for result in self.old],
+                         [partition_name(self.older), partition_name(self.last)])
+
+    def test_new_rows_go_to_the_current_term(self):
+        convert_to_partitioned()
+        result = Result.objects.create(student=self.students[2], subject=self.subject, marks_obtained=70)
+        self.assertEqual(self.partition_of(result), partition_name(self.current))
+        # The identity sequence continues after the copied rows
+        self.assertGreater(result.pk, max(r.pk for r in self.old))
+
+    def test_result_key_stays_unique_within_a_term(self):
+        convert_to_partitioned()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Result.objects.create(student=self.students[0], subject=self.subject, marks_obtained=10, term=self.older)
+        # The same exam in another term is a result of its own
+        Result.objects.create(student=self.students[0], subject=self.subject, marks_obtained=10, term=self.last)
+
+    def test_term_filter_reads_one_partition(self):
+        convert_to_partitioned()
+        plan = Result.objects.filter(term=self.current).explain()
+        self.assertIn(partition_name(self.current), plan)
+        self.assertNotIn(partition_name(self.last), plan)
+        self.assertNotIn(DEFAULT_PARTITION, plan)
+
+    def test_orm_is_unaffected(self):
+        convert_to_partitioned()
+        result = Result.objects.get(pk=self.old[0].pk)
+        result.marks_obtained = 90
+        result.save()
+        self.assertEqual(Result.objects.get(pk=result.pk).marks_obtained, 90)
+
+        created = Result.objects.bulk_create([
+            Result(student=student, subject=self.subject, marks_obtained=40, semester='8th')
+            for student in self.students
+        ])
+        for result in created:
+            result.marks_obtained = 45
+        Result.objects.bulk_update(created, ['marks_obtained'])
+        self.assertEqual(Result.objects.filter(semester='8th', marks_obtained=45).count(), 4)
+
+        Result.objects.filter(pk=self.old[1].pk).delete()
+        self.assertEqual(Result.objects.count(), 5)
+
+    def test_upcoming_term_moves_out_of_default(self):
+        convert_to_partitioned(ahead=0)
+        upcoming = next_term(self.current)
+        result = Result.objects.create(student=self.students[3], subject=self.subject, marks_obtained=60,
+                                       term=upcoming)
+        self.assertEqual(self.partition_of(result), DEFAULT_PARTITION)
+        self.assertEqual(ensure_partitions(ahead=1), [partition_name(upcoming)])
+        self.assertEqual(self.partition_of(result), partition_name(upcoming))
+        self.assertEqual(ensure_partitions(ahead=1), [])
+
+    def test_detach_terms_older_than_kept_to_archive_schema(self):
+        convert_to_partitioned()
+        current = Result.objects.create(student=self.students[2], subject=self.subject, marks_obtained=70)
+        detached = detach_partitions(2, archive_schema='result_archive')
+        self.assertEqual(detached, [partition_name(self.older)])
+        self.assertEqual(set(Result.objects.values_list('pk', flat=True)), {self.old[1].pk, current.pk})
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM result_archive.{connection.ops.quote_name(detached[0])}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        # The current term is never detached
+        with self.assertRaises(ValueError):
+            detach_partitions(0)
+
+
+@unittest.skipUnless(replica_configured(), 'Set DATABASE_REPLICA_URL to test replica routing')
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Run with two local databases, e.g. DATABASE_URL=sqlite:////tmp/primary.db
+    DATABASE_REPLICA_URL=sqlite:////tmp/replica.db. The test replica mirrors
+    the test primary, so the data is committed for it to see.
+    """
+    databases = {'default', REPLICA} if replica_configured() else {'default'}
+
+    def setUp(self):
+        department = Department.objects.create(name='Computer Engineering', code='CE')
+        self.user = User.objects.create(username='replica')
+        faculty = Faculty.objects.create(
+            user=self.user, employee_id='R1', department=department, department_name='', designation='Professor',
+        )
+        subject = Subject.objects.create(
+            name='Databases', code='CE301', department=department, year=3, scheme='R19-20', faculty=faculty,
+        )
+        student = Student.objects.create(
+            roll_number='R1', name='Student', department=department, year=3, scheme='R19-20',
+        )
+        Result.objects.create(student=student, subject=subject, marks_obtained=60)
+        self.client.force_login(self.user)
+
+    def result_queries(self, alias, path, method='get'):
+        with CaptureQueriesContext(connections[alias]) as queries:
+            response = getattr(self.client, method)(path)
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+        return [q['sql'] for q in queries.captured_queries if Result._meta.db_table in q['sql']]
+
+    def test_analytics_read_from_replica(self):
+        self.assertTrue(self.result_queries(REPLICA, reverse('results_analytics')))
+        self.assertFalse(self.result_queries('default', reverse('results_analytics')))
+
+    def test_export_streams_from_replica(self):
+        self.assertTrue(self.result_queries(REPLICA, reverse('export_results')))
+
+    def test_writes_stay_on_primary_and_pin_the_session(self):
+        self.assertFalse(self.result_queries(REPLICA, reverse('regrade_results'), method='post'))
+        # Read-after-write: the next dashboard load sees the primary
+        self.assertFalse(self.result_queries(REPLICA, reverse('results_analytics')))
+        self.assertTrue(self.result_queries('default', reverse('results_analytics')))
+
+    def test_other_reads_use_primary(self):
+        self.assertEqual(Result.objects.all().db, 'default')
+
+
+class ResultIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('ingest')
+        cls.subject = create_subject(cls.faculty)
+        cls.student = Student.objects.create(
+            roll_number='R1', name='Student', department=cls.faculty.department, year=3, scheme='R19-20',
+        )
+
+    def ingest(self, rows):
+        ingestor = ResultIngestor(self.faculty, REQUIRED_HEADERS)
+        for row_num, row in enumerate(rows, 2):
+            ingestor.feed(row_num, row)
+        ingestor.flush()
+        return ingestor
+
+    def upload(self, filename, marks):
+        rows = [REQUIRED_HEADERS] + [
+            [f'M{n}', 'Student', self.subject.code, mark] for n, mark in enumerate(marks, 1)
+        ]
+        if filename.endswith('.csv'):
+            return io.BytesIO(''.join(','.join(map(str, row)) + '\n' for row in rows).encode())
+        from openpyxl import Workbook
+        workbook = Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        data = io.BytesIO()
+        workbook.save(data)
+        data.seek(0)
+        return data
+
+    def test_fractional_marks_are_rejected_in_every_format(self):
+        # Rows 2-5: whole, whole written as a decimal, fractional, fractional above the maximum
+        for filename, marks in [('results.xlsx', [50, 50.0, 50.7, 100.9]),
+                                ('results.csv', ['50', '50.0', '50.7', '100.9'])]:
+            with self.subTest(filename=filename):
+                report = validate_upload(self.upload(filename, marks), filename)
+                self.assertEqual([error['row'] for error in report['errors']], [4, 5])
+                self.assertTrue(all('whole number' in error['message'] for error in report['errors']))
+
+                ingestor = ingest_upload(self.faculty, self.upload(filename, marks), filename)
+                self.assertEqual([error.split(':')[0] for error in ingestor.errors], ['Row 4', 'Row 5'])
+                self.assertEqual(
+                    dict(Result.objects.values_list('student__roll_number', 'marks_obtained')),
+                    {'M1': 50, 'M2': 50},
+                )
+
+    def test_batch_racing_a_concurrent_insert_becomes_an_update(self):
+        # Another upload inserts the key after the batch has read the
+        # existing rows: the first read misses it
+        Result.objects.create(student=self.student, subject=self.subject, marks_obtained=40)
+        existing = ResultIngestor._existing
+
+        def read_then_race(ingestor, students, valid_rows):
+            if read_then_race.first:
+                read_then_race.first = False
+                return {}
+            return existing(ingestor, students, valid_rows)
+        read_then_race.first = True
+
+        with mock.patch.object(ResultIngestor, '_existing', read_then_race):
+            ingestor = self.ingest([['R1', 'Student', self.subject.code, 70]])
+
+        self.assertEqual((ingestor.created, ingestor.updated, ingestor.errors), (0, 1, []))
+        self.assertEqual(list(Result.objects.values_list('marks_obtained', flat=True)), [70])
+        self.assertEqual(verify_summaries(), [])
+
+    def test_upload_in_a_later_term_keeps_the_earlier_results(self):
+        self.ingest([['R1', 'Student', self.subject.code, 40]])
+        later = next_term(current_term())
+        with mock.patch('dashboard.terms.timezone.localdate', return_value=later):
+            ingestor = self.ingest([['R1', 'Student', self.subject.code, 70]])
+        self.assertEqual((ingestor.created, ingestor.updated), (1, 0))
+        self.assertEqual(dict(Result.objects.values_list('term', 'marks_obtained')), {current_term(): 40, later: 70})
+
+    def test_failure_mid_file_keeps_the_committed_batches_unless_wrapped(self):
+        rows = [[f'M{n}', 'Student', self.subject.code, 50] for n in range(1, 4)]
+
+        def ingest_then_fail():
+            ingestor = ResultIngestor(self.faculty, REQUIRED_HEADERS, batch_size=2)
+            for row_num, row in enumerate(rows, 2):
+                ingestor.feed(row_num, row)
+            raise OSError('connection to the file store lost')
+
+        with self.assertRaises(OSError):
+            with transaction.atomic():
+                ingest_then_fail()
+        self.assertFalse(Result.objects.exists())
+
+        # Unwrapped, the first batch stays written
+        with self.assertRaises(OSError):
+            ingest_then_fail()
+        self.assertEqual(sorted(Result.objects.values_list('student__roll_number', flat=True)), ['M1', 'M2'])
+        self.assertEqual(verify_summaries(), [])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), RESULTS_UPLOAD_JOB_TIMEOUT=60, RESULTS_UPLOAD_MAX_ATTEMPTS=2)
+class UploadJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('jobs')
+        cls.subject = create_subject(cls.faculty)
+
+    def enqueue(self, rows=(('R1', 55),)):
+        body = 'Roll No,Name,Course Code,Marks\n' + ''.join(
+            f'{roll_no},A,{self.subject.code},{marks}\n' for roll_no, marks in rows
+        )
+        return enqueue_upload(self.faculty, SimpleUploadedFile('results.csv', body.encode()))
+
+    def upload(self, rows):
+        job, duplicate = self.enqueue(rows)
+        if not duplicate:
+            run_job(claim_next_job('worker'))
+            job.refresh_from_db()
+        return job, duplicate
+
+    def marks(self):
+        return dict(Result.objects.values_list('student__roll_number', 'marks_obtained'))
+
+    def edit_marks(self, roll_no, marks):
+        result = Result.objects.get(student__roll_number=roll_no)
+        result.marks_obtained = marks
+        result.save()
+
+    def test_finished_job_deletes_its_file(self):
+        job, _ = self.enqueue()
+        path = job.file.path
+        run_job(claim_next_job('worker'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ResultUploadJob.STATUS_DONE)
+        self.assertFalse(job.file)
+        self.assertFalse(os.path.exists(path))
+
+    def test_summary_labels_memory_as_approximate_process_rss(self):
+        mb = 2**20
+        with mock.patch('dashboard.ingest._rss_bytes', side_effect=[100 * mb] + [103 * mb] * 10):
+            job, _ = self.upload([('R1', 55)])
+        self.assertEqual(job.summary['approx_process_memory_growth_bytes'], 3 * mb)
+        self.assertIn('Approximate worker process RSS growth: 3.0 MB (process-wide', job.summary['message'])
+
+    def test_summary_without_a_memory_figure_does_not_mention_it(self):
+        with mock.patch('dashboard.ingest._rss_bytes', return_value=None):
+            job, _ = self.upload([('R1', 55)])
+        self.assertIsNone(job.summary['approx_process_memory_growth_bytes'])
+        self.assertNotIn('RSS', job.summary['message'])
+
+    def test_failure_mid_file_keeps_and_reports_the_written_batches(self):
+        rows = [(f'R{n}', 50) for n in range(DEFAULT_BATCH_SIZE + 10)]
+
+        def fail_after_first_batch(*args, **kwargs):
+            for n, row in enumerate(iter_upload_rows(*args, **kwargs)):
+                if n == DEFAULT_BATCH_SIZE + 5:  # header plus one full batch and then some
+                    raise OSError('connection to the file store lost')
+                yield row
+
+        with mock.patch('dashboard.ingest.iter_upload_rows', fail_after_first_batch):
+            job, _ = self.upload(rows)
+        self.assertEqual(job.status, ResultUploadJob.STATUS_FAILED)
+        self.assertEqual(Result.objects.count(), DEFAULT_BATCH_SIZE)
+        self.assertEqual(job.created_count, DEFAULT_BATCH_SIZE)
+        payload = job_payload(job)
+        self.assertTrue(payload['partially_applied'])
+        self.assertTrue(payload['summary']['partial'])
+        self.assertIn(f'{DEFAULT_BATCH_SIZE} new and 0 updated results', payload['summary']['message'])
+
+        # Uploading the file again writes the rest
+        job, duplicate = self.upload(rows)
+        self.assertFalse(duplicate)
+        self.assertEqual((job.status, job.created_count), (ResultUploadJob.STATUS_DONE, 10))
+        self.assertFalse(job_payload(job)['partially_applied'])
+        self.assertEqual(Result.objects.count(), len(rows))
+
+    def test_job_of_a_dead_worker_is_requeued_then_failed(self):
+        job, _ = self.enqueue()
+        claim_next_job('dead-worker')
+        ResultUploadJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+
+        # Reclaimed by the next worker as a second attempt
+        reclaimed = claim_next_job('worker')
+        self.assertEqual((reclaimed.pk, reclaimed.worker, reclaimed.attempts), (job.pk, 'worker', 2))
+
+        # That worker dies too: no attempts are left
+        ResultUploadJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ResultUploadJob.STATUS_FAILED)
+        self.assertFalse(job.file)
+        self.assertEqual(job.summary['message'], 'No results were saved.')
+
+    def test_job_with_recent_progress_is_left_running(self):
+        job, _ = self.enqueue()
+        claim_next_job('worker')
+        self.assertEqual(requeue_stale_jobs(), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ResultUploadJob.STATUS_RUNNING)
+
+    def test_reupload_whose_results_still_hold_is_a_duplicate(self):
+        first, _ = self.upload([('R1', 55), ('R2', 60)])
+        job, duplicate = self.upload([('R1', 55), ('R2', 60)])
+        self.assertTrue(duplicate)
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual(ResultUploadJob.objects.count(), 1)
+
+    def test_reupload_restores_marks_edited_since(self):
+        rows = [('R1', 55), ('R2', 60)]
+        self.upload(rows)
+        self.edit_marks('R1', 10)
+
+        job, duplicate = self.upload(rows)
+        self.assertFalse(duplicate)
+        self.assertEqual(self.marks(), {'R1': 55, 'R2': 60})
+        self.assertEqual((job.summary['created'], job.summary['updated'], job.summary['unchanged']), (0, 1, 1))
+
+        # The same file with one row added counts only R2 as unchanged
+        self.edit_marks('R1', 10)
+        job, duplicate = self.upload(rows + [('R3', 70)])
+        self.assertFalse(duplicate)
+        self.assertEqual(self.marks(), {'R1': 55, 'R2': 60, 'R3': 70})
+        self.assertEqual((job.summary['created'], job.summary['updated'], job.summary['unchanged']), (1, 1, 1))
+        self.assertEqual(verify_summaries(), [])
+
+    def test_reupload_of_an_upload_with_row_errors_is_run_again(self):
+        rows = [('R1', 55), ('R2', 'absent')]
+        first, _ = self.upload(rows)
+        self.assertEqual(first.error_count, 1)
+        job, duplicate = self.upload(rows)
+        self.assertFalse(duplicate)
+        self.assertNotEqual(job.pk, first.pk)
+
+    def test_identical_pending_upload_is_a_duplicate(self):
+        queued, _ = self.enqueue()
+        job, duplicate = self.enqueue()
+        self.assertTrue(duplicate)
+        self.assertEqual(job.pk, queued.pk)
+
+        claim_next_job('worker')
+        job, duplicate = self.enqueue()
+        self.assertTrue(duplicate)
+        self.assertEqual((job.pk, job.status), (queued.pk, ResultUploadJob.STATUS_RUNNING))
+        self.assertEqual(ResultUploadJob.objects.count(), 1)
+
+
+class MultiSheetIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('sheets')
+        cls.subjects = [create_subject(cls.faculty, code) for code in ('CE301', 'CE302')]
+
+    def workbook(self, sheets):
+        from openpyxl import Workbook
+        workbook = Workbook()
+        workbook.remove(workbook.active)
+        for name, rows in sheets:
+            sheet = workbook.create_sheet(name)
+            for row in rows:
+                sheet.append(row)
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        workbook.save(path)
+        return path
+
+    def test_every_sheet_is_ingested_with_its_own_summary(self):
+        path = self.workbook([
+            ('CE301', [REQUIRED_HEADERS, ['W1', 'Anil', 'CE301', 60], ['W2', 'Bina', 'CE301', 35]]),
+            ('CE302', [REQUIRED_HEADERS, ['W1', 'Anil', 'CE302', 70], ['W2', 'Bina', 'CE302', 'absent']]),
+            ('Notes', []),
+            ('Old format', [['Roll', 'Marks'], ['W1', 50]]),
+        ])
+        progress = []
+        workbook = ingest_all_sheets(self.faculty, path, on_flush=lambda w: progress.append(w.rows_seen), max_workers=2)
+
+        summary = workbook.summary()
+        self.assertEqual([sheet['sheet'] for sheet in summary['sheets']], ['CE301', 'CE302', 'Notes', 'Old format'])
+        first, second, notes, old = summary['sheets']
+        self.assertEqual((first['course_codes'], first['rows'], first['created']), (['CE301'], 2, 2))
+        self.assertEqual((second['course_codes'], second['created'], len(second['errors'])), (['CE302'], 1, 1))
+        self.assertTrue(notes['skipped'])
+        self.assertIn('Roll No', old['error'])
+        self.assertEqual((summary['created'], len(summary['errors'])), (3, 2))
+        self.assertTrue(summary['errors'][0].startswith('Sheet "'))
+        # One progress report per ingested sheet
+        self.assertEqual(sorted(progress), [2, 4])
+
+        self.assertEqual(
+            set(Result.objects.values_list('student__roll_number', 'subject__code', 'marks_obtained')),
+            {('W1', 'CE301', 60), ('W2', 'CE301', 35), ('W1', 'CE302', 70)},
+        )
+        self.assertEqual(workbook.subject_ids, {subject.pk for subject in self.subjects})
+        self.assertEqual(verify_summaries(), [])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), RESULTS_UPLOAD_INLINE=True)
+class DelimitedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('delimited')
+        cls.subject = create_subject(cls.faculty)
+
+    def setUp(self):
+        self.client.force_login(self.faculty.user)
+
+    def post(self, filename, text):
+        upload = SimpleUploadedFile(filename, text.encode('utf-8-sig'))
+        response = self.client.post(reverse('upload_excel_results'), {'excel_file': upload})
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_csv_from_excel_is_ingested(self):
+        # Excel's "CSV UTF-8": a BOM, CRLF line ends, a trailing blank line;
+        # the columns need not be in template order
+        job = self.post('results.csv', (
+            'Marks,Course Code,Roll No,Name\r\n'
+            f'55,{self.subject.code},C1,"Rao, Anil"\r\n'
+            f'72,{self.subject.code},C2,Bina\r\n'
+            f'101,{self.subject.code},C3,Chand\r\n'
+            '\r\n'
+        ))
+        self.assertEqual((job['status'], job['created'], job['error_count']), ('done', 2, 1))
+        self.assertEqual(job['summary']['format'], 'csv')
+        self.assertTrue(job['errors'][0].startswith('Row 4'))
+        self.assertEqual(
+            dict(Result.objects.values_list('student__roll_number', 'marks_obtained')), {'C1': 55, 'C2': 72}
+        )
+        self.assertEqual(Student.objects.get(roll_number='C1').name, 'Rao, Anil')
+
+    def test_tsv_is_ingested(self):
+        job = self.post('results.tsv', (
+            'Roll No\tName\tCourse Code\tMarks\n'
+            f'T1\tAnil\t{self.subject.code}\t40\n'
+        ))
+        self.assertEqual((job['status'], job['created'], job['summary']['format']), ('done', 1, 'tsv'))
+        self.assertEqual(Result.objects.get().marks_obtained, 40)
+
+    def test_csv_without_the_template_headers_fails(self):
+        job = self.post('results.csv', f'Roll,Marks\nC1,{self.subject.code}\n')
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn('Roll No, Name, Course Code, Marks', job['errors'][0])
+        self.assertFalse(Result.objects.exists())
+
+
+class TemplateDownloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('templates')
+        cls.subject = create_subject(cls.faculty)
+        create_results(cls.subject, [60], prefix='T')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.faculty.user)
+
+    def rows(self, response):
+        from openpyxl import load_workbook
+        workbook = load_workbook(io.BytesIO(response.content), read_only=True)
+        return list(workbook.active.iter_rows(values_only=True))
+
+    def test_generic_template_is_built_once_and_revalidated(self):
+        url = reverse('download_excel_template')
+        with mock.patch.dict(workbooks._template_bytes, clear=True), \
+                mock.patch('dashboard.workbooks.build_template', wraps=workbooks.build_template) as build:
+            first = self.client.get(url)
+            self.assertEqual(self.client.get(url).content, first.content)
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.rows(first)[0], tuple(REQUIRED_HEADERS))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+
+    def test_subject_template_is_cached_until_the_roster_changes(self):
+        url = reverse('download_subject_template', args=[self.subject.pk])
+        with mock.patch('dashboard.workbooks.build_template', wraps=workbooks.build_template) as build:
+            first = self.client.get(url)
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(build.call_count, 1)
+        # Marks are left blank
+        self.assertEqual([row[:4] for row in self.rows(first)[1:]], [('T1', 'Student T1', self.subject.code)])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        Student.objects.create(
+            roll_number='T2', name='New', department=self.subject.department, year=3, scheme='R19-20',
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual([row[0] for row in self.rows(response)[1:]], ['T1', 'T2'])
+
+    def test_subject_template_of_another_department_is_forbidden(self):
+        other = create_subject(create_faculty('elsewhere', department_code='ME'), code='ME301')
+        self.assertEqual(
+            self.client.get(reverse('download_subject_template', args=[other.pk])).status_code, 403
+        )
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('export')
+        cls.subjects = [create_subject(cls.faculty, code) for code in ('CE302', 'CE301')]
+        create_results(cls.subjects[0], [55, 20], total_marks=80)
+        create_results(cls.subjects[1], [90, 35, 40])
+        Result.objects.filter(marks_obtained=90).update(grade='A')
+        # Another department's results stay out of the export
+        create_results(create_subject(create_faculty('other', department_code='ME'), 'ME301'), [70], prefix='M')
+
+    def setUp(self):
+        self.client.force_login(self.faculty.user)
+        read_from_primary(self.client)
+
+    def expected(self):
+        results = Result.objects.filter(subject__department=self.faculty.department).select_related(
+            'student', 'subject'
+        ).order_by('subject__code', 'student__roll_number')
+        return [
+            (r.student.roll_number, r.student.name, r.subject.code, r.marks_obtained, r.subject.name,
+             r.total_marks, r.percentage, r.status, r.exam_type, r.semester, r.grade)
+            for r in results
+        ]
+
+    def export(self, export_format):
+        response = self.client.get(reverse('export_results'), {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_rows_match_the_database(self):
+        rows = list(csv.reader(io.StringIO(self.export('csv').decode())))
+        self.assertEqual(rows[0], EXPORT_HEADERS)
+        self.assertEqual(rows[1:], [[str(value) for value in row] for row in self.expected()])
+        self.assertEqual(len(rows) - 1, 5)
+
+    def test_xlsx_rows_match_the_database(self):
+        from openpyxl import load_workbook
+        workbook = load_workbook(io.BytesIO(self.export('xlsx')), read_only=True)
+        rows = list(workbook['Results'].iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), EXPORT_HEADERS)
+        # Empty cells read back as None
+        self.assertEqual(rows[1:], [row[:-1] + (row[-1] or None,) for row in self.expected()])
+
+    def test_json_rows_match_the_database(self):
+        results = json.loads(self.export('json'))['results']
+        self.assertEqual(results, [dict(zip(EXPORT_HEADERS, row)) for row in self.expected()])
+
+    def test_selected_subject_narrows_the_export(self):
+        session = self.client.session
+        session['selected_subject'] = self.subjects[0].pk
+        session.save()
+        rows = list(csv.reader(io.StringIO(self.export('csv').decode())))
+        self.assertEqual([row[0] for row in rows[1:]], ['S1', 'S2'])
+        self.assertEqual({row[2] for row in rows[1:]}, {'CE302'})
+
+
+class StudentResultsCursorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('cursor')
+        subject = create_subject(cls.faculty)
+        for n, marks in enumerate([30, 60, 90]):
+            student = Student.objects.create(
+                roll_number=f'C{n}', name='Student', department=cls.faculty.department, year=3, scheme='R19-20',
+            )
+            Result.objects.create(student=student, subject=subject, marks_obtained=marks)
+
+    def setUp(self):
+        self.client.force_login(self.faculty.user)
+        read_from_primary(self.client)
+
+    def page(self, sort, cursor):
+        return self.client.get(reverse('student_results'), {'sort': sort, 'limit': 1, 'cursor': cursor})
+
+    def test_cursor_of_previous_page(self):
+        first = self.client.get(reverse('student_results'), {'sort': 'marks', 'limit': 1}).json()
+        response = self.page('marks', first['next_cursor'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['marks'] for row in response.json()['results']], [60])
+
+    def test_mistyped_cursor_values_are_rejected(self):
+        result_id = Result.objects.order_by('id').values_list('id', flat=True).first()
+        for sort, values in [('marks', ['a', result_id]), ('marks', [50.5, result_id]),
+                             ('marks', [True, result_id]), ('marks', [None, result_id]),
+                             ('roll_no', [1, result_id]), ('roll_no', ['C1', '1'])]:
+            with self.subTest(sort=sort, values=values):
+                response = self.page(sort, encode_cursor(values))
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor.'})
+
+
+class StreamingStudentResultsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('streaming')
+        subject = create_subject(cls.faculty)
+        create_results(subject, [39, 40, 72, 15])
+        create_results(create_subject(cls.faculty, 'CE302'), [66], total_marks=75)
+
+    def setUp(self):
+        self.client.force_login(self.faculty.user)
+        read_from_primary(self.client)
+
+    def stream(self, **params):
+        response = self.client.get(reverse('student_results'), {'stream': '1', **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_status_and_percentage_match_the_model(self):
+        data = self.stream(sort='-marks')
+        self.assertEqual((data['next_cursor'], data['has_more']), (None, False))
+        self.assertEqual([row['marks'] for row in data['results']], [72, 66, 40, 39, 15])
+        for row in data['results']:
+            result = Result.objects.get(pk=row['id'])
+            with self.subTest(marks=row['marks']):
+                self.assertEqual((row['status'], row['percentage']), (result.status, result.percentage))
+
+    def test_filters_apply_to_the_stream(self):
+        data = self.stream(status='fail', course_code='CE301')
+        self.assertEqual(
+            [(row['roll_no'], row['status']) for row in data['results']], [('S1', 'Fail'), ('S4', 'Fail')]
+        )
+
+    def test_stream_holds_the_same_rows_as_the_pages(self):
+        paged = self.client.get(reverse('student_results'), {'limit': 500}).json()['results']
+        self.assertEqual(self.stream()['results'], paged)
+
+    def test_long_lists_are_written_in_chunks(self):
+        items = [{'n': n} for n in range(ROWS_PER_WRITE * 2 + 1)]
+        chunks = list(stream_json(iter(items), extra={'has_more': False}))
+        self.assertEqual(len(chunks), 4)  # opening, two full chunks, the rest
+        self.assertEqual(json.loads(''.join(chunks)), {'results': items, 'has_more': False})
+        self.assertEqual(json.loads(''.join(stream_json(iter([])))), {'results': []})
+
+
+class CascadeDeleteTests(TestCase):
+    RESULTS = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('cascade')
+        cls.subject = create_subject(cls.faculty)
+        cls.other = create_subject(cls.faculty, code='CE302')
+        Student.objects.bulk_create([
+            Student(roll_number=f'D{n}', name='Student', department=cls.faculty.department, year=3, scheme='R19-20')
+            for n in range(cls.RESULTS)
+        ])
+        Result.objects.bulk_create([
+            Result(student=student, subject=subject, marks_obtained=(n * 7) % 101)
+            for n, student in enumerate(Student.objects.order_by('id'))
+            for subject in (cls.subject, cls.other)
+        ])
+        rebuild_summaries()
+
+    def test_deleting_a_subject_does_not_touch_summaries_per_result(self):
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.subject.delete()
+        self.assertLess(len(queries), 30)
+        self.assertLessEqual(len(callbacks), 2)
+        self.assertEqual(verify_summaries(), [])
+
+    def test_deleting_a_student_removes_their_marks_in_one_pass(self):
+        student = Student.objects.get(roll_number='D3')
+        with CaptureQueriesContext(connection) as queries, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            student.delete()
+        self.assertLess(len(queries), 30)
+        self.assertLessEqual(len(callbacks), 2)
+        self.assertEqual(verify_summaries(), [])
+
+    def test_deleting_a_result_still_updates_its_summary(self):
+        Result.objects.filter(subject=self.other).order_by('id').first().delete()
+        self.assertEqual(verify_summaries(), [])
+
+
+class RegradeOnCommitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('regrade')
+        cls.subjects = [create_subject(cls.faculty, code=f'CE30{n}') for n in range(2)]
+        cls.student = Student.objects.create(
+            roll_number='G1', name='Student', department=cls.faculty.department, year=3, scheme='R19-20',
+        )
+
+    def test_one_regrade_per_transaction(self):
+        with mock.patch('dashboard.relative_grading.regrade_stale') as regrade_stale, \
+                self.captureOnCommitCallbacks(execute=True):
+            for marks in (50, 60):
+                for subject in self.subjects:
+                    Result.objects.update_or_create(
+                        student=self.student, subject=subject, defaults={'marks_obtained': marks},
+                    )
+        regrade_stale.assert_called_once_with({subject.pk for subject in self.subjects})
+
+    def test_rolled_back_savepoint_does_not_swallow_later_regrades(self):
+        first, second = self.subjects
+        with mock.patch('dashboard.relative_grading.regrade_stale') as regrade_stale, \
+                self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    regrade_on_commit({first.pk})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            regrade_on_commit({second.pk})
+        regrade_stale.assert_called_once_with({second.pk})
+
+
+class RelativeGradingTests(TestCase):
+    # Ties at several marks, including the pass mark
+    MARKS = [95, 95, 85, 85, 75, 70, 70, 60, 55, 45, 40, 40, 35]
+
+    @classmethod
+    def setUpTestData(cls):
+        faculty = create_faculty('grading')
+        cls.curved = create_subject(faculty, scheme='AUTONOMOUS')
+        cls.other_curved = create_subject(faculty, code='CE302', scheme='AUTONOMOUS')
+        cls.absolute = create_subject(faculty, code='CE303')
+        create_results(cls.curved, cls.MARKS, prefix='V')
+        create_results(cls.other_curved, [90, 50], prefix='V')
+        create_results(cls.absolute, [80], prefix='V')
+
+    def cutoff(self, subject):
+        return GradeCutoff.objects.get(subject=subject)
+
+    def stored_grades(self, subject):
+        return Counter(Result.objects.filter(subject=subject).values_list('grade', flat=True))
+
+    def test_sql_grades_match_the_computed_cutoffs(self):
+        self.assertEqual(regrade_stale(), 2)
+        for method in METHODS:
+            with self.subTest(method=method):
+                regrade_stale(force=True, method=method)
+                cutoff = self.cutoff(self.curved)
+                self.assertEqual(cutoff.method, method)
+                # Counted from the histogram in NumPy, assigned by one UPDATE ... CASE
+                self.assertEqual(self.stored_grades(self.curved), {
+                    letter: n for letter, n in cutoff.grade_counts.items() if n
+                })
+                for result in Result.objects.filter(subject=self.curved):
+                    expected = next((letter for letter, minimum in cutoff.cutoffs
+                                     if result.marks_obtained >= minimum), 'F')
+                    self.assertEqual(result.grade, expected, result.marks_obtained)
+                self.assertEqual(set(Result.objects.filter(marks_obtained__lt=40).values_list('grade', flat=True)),
+                                 {'F'})
+        self.assertFalse(GradeCutoff.objects.filter(subject=self.absolute).exists())
+
+    def test_regrade_stale_picks_up_exactly_the_changed_subjects(self):
+        self.assertEqual(regrade_stale(), 2)
+        self.assertEqual(regrade_stale(), 0)
+        untouched = self.cutoff(self.other_curved).computed_at
+
+        # The lowest passing result becomes the top score
+        result = Result.objects.get(subject=self.curved, student__roll_number='V11')
+        result.marks_obtained = 100
+        result.save()
+        self.assertEqual(list(stale_summaries().values_list('subject_id', flat=True)), [self.curved.pk])
+
+        self.assertEqual(regrade_stale(), 1)
+        self.assertEqual(self.cutoff(self.other_curved).computed_at, untouched)
+        result.refresh_from_db()
+        self.assertEqual(result.grade, self.cutoff(self.curved).cutoffs[0][0])
+        self.assertEqual(self.stored_grades(self.curved), {
+            letter: n for letter, n in self.cutoff(self.curved).grade_counts.items() if n
+        })
+        self.assertEqual(regrade_stale(), 0)
+
+
+class AnalyticsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('analytics')
+        cls.subject = create_subject(cls.faculty)
+        cls.students = [
+            Student.objects.create(
+                roll_number=f'A{n}', name='Student', department=cls.faculty.department, year=3, scheme='R19-20',
+            )
+            for n in range(2)
+        ]
+        Result.objects.create(student=cls.students[0], subject=cls.subject, marks_obtained=70)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.faculty.user)
+        read_from_primary(self.client)
+
+    def analytics(self):
+        response = self.client.get(reverse('results_analytics'))
+        self.assertEqual(response.status_code, 200)
+        return response['X-Analytics-Cache'], response.json()['total_students']
+
+    def test_write_whose_version_bump_went_elsewhere_is_not_served_stale(self):
+        self.assertEqual(self.analytics(), ('miss', 1))
+        self.assertEqual(self.analytics(), ('hit', 1))
+        # The version bump waits for a commit that never comes in this test,
+        # as it would land in another process's cache for an upload worker
+        Result.objects.create(student=self.students[1], subject=self.subject, marks_obtained=30)
+        self.assertEqual(self.analytics(), ('miss', 2))
+
+    def test_hit_does_not_read_the_results_table(self):
+        self.analytics()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.analytics(), ('hit', 1))
+        result_table = connection.ops.quote_name(Result._meta.db_table)
+        self.assertEqual([query['sql'] for query in queries if result_table in query['sql']], [])
+        # Session, user, faculty, the validator and the subject ids of the key
+        self.assertEqual(len(queries), 5)
+
+    def test_write_that_keeps_the_counts_changes_the_validator(self):
+        result = Result.objects.get()
+        etag, _ = results_validator(Subject.objects.filter(pk=self.subject.pk), 'test')
+        result.total_marks = 50
+        result.save()
+        self.assertNotEqual(results_validator(Subject.objects.filter(pk=self.subject.pk), 'test')[0], etag)
+
+
+class AnalyticsQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('grouped')
+        cls.subject = create_subject(cls.faculty)
+        create_results(cls.subject, [80, 45, 20])
+
+    def setUp(self):
+        self.client.force_login(self.faculty.user)
+        read_from_primary(self.client)
+
+    def uncached_analytics(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('results_analytics'))
+        self.assertEqual(response['X-Analytics-Cache'], 'miss')
+        result_table = connection.ops.quote_name(Result._meta.db_table)
+        self.assertEqual([query['sql'] for query in queries if result_table in query['sql']], [])
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_subjects_or_results(self):
+        few, _ = self.uncached_analytics()
+        for code in ('CE302', 'CE303', 'CE304'):
+            subject = create_subject(self.faculty, code)
+            create_results(subject, [90, 30, 60, 41])
+            create_results(subject, [10, 70], exam_type='End Term')
+        many, data = self.uncached_analytics()
+        self.assertEqual(many, few)
+        self.assertEqual(len(data['per_course_breakdown']), 4)
+
+    def test_breakdown_matches_the_results(self):
+        subject = create_subject(self.faculty, 'CE302')
+        create_results(subject, [90, 30, 60])
+        create_results(subject, [10], prefix='E', exam_type='End Term')
+        _, data = self.uncached_analytics()
+
+        for course in data['per_course_breakdown']:
+            results = Result.objects.filter(subject_id=course['subject_id'])
+            marks = list(results.values_list('marks_obtained', flat=True))
+            passed = sum(mark >= Result.PASS_MARKS for mark in marks)
+            with self.subTest(course=course['course_code']):
+                self.assertEqual(
+                    (course['total_students'], course['pass_count'], course['fail_count']),
+                    (len(marks), passed, len(marks) - passed),
+                )
+                self.assertEqual((course['highest_marks'], course['lowest_marks']), (max(marks), min(marks)))
+                self.assertAlmostEqual(course['average_marks'], np.mean(marks), places=2)
+                self.assertAlmostEqual(course['std_dev'], np.std(marks), places=2)
+        every = list(Result.objects.values_list('marks_obtained', flat=True))
+        self.assertEqual((data['total_students'], data['highest_marks'], data['lowest_marks']), (len(every), 90, 10))
+        self.assertAlmostEqual(data['average_marks'], np.mean(every), places=2)
+
+
+class ConditionalResultsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('conditional')
+        cls.subject = create_subject(cls.faculty)
+        create_results(cls.subject, [70, 40])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.faculty.user)
+        read_from_primary(self.client)
+        self.first = self.client.get(reverse('results_analytics'))
+
+    def analytics(self, **headers):
+        return self.client.get(reverse('results_analytics'), **headers)
+
+    def revalidate(self):
+        return self.analytics(HTTP_IF_NONE_MATCH=self.first['ETag']).status_code
+
+    def test_unchanged_results_answer_not_modified(self):
+        self.assertEqual(self.first.status_code, 200)
+        response = self.analytics(HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.first['ETag'])
+        self.assertEqual(self.analytics(HTTP_IF_MODIFIED_SINCE=self.first['Last-Modified']).status_code, 304)
+
+    def test_result_write_invalidates(self):
+        Result.objects.filter(marks_obtained=40).first().delete()
+        response = self.analytics(HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], self.first['ETag'])
+        self.assertEqual(response.json()['total_students'], 1)
+
+    def test_subject_rename_invalidates(self):
+        self.subject.name = 'Renamed'
+        self.subject.save()
+        response = self.analytics(HTTP_IF_NONE_MATCH=self.first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['per_course_breakdown'][0]['course_name'], 'Renamed')
+
+    def test_subject_change_moves_last_modified(self):
+        later = timezone.now() + timedelta(seconds=5)
+        Subject.objects.filter(pk=self.subject.pk).update(name='Renamed', updated_at=later)
+        self.assertEqual(self.analytics(HTTP_IF_MODIFIED_SINCE=self.first['Last-Modified']).status_code, 200)
+
+    def test_subject_moved_to_another_faculty_invalidates(self):
+        self.subject.faculty = create_faculty('other')
+        self.subject.save()
+        self.assertEqual(self.revalidate(), 200)
+
+    def test_faculty_department_change_invalidates(self):
+        self.faculty.department = Department.objects.create(code='ME', name='Department ME')
+        self.faculty.save()
+        self.assertEqual(self.revalidate(), 200)
+
+
+class DistributionTests(TestCase):
+    # Ties on the bucket edges (10, 20, 100) and at both ends of the scale
+    MARKS = [0, 9, 10, 10, 19, 20, 40, 55, 90, 100, 100]
+
+    @classmethod
+    def setUpTestData(cls):
+        faculty = create_faculty('distribution')
+        cls.subject = create_subject(faculty)
+        cls.other = create_subject(faculty, code='CE302')
+        create_results(cls.subject, cls.MARKS, prefix='D')
+        create_results(cls.other, [10, 20, 30], prefix='D')
+        cls.subject_ids = [cls.subject.pk, cls.other.pk]
+
+    def test_histogram_buckets_hold_their_edges(self):
+        per_subject, overall = _histogram_distribution(self.subject_ids, 10, None, None)
+        self.assertEqual(per_subject[self.subject.pk]['histogram'], [2, 3, 1, 0, 1, 1, 0, 0, 0, 3])
+        self.assertEqual(overall['histogram'], [2, 4, 2, 1, 1, 1, 0, 0, 0, 3])
+
+        # Every mark lands in the bucket whose label covers it
+        for buckets in (7, 10, 100):
+            with self.subTest(buckets=buckets):
+                per_subject, _ = _histogram_distribution(self.subject_ids, buckets, None, None)
+                expected = [sum(low <= mark <= high for mark in self.MARKS) for low, high in bucket_edges(buckets)]
+                self.assertEqual(per_subject[self.subject.pk]['histogram'], expected)
+
+    def test_quantiles_interpolate_like_percentile_cont(self):
+        stats = _histogram_distribution(self.subject_ids, 10, None, None)[0][self.subject.pk]
+        for name, fraction in QUANTILES.items():
+            self.assertEqual(stats[name], round(float(np.percentile(self.MARKS, fraction * 100)), 2), name)
+        self.assertEqual((stats['count'], stats['min'], stats['max']), (11, 0, 100))
+        self.assertEqual(stats['mean'], round(float(np.mean(self.MARKS)), 2))
+        self.assertEqual(stats['std_dev'], round(float(np.std(self.MARKS)), 2))
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'The SQL distribution needs PostgreSQL')
+    def test_sql_and_numpy_paths_agree(self):
+        for buckets in (7, 10, 100):
+            for exam_type, semester in [(None, None), ('Mid Term', '1st'), ('End Sem', None)]:
+                with self.subTest(buckets=buckets, exam_type=exam_type, semester=semester):
+                    self.assertEqual(
+                        _postgres_distribution(self.subject_ids, buckets, exam_type, semester),
+                        _histogram_distribution(self.subject_ids, buckets, exam_type, semester),
+                    )
+
+
+class TrendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = create_faculty('trends')
+        cls.subject = create_subject(faculty)
+        cls.other = create_subject(faculty, code='CE302')
+        # No results in the 2nd, 4th or 5th semester
+        for semester, marks, other_marks in [('1st', [40, 60], [60]), ('3rd', [70], []), ('6th', [40], [80])]:
+            create_results(cls.subject, marks, prefix='T', semester=semester)
+            create_results(cls.other, other_marks, prefix='T', semester=semester)
+        cls.subjects = Subject.objects.filter(pk__in=[cls.subject.pk, cls.other.pk])
+
+    def points(self, points, *fields):
+        return [tuple(point[field] for field in fields) for point in points]
+
+    def test_subject_series_skips_missing_semesters(self):
+        trends = {trend['subject_id']: trend['points'] for trend in subject_trends(self.subjects, window=2)}
+        self.assertEqual(
+            self.points(trends[self.subject.pk], 'semester', 'count', 'average_marks', 'delta', 'moving_average'),
+            [('1st', 2, 50, None, 50), ('3rd', 1, 70, 20, 60), ('6th', 1, 40, -30, 55)],
+        )
+        # Ranked among the subjects with results in each semester
+        self.assertEqual(self.points(trends[self.subject.pk], 'rank', 'rank_change'), [(2, None), (1, 1), (2, -1)])
+        self.assertEqual(
+            self.points(trends[self.other.pk], 'semester', 'delta', 'moving_average', 'rank', 'rank_change'),
+            [('1st', None, 60, 1, None), ('6th', 20, 70, 1, 0)],
+        )
+
+    def test_student_series_is_ranked_within_the_cohort(self):
+        student = Student.objects.get(roll_number='T2')
+        points = student_trend(student, self.subjects, window=3)['points']
+        # T2 has one result, in the 1st semester, and tops it
+        self.assertEqual(self.points(points, 'semester', 'average_marks', 'rank'), [('1st', 60, 1)])
+
+        student = Student.objects.get(roll_number='T1')
+        points = student_trend(student, self.subjects, window=3)['points']
+        self.assertEqual(
+            self.points(points, 'semester', 'average_marks', 'delta', 'moving_average', 'rank', 'rank_change'),
+            [('1st', 50, None, 50, 2, None), ('3rd', 70, 20, 60, 1, 1), ('6th', 60, -10, 60, 1, 0)],
+        )
+
+
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        faculty = create_faculty('rankings')
+        cls.subject = create_subject(faculty)
+        cls.other = create_subject(faculty, code='CE302')
+        create_results(cls.subject, [90, 80, 80, 70, 60], prefix='K')
+        create_results(cls.other, [70, 80], prefix='K')
+        cls.subjects = Subject.objects.filter(pk__in=[cls.subject.pk, cls.other.pk])
+
+    def ranks(self, rows, *fields):
+        return [tuple(row[field] for field in ('roll_no',) + fields) for row in rows]
+
+    def test_tied_marks_share_a_rank(self):
+        rows = subject_rankings(Subject.objects.filter(pk=self.subject.pk), top=3)
+        # The top 3 ranks are 1, 2 and 2; the next result is ranked 4th, or 3rd densely
+        self.assertEqual(
+            self.ranks(rows, 'marks', 'rank', 'dense_rank', 'percent_rank', 'out_of'),
+            [('K1', 90, 1, 1, 0.0, 5), ('K2', 80, 2, 2, 0.25, 5), ('K3', 80, 2, 2, 0.25, 5)],
+        )
+        rows = subject_rankings(self.subjects, student_id=Student.objects.get(roll_number='K4').pk)
+        self.assertEqual(self.ranks(rows, 'course_code', 'rank', 'dense_rank', 'percent_rank'),
+                         [('K4', 'CE301', 4, 3, 0.75)])
+
+    def test_department_ranks_tie_on_equal_percentages(self):
+        # K1 (90 + 70), K2 (80 + 80) and K3 (80) all average 80%
+        rows = department_rankings(self.subjects, top=1)
+        self.assertEqual(self.ranks(rows, 'subjects', 'percentage', 'rank', 'dense_rank'),
+                         [('K1', 2, 80, 1, 1), ('K2', 2, 80, 1, 1), ('K3', 1, 80, 1, 1)])
+        rows = department_rankings(self.subjects, top=5)
+        self.assertEqual(self.ranks(rows, 'rank', 'dense_rank'),
+                         [('K1', 1, 1), ('K2', 1, 1), ('K3', 1, 1), ('K4', 4, 2), ('K5', 5, 3)])
+
+
+class ComputeGPATests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.faculty = create_faculty('gpa')
+        cls.student = Student.objects.create(
+            roll_number='P1', name='Student', department=cls.faculty.department, year=3, scheme='R19-20',
+        )
+        StudentGPA.objects.create(
+            student=cls.student, semester='5th', credits=20, credit_points=160, sgpa=8, cumulative_credits=20, cgpa=8,
+        )
+
+    def test_exam_type_is_rejected_and_keeps_the_stored_gpa(self):
+        self.client.force_login(self.faculty.user)
+        response = self.client.post(reverse('compute_gpa'), {'year': 3, 'scheme': 'R19-20', 'exam_type': 'Mid Term'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('exam_type is not supported', response.json()['error'])
+        self.assertEqual(list(StudentGPA.objects.values_list('student', 'sgpa')), [(self.student.pk, 8)])
+
+    def test_stored_gpa_counts_the_latest_exam(self):
+        subject = create_subject(self.faculty)
+        for exam_type, marks in [('Mid Term', 40), ('End Sem', 90)]:
+            Result.objects.create(student=self.student, subject=subject, marks_obtained=marks,
+                                  exam_type=exam_type, semester='5th')
+
+        # One exam's figures are read, not stored
+        self.assertEqual(cohort_gpa_rows(self.faculty.department_id, 3, 'R19-20', exam_type='Mid Term'),
+                         [(self.student.pk, '5th', 3, 12, 3, 12)])
+        self.assertEqual(compute_cohort_gpa(self.faculty.department_id, 3, 'R19-20'), 1)
+        self.assertEqual(list(StudentGPA.objects.values_list('semester', 'credits', 'sgpa', 'cgpa')),
+                         [('5th', 3, 10, 10)])
+
+
+class DataMigrationTests(TransactionTestCase):
+    """The results data migrations, run on rows written before them."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('dashboard', target)])
+        return executor.loader.project_state([('dashboard', target)]).apps
+
+    def tearDown(self):
+        call_command('migrate', verbosity=0)
+
+    def test_summaries_backfill_and_label_codes(self):
+        apps = self.migrate('0006_resultuploadjob_dedupe')
+        department = apps.get_model('dashboard', 'Department').objects.create(name='Computer', code='CE')
+        subject = apps.get_model('dashboard', 'Subject').objects.create(
+            name='Databases', code='CE301', department=department, year=3, scheme='R19-20',
+        )
+        Student = apps.get_model('dashboard', 'Student')
+        Result = apps.get_model('dashboard', 'Result')
+        for n, (marks, exam_type, semester) in enumerate([
+            (30, 'Mid Term', '5th'), (40, 'Mid Term', '5th'), (90, 'Mid Term', '5th'), (75, 'End Sem', '6th'),
+        ]):
+            student = Student.objects.create(
+                roll_number=f'M{n}', name='Student', department=department, year=3, scheme='R19-20',
+            )
+            Result.objects.create(student=student, subject=subject, marks_obtained=marks,
+                                  exam_type=exam_type, semester=semester)
+
+        apps = self.migrate('0007_resultsummary')
+        summaries = {
+            (s.exam_type, s.semester): (s.count, s.marks_sum, s.pass_count, s.min_marks, s.max_marks, s.histogram[40])
+            for s in apps.get_model('dashboard', 'ResultSummary').objects.all()
+        }
+        self.assertEqual(summaries, {('Mid Term', '5th'): (3, 160, 2, 30, 90, 1), ('End Sem', '6th'): (1, 75, 1, 75, 75, 0)})
+
+        apps = self.migrate('0011_result_label_codes')
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT marks_obtained, exam_type, semester FROM {Result._meta.db_table} ORDER BY id')
+            self.assertEqual(cursor.fetchall(), [(30, 1, 4), (40, 1, 4), (90, 1, 4), (75, 4, 5)])
+        Result = apps.get_model('dashboard', 'Result')
+        self.assertEqual(
+            list(Result.objects.filter(exam_type='End Sem').values_list('semester', 'marks_obtained')), [('6th', 75)]
+        )
+
+        # And back: the codes turn into the same labels
+        apps = self.migrate('0010_hot_path_indexes')
+        self.assertEqual(
+            list(apps.get_model('dashboard', 'Result').objects.order_by('id').values_list('exam_type', 'semester')),
+            [('Mid Term', '5th')] * 3 + [('End Sem', '6th')],
+        )
+
+    @override_settings(RESULT_TERM_START_MONTHS=[1, 7])
+    def test_terms_backfilled_from_creation_dates(self):
+        apps = self.migrate('0014_upload_job_result_subjects')
+        department = apps.get_model('dashboard', 'Department').objects.create(name='Computer', code='CE')
+        subject = apps.get_model('dashboard', 'Subject').objects.create(
+            name='Databases', code='CE301', department=department, year=3, scheme='R19-20',
+        )
+        student = apps.get_model('dashboard', 'Student').objects.create(
+            roll_number='T1', name='Student', department=department, year=3, scheme='R19-20',
+        )
+        Result = apps.get_model('dashboard', 'Result')
+        for semester, created in [('5th', '2025-03-15T10:00:00Z'), ('6th', '2025-08-01T00:00:00Z'),
+                                  ('7th', '2026-01-01T00:00:00Z')]:
+            result = Result.objects.create(student=student, subject=subject, marks_obtained=50, semester=semester)
+            Result.objects.filter(pk=result.pk).update(created_at=created)
+
+        apps = self.migrate('0015_result_term')
+        self.assertEqual(
+            list(apps.get_model('dashboard', 'Result').objects.order_by('id').values_list('semester', 'term')),
+            [('5th', date(2025, 1, 1)), ('6th', date(2025, 7, 1)), ('7th', date(2026, 1, 1))],
+        )
+
+
+class PoolStatsTests(TestCase):
+    class FakePool:
+        closed = False
+
+        def __init__(self, **counters):
+            self.counters = counters
+
+        def get_stats(self):
+            return dict(self.counters)
+
+    def stats(self, **pools):
+        databases = {alias: SimpleNamespace(pool=pool) for alias, pool in pools.items()}
+        with mock.patch('dashboard.db_pool.connections', databases):
+            return pool_stats()
+
+    def test_utilisation_and_average_wait(self):
+        stats = self.stats(default=self.FakePool(
+            pool_min=2, pool_max=10, pool_size=6, pool_available=2, requests_queued=4, requests_wait_ms=250,
+        ))
+        self.assertEqual(
+            {key: stats['default'][key] for key in ('in_use', 'utilisation', 'avg_wait_ms', 'pool_max')},
+            {'in_use': 4, 'utilisation': 0.4, 'avg_wait_ms': 62.5, 'pool_max': 10},
+        )
+
+    def test_databases_without_an_open_pool_are_left_out(self):
+        closed = self.FakePool(pool_max=10, pool_size=0, pool_available=0)
+        closed.closed = True
+        idle = self.FakePool(pool_max=5, pool_size=1, pool_available=1)
+        stats = self.stats(default=None, replica=closed, other=idle)
+        self.assertEqual(list(stats), ['other'])
+        # Nothing queued yet: no wait to average
+        self.assertEqual((stats['other']['utilisation'], stats['other']['avg_wait_ms']), (0, 0))
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Connection pools need PostgreSQL')
+    def test_stats_of_a_real_pool(self):
+        from psycopg_pool import ConnectionPool
+        settings_dict = connection.settings_dict
+        pool = ConnectionPool(kwargs={
+            'dbname': settings_dict['NAME'], 'user': settings_dict['USER'],
+            'host': settings_dict['HOST'] or None, 'port': settings_dict['PORT'] or None,
+        }, min_size=2, max_size=2, open=True)
+        self.addCleanup(pool.close)
+        pool.wait()
+        with pool.connection():
+            stats = self.stats(default=pool)['default']
+        self.assertEqual((stats['pool_max'], stats['in_use'], stats['utilisation']), (2, 1, 0.5))
+
+    def test_endpoint_reports_the_pools(self):
+        faculty = create_faculty('pools')
+        self.client.force_login(faculty.user)
+        with mock.patch('dashboard.views.pool_stats', return_value={'default': {'in_use': 1}}):
+            response = self.client.get(reverse('database_pool_stats'))
+        self.assertEqual(response.json(), {'pooled': False, 'pools': {'default': {'in_use': 1}}})
+
+
+class LabelCodeFieldTests(TestCase):
+    # Stored codes: reordering or removing a label would silently remap
+    # every stored row, so these only ever grow at the end
+    EXAM_TYPE_CODES = {0: 'Unit Test', 1: 'Mid Term', 2: 'Internal', 3: 'End Term', 4: 'End Sem'}
+    SEMESTER_CODES = {0: '1st', 1: '2nd', 2: '3rd', 3: '4th', 4: '5th', 5: '6th', 6: '7th', 7: '8th'}
+
+    def test_codes_are_append_only(self):
+        for name, pinned in [('exam_type', self.EXAM_TYPE_CODES), ('semester', self.SEMESTER_CODES)]:
+            with self.subTest(field=name):
+                field = Result._meta.get_field(name)
+                self.assertEqual({code: field.label_of(code) for code in pinned}, pinned)
+                self.assertEqual({field.code_of(label): label for label in pinned.values()}, pinned)
+
+    def test_labels_round_trip_through_the_codes(self):
+        faculty = create_faculty('labels')
+        subject = create_subject(faculty)
+        for n, (exam_type, semester) in enumerate([('End Sem', '6th'), ('Unit Test', '5th'), ('Mid Term', '6th')]):
+            student = Student.objects.create(
+                roll_number=f'L{n}', name='Student', department=faculty.department, year=3, scheme='R19-20',
+            )
+            Result.objects.create(student=student, subject=subject, marks_obtained=50 + n,
+                                  exam_type=exam_type, semester=semester)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT exam_type, semester FROM {Result._meta.db_table} ORDER BY id')
+            self.assertEqual(cursor.fetchall(), [(4, 5), (0, 4), (1, 5)])
+
+        self.assertEqual(Result.objects.get(marks_obtained=50).exam_type, 'End Sem')
+        self.assertEqual(
+            list(Result.objects.filter(semester='6th').order_by('exam_type').values_list('exam_type', flat=True)),
+            ['Mid Term', 'End Sem'],
+        )
+        self.assertEqual(
+            list(Result.objects.filter(exam_type__in=['Unit Test', 'End Sem']).order_by('marks_obtained')
+                 .values('exam_type', 'semester')),
+            [{'exam_type': 'End Sem', 'semester': '6th'}, {'exam_type': 'Unit Test', 'semester': '5th'}],
+        )
+        with self.assertRaises(ValueError):
+            list(Result.objects.filter(exam_type='Final'))
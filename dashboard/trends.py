@@ -0,0 +1,112 @@
+"""
+Cross-semester trends of results.
+
+Marks are averaged per period (semester and exam type) and the per-period
+deltas, moving averages and rank changes are computed by SQL window
+functions in a single query, for subjects or for one student against their
+cohort. The query is plain SQL with window functions, so it runs on both
+PostgreSQL and SQLite.
+"""
+
+from .models import Result
+from .routers import read_connection
+
+# Result stores the period labels as their position in these lists, so the
+# columns sort chronologically (labels appended later sort last)
+SEMESTER_ORDER = Result.SEMESTERS
+EXAM_TYPE_ORDER = Result.EXAM_TYPES
+DEFAULT_WINDOW = 3
+
+
+def _trend_rows(group_column, subjects, window, outer_filter='', outer_params=()):
+    """
+    Run the trend query grouped by ``group_column`` (subject_id or
+    student_id) over the results of ``subjects``.
+
+    Ranks are taken within each period across every group in scope before
+    ``outer_filter`` narrows the rows returned.
+    """
+    connection = read_connection(Result)
+    table = connection.ops.quote_name(Result._meta.db_table)
+    subject_sql, subject_params = subjects.values('id').query.sql_with_params()
+    ordering = 'semester, exam_type'
+
+    sql = f"""
+        WITH periods AS (
+            SELECT {group_column} AS group_id, semester, exam_type,
+                   COUNT(*) AS result_count, AVG(marks_obtained) AS average_marks
+            FROM {table}
+            WHERE subject_id IN ({subject_sql})
+            GROUP BY {group_column}, semester, exam_type
+        ),
+        ranked AS (
+            SELECT periods.*,
+                   RANK() OVER (PARTITION BY semester, exam_type ORDER BY average_marks DESC) AS period_rank
+            FROM periods
+        ),
+        series AS (
+            SELECT group_id, semester, exam_type, result_count, average_marks,
+                   average_marks - LAG(average_marks) OVER w AS delta,
+                   AVG(average_marks) OVER (
+                       PARTITION BY group_id ORDER BY {ordering}
+                       ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW
+                   ) AS moving_average,
+                   period_rank,
+                   LAG(period_rank) OVER w - period_rank AS rank_change
+            FROM ranked
+            WINDOW w AS (PARTITION BY group_id ORDER BY {ordering})
+        )
+        SELECT group_id, semester, exam_type, result_count, average_marks, delta,
+               moving_average, period_rank, rank_change
+        FROM series
+        {outer_filter}
+        ORDER BY group_id, {ordering}
+    """
+    params = list(subject_params) + list(outer_params)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def _series(rows):
+    """Group flat query rows into ``{group_id: [point, ...]}``."""
+    semesters = Result._meta.get_field('semester')
+    exam_types = Result._meta.get_field('exam_type')
+    series = {}
+    for group_id, semester, exam_type, count, average, delta, moving, rank, rank_change in rows:
+        series.setdefault(group_id, []).append({
+            'semester': semesters.label_of(semester),
+            'exam_type': exam_types.label_of(exam_type),
+            'count': count,
+            'average_marks': _round(average),
+            'delta': _round(delta),
+            'moving_average': _round(moving),
+            'rank': rank,
+            'rank_change': rank_change,  # positive: moved up since the previous period
+        })
+    return series
+
+
+def subject_trends(subjects, window=DEFAULT_WINDOW):
+    """Per-subject average marks across periods, ranked among ``subjects``."""
+    names = {s['id']: s for s in subjects.values('id', 'code', 'name')}
+    series = _series(_trend_rows('subject_id', subjects, window))
+    return [
+        {'subject_id': subject_id, 'course_code': names[subject_id]['code'],
+         'course_name': names[subject_id]['name'], 'points': points}
+        for subject_id, points in sorted(series.items(), key=lambda item: names[item[0]]['code'])
+    ]
+
+
+def student_trend(student, subjects, window=DEFAULT_WINDOW):
+    """One student's average marks across periods, ranked within the cohort of ``subjects``."""
+    rows = _trend_rows('student_id', subjects, window, 'WHERE group_id = %s', [student.pk])
+    return {
+        'roll_no': student.roll_number,
+        'name': student.name,
+        'points': _series(rows).get(student.pk, []),
+    }
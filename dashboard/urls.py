@@ -18,8 +18,22 @@ urlpatterns = [
     # Results Dashboard
     path('results/', views.results_view, name='results'),
     path('api/results/template/', views.download_excel_template, name='download_excel_template'),
+    path('api/results/template/<int:subject_id>/', views.download_subject_template, name='download_subject_template'),
     path('api/results/upload/', views.upload_excel_results, name='upload_excel_results'),
+    path('api/results/upload/<int:job_id>/', views.upload_job_status, name='upload_job_status'),
+    path('api/results/validate/', views.validate_excel_results, name='validate_excel_results'),
     path('api/results/analytics/', views.results_analytics_api, name='results_analytics'),
+    path('api/results/analytics/cache/', views.analytics_cache_stats, name='analytics_cache_stats'),
+    path('api/db/pool/', views.database_pool_stats, name='database_pool_stats'),
+    path('api/results/distribution/', views.results_distribution_api, name='results_distribution'),
+    path('api/results/trends/', views.results_trends_api, name='results_trends'),
+    path('api/results/rankings/', views.results_rankings_api, name='results_rankings'),
+    path('api/results/gpa/', views.student_gpa_api, name='student_gpa'),
+    path('api/results/gpa/compute/', views.compute_gpa_api, name='compute_gpa'),
+    path('api/results/grades/', views.results_grades_api, name='results_grades'),
+    path('api/results/grades/regrade/', views.regrade_results_api, name='regrade_results'),
+    path('api/results/students/', views.student_results_api, name='student_results'),
+    path('api/results/export/', views.export_results, name='export_results'),
 
     # Subjectspage
     path('subjectspage/', views.subjectspage_view, name='subjectspage'),
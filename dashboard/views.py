@@ -3,16 +3,34 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.views.decorators.http import require_http_methods
-from django.db.models import Avg, Max, Min, Count
+from django.conf import settings
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, condition
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django.db import IntegrityError
 import logging
 
 logger = logging.getLogger(__name__)
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from .models import Faculty, Department, Subject, Student, Result, FacultySelection
+from .models import Faculty, Department, Subject, Student, Result, FacultySelection, ResultUploadJob, StudentGPA, GradeCutoff
+from .jobs import enqueue_upload, claim_job, run_job, job_payload
+from .analytics import (
+    STUDENT_RESULT_FIELDS, STUDENT_RESULT_SORTS, annotate_outcome, filter_student_results, results_analytics,
+    results_validator, student_result_row, student_result_rows,
+)
+from .analytics_cache import cache_stats, cached_analytics
+from .db_pool import pool_stats
+from .distribution import DEFAULT_BUCKETS, distribution
+from .gpa import compute_cohort_gpa
+from .exports import iter_rows, stream_csv, stream_export_json, stream_json, stream_xlsx
+from .pagination import CursorError, keyset_page
+from .rankings import DEFAULT_TOP, department_rankings, subject_rankings
+from .relative_grading import METHODS, regrade_stale
+from .routers import pin_to_primary, read_from_replica
+from .trends import DEFAULT_WINDOW, SEMESTER_ORDER, student_trend, subject_trends
+from .ingest import HeaderError, validate_upload
+from .workbooks import TEMPLATE_UPDATED, generic_template, generic_template_etag, subject_template
 
 from .forms import FacultyLoginForm, FacultySelectionForm
 
@@ -427,71 +445,61 @@ def co_po_mapping_view(request):
     return render(request, 'dashboard/coming_soon.html', {'title': 'CO-PO Mapping'})
 
 
+def _xlsx_response(data, filename, etag, last_modified=None):
+    response = HttpResponse(
+        data,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Cache, but revalidate every time so a new template version is picked up
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @login_required
 @require_http_methods(["GET"])
+@condition(
+    etag_func=lambda request: generic_template_etag(),
+    last_modified_func=lambda request: TEMPLATE_UPDATED,
+)
 def download_excel_template(request):
     """Download Excel template for results upload"""
     try:
-        # Create a new workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Results Template"
-        
-        # Define headers
-        headers = ['Roll No', 'Name', 'Course Code', 'Marks']
-        
-        # Style for headers
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center")
-        
-        # Add headers
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-        
-        # Add sample data
-        sample_data = [
-            ['21CS001', 'John Doe', 'CS201', 85],
-            ['21CS002', 'Jane Smith', 'CS201', 92],
-            ['21CS003', 'Bob Johnson', 'CS201', 78],
-            ['21CS004', 'Alice Brown', 'CS201', 65],
-            ['21CS005', 'Charlie Wilson', 'CS201', 88]
-        ]
-        
-        for row, data in enumerate(sample_data, 2):
-            for col, value in enumerate(data, 1):
-                ws.cell(row=row, column=col, value=value)
-        
-        # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 20)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Create response
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return _xlsx_response(
+            generic_template(), 'results_template.xlsx',
+            generic_template_etag(), TEMPLATE_UPDATED,
         )
-        response['Content-Disposition'] = 'attachment; filename="results_template.xlsx"'
-        
-        # Save workbook to response
-        wb.save(response)
-        return response
-        
     except Exception as e:
         return JsonResponse({'error': f'Error creating template: {str(e)}'}, status=500)
 
 
+@login_required
+@require_http_methods(["GET"])
+def download_subject_template(request, subject_id):
+    """Download a results template pre-filled with the subject's students"""
+    try:
+        faculty = Faculty.objects.get(user=request.user)
+    except Faculty.DoesNotExist:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    subject = get_object_or_404(Subject, id=subject_id)
+    if subject.faculty_id != faculty.id and subject.department_id != faculty.department_id:
+        return JsonResponse({'error': 'You do not have permission to access this subject.'}, status=403)
+    
+    try:
+        etag, data = subject_template(subject)
+    except Exception as e:
+        return JsonResponse({'error': f'Error creating template: {str(e)}'}, status=500)
+    
+    not_modified = get_conditional_response(request, etag=quote_etag(etag))
+    if not_modified is not None:
+        return not_modified
+    return _xlsx_response(data, f'results_template_{subject.code}.xlsx', etag)
+
+
 @login_required
 @require_http_methods(["POST"])
 def upload_excel_results(request):
@@ -506,98 +514,136 @@ def upload_excel_results(request):
     
     excel_file = request.FILES['excel_file']
     
+    # Parsing happens in the process_result_uploads worker pool; the request
+    # only stores the file. Large workbooks (or mode=stream) are read row by
+    # row in read-only mode so worker memory stays bounded by the batch size.
+    # A byte-identical re-upload for the same subject scope returns the
+    # earlier job instead of queueing another one, as long as that job is
+    # still queued or running, or applied cleanly and its marks still hold.
     try:
-        # Read Excel file using openpyxl
-        from openpyxl import load_workbook
-        wb = load_workbook(excel_file)
-        ws = wb.active
-        
-        # Get headers from first row
-        headers = []
-        for cell in ws[1]:
-            headers.append(cell.value)
-        
-        # Validate headers
-        required_headers = ['Roll No', 'Name', 'Course Code', 'Marks']
-        if not all(header in headers for header in required_headers):
-            return JsonResponse({
-                'error': f'Excel file must contain columns: {", ".join(required_headers)}'
-            }, status=400)
-        
-        # Get column indices
-        roll_no_idx = headers.index('Roll No')
-        name_idx = headers.index('Name')
-        course_code_idx = headers.index('Course Code')
-        marks_idx = headers.index('Marks')
-        
-        # Process data
-        created_count = 0
-        updated_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
-            try:
-                roll_no = str(row[roll_no_idx]).strip() if row[roll_no_idx] else None
-                name = str(row[name_idx]).strip() if row[name_idx] else None
-                course_code = str(row[course_code_idx]).strip() if row[course_code_idx] else None
-                marks = int(row[marks_idx]) if row[marks_idx] else None
-                
-                if not all([roll_no, name, course_code, marks is not None]):
-                    errors.append(f'Row {row_num}: Missing required data')
-                    continue
-                
-                # Get or create student
-                student, student_created = Student.objects.get_or_create(
-                    roll_number=roll_no,
-                    defaults={
-                        'name': name,
-                        'department': faculty.department,
-                        'year': 2,  # Default year, can be made dynamic
-                        'scheme': 'R19-20'  # Default scheme
-                    }
-                )
-                
-                # Get subject
-                try:
-                    subject = Subject.objects.get(code=course_code)
-                except Subject.DoesNotExist:
-                    errors.append(f'Row {row_num}: Course code "{course_code}" not found')
-                    continue
-                
-                # Create or update result
-                result, result_created = Result.objects.get_or_create(
-                    student=student,
-                    subject=subject,
-                    exam_type='Mid Term',
-                    semester='1st',
-                    defaults={'marks_obtained': marks}
-                )
-                
-                if not result_created:
-                    result.marks_obtained = marks
-                    result.save()
-                    updated_count += 1
-                else:
-                    created_count += 1
-                    
-            except Exception as e:
-                errors.append(f'Row {row_num}: {str(e)}')
-                continue
-        
-        return JsonResponse({
-            'success': True,
-            'message': f'Successfully processed {created_count} new results and updated {updated_count} existing results.',
-            'created': created_count,
-            'updated': updated_count,
-            'errors': errors[:10]  # Limit errors to first 10
-        })
-        
+        job, duplicate = enqueue_upload(
+            faculty, excel_file, request.POST.get('mode'),
+            subject_id=request.session.get('selected_subject'),
+        )
+    except Exception as e:
+        return JsonResponse({'error': f'Error storing Excel file: {str(e)}'}, status=400)
+    
+    if not duplicate and settings.RESULTS_UPLOAD_INLINE and claim_job(job, 'inline'):
+        run_job(job)
+    
+    response_data = job_payload(job)
+    response_data['success'] = True
+    response_data['duplicate'] = duplicate
+    response_data['status_url'] = reverse('upload_job_status', args=[job.pk])
+    return JsonResponse(response_data, status=200 if duplicate else 202)
+
+
+@login_required
+@require_http_methods(["POST"])
+def validate_excel_results(request):
+    """Dry run: report every problem in an upload without saving anything"""
+    try:
+        Faculty.objects.get(user=request.user)
+    except Faculty.DoesNotExist:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    if 'excel_file' not in request.FILES:
+        return JsonResponse({'error': 'No file uploaded.'}, status=400)
+    
+    excel_file = request.FILES['excel_file']
+    try:
+        return JsonResponse(validate_upload(excel_file, excel_file.name))
+    except HeaderError as e:
+        return JsonResponse({'error': str(e)}, status=400)
     except Exception as e:
-        return JsonResponse({'error': f'Error processing Excel file: {str(e)}'}, status=400)
+        return JsonResponse({'error': f'Error processing file: {str(e)}'}, status=400)
 
 
 @login_required
 @require_http_methods(["GET"])
+def upload_job_status(request, job_id):
+    """Progress and final summary of a queued results upload"""
+    try:
+        faculty = Faculty.objects.get(user=request.user)
+    except Faculty.DoesNotExist:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    job = ResultUploadJob.objects.filter(pk=job_id, faculty=faculty).first()
+    if job is None:
+        return JsonResponse({'error': 'Upload job not found.'}, status=404)
+
+    # The worker wrote the results; keep the dashboard that follows on the primary
+    if job.finished_at:
+        pin_to_primary(request, since=job.finished_at)
+
+    return JsonResponse(job_payload(job))
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+def export_results(request):
+    """Stream the results in scope as CSV (default) or xlsx"""
+    try:
+        faculty = Faculty.objects.get(user=request.user)
+    except Faculty.DoesNotExist:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx', 'json'):
+        return JsonResponse({'error': 'Export format must be csv, xlsx or json.'}, status=400)
+    
+    # Same scope as the analytics: the selected subject, else the department
+    selected_subject_id = request.session.get('selected_subject')
+    subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id
+               else Subject.objects.filter(department=faculty.department))
+    # Bound to the read database now: the stream is consumed after the view returns
+    results = Result.objects.filter(subject__in=subjects)
+    results = results.using(results.db)
+    
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(results),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    elif export_format == 'json':
+        response = StreamingHttpResponse(stream_export_json(results), content_type='application/json')
+    else:
+        response = StreamingHttpResponse(stream_csv(results), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="results_export.{export_format}"'
+    return response
+
+
+def _conditional_results(request, faculty, selected_subject_id, subjects, render):
+    """
+    Answer with 304 Not Modified when the client's validator still matches
+    the results of ``subjects``; otherwise build the response with
+    ``render(etag)``.
+    """
+    # The faculty and its department decide which subjects are shown
+    scope = f'f{faculty.pk}-d{faculty.department_id}'
+    if selected_subject_id:
+        scope += f'-s{selected_subject_id}'
+    etag, last_modified = results_validator(subjects, scope)
+    response = get_conditional_response(
+        request,
+        etag=quote_etag(etag),
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is None:
+        response = render(etag)
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # The scope comes from the session, so revalidate on every load
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
 def results_analytics_api(request):
     """Get comprehensive results analytics"""
     try:
@@ -612,69 +658,403 @@ def results_analytics_api(request):
         # Get selected subject or all subjects for the faculty's department
         selected_subject_id = request.session.get('selected_subject')
         subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id 
-                   else Subject.objects.filter(department=faculty.department))
+                   else Subject.objects.filter(department_id=faculty.department_id))
         
-        if not subjects.exists():
-            return JsonResponse({
-                'total_students': 0,
-                'pass_count': 0,
-                'fail_count': 0,
-                'average_marks': 0,
-                'highest_marks': 0,
-                'lowest_marks': 0,
-                'per_course_breakdown': [],
-                'student_results': []
-            })
-            
-        # Get results for the selected subjects
-        results = Result.objects.filter(subject__in=subjects).select_related('student', 'subject')
+        # Totals come from the per-subject summaries; the student list itself
+        # is paged by student_results_api. Repeat loads are served from the
+        # cache until a write changes the results or bumps the version of a
+        # subject in scope.
+        def render(etag):
+            subject_ids = [selected_subject_id] if selected_subject_id else list(subjects.values_list('id', flat=True))
+            response_data, hit = cached_analytics(
+                faculty, selected_subject_id, subject_ids, etag, lambda: results_analytics(subjects)
+            )
+            response = JsonResponse(response_data)
+            response['X-Analytics-Cache'] = 'hit' if hit else 'miss'
+            return response
         
-        if not results.exists():
-            return JsonResponse({
-                'total_students': 0,
-                'pass_count': 0,
-                'fail_count': 0,
-                'average_marks': 0,
-                'highest_marks': 0,
-                'lowest_marks': 0,
-                'per_course_breakdown': [],
-                'student_results': []
-            })
-            
-        # Calculate overall statistics
-        total_students = results.count()
-        pass_count = results.filter(marks_obtained__gte=40).count()
+        # An unchanged dashboard costs one query over the summaries and no body
+        return _conditional_results(request, faculty, selected_subject_id, subjects, render)
         
-        # Get aggregates
-        aggregates = results.aggregate(
-            avg=Avg('marks_obtained'),
-            max=Max('marks_obtained'),
-            min=Min('marks_obtained')
+    except Exception as e:
+        logger.error(f"Error in results_analytics_api: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'An error occurred while processing your request.'}, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def analytics_cache_stats(request):
+    """Hit/miss counters of the analytics cache"""
+    return JsonResponse(cache_stats())
+
+
+@login_required
+@require_http_methods(["GET"])
+def database_pool_stats(request):
+    """Wait-time and utilisation counters of this process's database connection pools"""
+    return JsonResponse({'pooled': bool(settings.DB_POOL), 'pools': pool_stats()})
+
+
+def _int_param(request, name, default=None):
+    value = request.GET.get(name, '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be a whole number.')
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+def results_distribution_api(request):
+    """
+    Histogram, quartiles, median, standard deviation and top/bottom decile
+    of the marks, per subject and for the whole scope. Optional query
+    parameters: ``buckets`` (1-100, default 10), ``exam_type``, ``semester``.
+    """
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    try:
+        buckets = _int_param(request, 'buckets', DEFAULT_BUCKETS)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not 1 <= buckets <= 100:
+        return JsonResponse({'error': 'buckets must be between 1 and 100.'}, status=400)
+    
+    # Same scope as the analytics: the selected subject, else the department
+    selected_subject_id = request.session.get('selected_subject')
+    subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id
+               else Subject.objects.filter(department=faculty.department))
+    return _conditional_results(
+        request, faculty, selected_subject_id, subjects,
+        lambda etag: JsonResponse(distribution(
+            subjects,
+            buckets=buckets,
+            exam_type=request.GET.get('exam_type', '').strip() or None,
+            semester=request.GET.get('semester', '').strip() or None,
+        )),
+    )
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+def results_trends_api(request):
+    """
+    Marks series across semesters and exam types with deltas, moving
+    averages and rank changes. ``group=subject`` (default) returns every
+    subject in scope; ``group=student&roll_no=...`` one student against
+    their cohort. ``window`` sets the moving-average width (default 3).
+    """
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    group = request.GET.get('group', 'subject')
+    if group not in ('subject', 'student'):
+        return JsonResponse({'error': 'group must be subject or student.'}, status=400)
+    try:
+        window = _int_param(request, 'window', DEFAULT_WINDOW)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not 1 <= window <= 12:
+        return JsonResponse({'error': 'window must be between 1 and 12.'}, status=400)
+    
+    student = None
+    if group == 'student':
+        roll_no = request.GET.get('roll_no', '').strip()
+        if not roll_no:
+            return JsonResponse({'error': 'roll_no is required for student trends.'}, status=400)
+        student = Student.objects.filter(roll_number=roll_no).first()
+        if student is None:
+            return JsonResponse({'error': f'Student "{roll_no}" not found.'}, status=404)
+    
+    # Same scope as the analytics: the selected subject, else the department
+    selected_subject_id = request.session.get('selected_subject')
+    subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id
+               else Subject.objects.filter(department=faculty.department))
+    
+    def render(etag):
+        if student is not None:
+            return JsonResponse({'group': group, 'window': window, 'student': student_trend(student, subjects, window)})
+        return JsonResponse({'group': group, 'window': window, 'subjects': subject_trends(subjects, window)})
+    
+    return _conditional_results(request, faculty, selected_subject_id, subjects, render)
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+def results_rankings_api(request):
+    """
+    Ranks computed by the database. ``by=subject`` (default) ranks results
+    within each subject and exam; ``by=department`` ranks students by their
+    aggregate percentage within each year. Returns the top ``top`` ranks
+    (default 10), or with ``roll_no`` that student's ranks. Optional
+    ``exam_type`` and ``semester`` filters.
+    """
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    by = request.GET.get('by', 'subject')
+    if by not in ('subject', 'department'):
+        return JsonResponse({'error': 'by must be subject or department.'}, status=400)
+    try:
+        top = _int_param(request, 'top', DEFAULT_TOP)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not 1 <= top <= 500:
+        return JsonResponse({'error': 'top must be between 1 and 500.'}, status=400)
+    
+    student_id = None
+    roll_no = request.GET.get('roll_no', '').strip()
+    if roll_no:
+        student_id = Student.objects.filter(roll_number=roll_no).values_list('id', flat=True).first()
+        if student_id is None:
+            return JsonResponse({'error': f'Student "{roll_no}" not found.'}, status=404)
+    
+    # Same scope as the analytics: the selected subject, else the department
+    selected_subject_id = request.session.get('selected_subject')
+    subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id
+               else Subject.objects.filter(department=faculty.department))
+    rank = subject_rankings if by == 'subject' else department_rankings
+    
+    def render(etag):
+        rows = rank(
+            subjects, top=top, student_id=student_id,
+            exam_type=request.GET.get('exam_type', '').strip() or None,
+            semester=request.GET.get('semester', '').strip() or None,
         )
-        
-        # Prepare response
-        response_data = {
-            'total_students': total_students,
-            'pass_count': pass_count,
-            'fail_count': total_students - pass_count,
-            'average_marks': round(aggregates['avg'], 2) if aggregates['avg'] is not None else 0,
-            'highest_marks': aggregates['max'] if aggregates['max'] is not None else 0,
-            'lowest_marks': aggregates['min'] if aggregates['min'] is not None else 0,
-            'pass_percentage': round((pass_count / total_students) * 100, 2) if total_students > 0 else 0,
-            'per_course_breakdown': [],
-            'student_results': [{
-                'roll_no': r.student.roll_number,
-                'name': r.student.name,
-                'course_code': r.subject.code,
-                'course_name': r.subject.name,
-                'marks': r.marks_obtained,
-                'status': 'Pass' if r.marks_obtained >= 40 else 'Fail',
-                'percentage': r.percentage
-            } for r in results]
+        return JsonResponse({'by': by, 'top': None if roll_no else top, 'rankings': rows})
+    
+    return _conditional_results(request, faculty, selected_subject_id, subjects, render)
+
+
+def _gpa_row(gpa):
+    return {
+        'semester': gpa.semester,
+        'credits': gpa.credits,
+        'credit_points': gpa.credit_points,
+        'sgpa': gpa.sgpa,
+        'cumulative_credits': gpa.cumulative_credits,
+        'cgpa': gpa.cgpa,
+        'computed_at': gpa.computed_at.isoformat(),
+    }
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+def student_gpa_api(request):
+    """
+    Stored SGPA/CGPA. ``roll_no`` returns one student's transcript; otherwise
+    ``year`` and ``scheme`` (optionally ``semester``) list the cohort of the
+    faculty's department.
+    """
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    gpas = StudentGPA.objects.filter(student__department=faculty.department).select_related('student')
+    roll_no = request.GET.get('roll_no', '').strip()
+    if roll_no:
+        student = Student.objects.filter(roll_number=roll_no, department=faculty.department).first()
+        if student is None:
+            return JsonResponse({'error': f'Student "{roll_no}" not found.'}, status=404)
+        semesters = sorted(
+            (_gpa_row(gpa) for gpa in gpas.filter(student=student)),
+            key=lambda row: (
+                SEMESTER_ORDER.index(row['semester']) if row['semester'] in SEMESTER_ORDER else len(SEMESTER_ORDER),
+                row['semester'],
+            ),
+        )
+        return JsonResponse({
+            'roll_no': student.roll_number,
+            'name': student.name,
+            'semesters': semesters,
+            'cgpa': semesters[-1]['cgpa'] if semesters else None,
+        })
+    
+    try:
+        year = _int_param(request, 'year')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    scheme = request.GET.get('scheme', '').strip()
+    if year is None or not scheme:
+        return JsonResponse({'error': 'Pass roll_no, or year and scheme.'}, status=400)
+    gpas = gpas.filter(student__year=year, student__scheme=scheme)
+    semester = request.GET.get('semester', '').strip()
+    if semester:
+        gpas = gpas.filter(semester=semester)
+    return JsonResponse({'students': [
+        {'roll_no': gpa.student.roll_number, 'name': gpa.student.name, **_gpa_row(gpa)}
+        for gpa in gpas.order_by('student__roll_number', 'cumulative_credits')
+    ]})
+
+
+@login_required
+@require_http_methods(["POST"])
+def compute_gpa_api(request):
+    """Recompute SGPA/CGPA for a year and scheme of the faculty's department"""
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    try:
+        year = int(request.POST.get('year', ''))
+    except ValueError:
+        return JsonResponse({'error': 'year must be a whole number.'}, status=400)
+    scheme = request.POST.get('scheme', '').strip()
+    if scheme not in dict(Subject.SCHEME_CHOICES):
+        return JsonResponse({'error': 'Unknown scheme.'}, status=400)
+    # Stored GPAs have no exam type: they always count the latest exam of
+    # every subject, and one exam's figures must not replace them
+    if request.POST.get('exam_type', '').strip():
+        return JsonResponse({'error': 'Stored GPAs count the latest exam of every subject; '
+                                      'exam_type is not supported.'}, status=400)
+    
+    try:
+        count = compute_cohort_gpa(faculty.department_id, year, scheme)
+    except Exception as e:
+        logger.error(f"Error computing GPA: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'An error occurred while computing GPA.'}, status=500)
+    return JsonResponse({'success': True, 'semester_records': count})
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+def results_grades_api(request):
+    """Stored relative-grading cut-offs and grade counts of the selected subject or department"""
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    selected_subject_id = request.session.get('selected_subject')
+    subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id
+               else Subject.objects.filter(department=faculty.department))
+    cutoffs = GradeCutoff.objects.filter(subject__in=subjects).select_related('subject')
+    exam_type = request.GET.get('exam_type', '').strip()
+    if exam_type:
+        cutoffs = cutoffs.filter(exam_type=exam_type)
+    semester = request.GET.get('semester', '').strip()
+    if semester:
+        cutoffs = cutoffs.filter(semester=semester)
+    
+    return JsonResponse({'grades': [
+        {
+            'course_code': cutoff.subject.code,
+            'course_name': cutoff.subject.name,
+            'exam_type': cutoff.exam_type,
+            'semester': cutoff.semester,
+            'method': cutoff.method,
+            'cutoffs': [{'grade': letter, 'min_marks': minimum} for letter, minimum in cutoff.cutoffs],
+            'grade_counts': cutoff.grade_counts,
+            'mean': cutoff.mean,
+            'std_dev': cutoff.std_dev,
+            'computed_at': cutoff.computed_at.isoformat(),
         }
-        
-        return JsonResponse(response_data)
-        
+        for cutoff in cutoffs.order_by('subject__code', 'semester', 'exam_type')
+    ]})
+
+
+@login_required
+@require_http_methods(["POST"])
+def regrade_results_api(request):
+    """Regrade the relatively graded subjects in scope, with ``method`` percentile or sd"""
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    method = request.POST.get('method', '').strip() or None
+    if method is not None and method not in METHODS:
+        return JsonResponse({'error': f"method must be one of {', '.join(METHODS)}."}, status=400)
+    
+    selected_subject_id = request.session.get('selected_subject')
+    subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id
+               else Subject.objects.filter(department=faculty.department))
+    try:
+        regraded = regrade_stale(list(subjects.values_list('id', flat=True)), method=method, force=True)
     except Exception as e:
-        logger.error(f"Error in results_analytics_api: {str(e)}", exc_info=True)
-        return JsonResponse({'error': 'An error occurred while processing your request.'}, status=500)
\ No newline at end of file
+        logger.error(f"Error regrading results: {str(e)}", exc_info=True)
+        return JsonResponse({'error': 'An error occurred while regrading results.'}, status=500)
+    return JsonResponse({'success': True, 'regraded': regraded})
+
+
+STUDENT_RESULTS_PAGE_SIZE = 50
+STUDENT_RESULTS_MAX_PAGE_SIZE = 500
+
+
+@login_required
+@require_http_methods(["GET"])
+@read_from_replica
+def student_results_api(request):
+    """
+    One page of the student results behind the analytics dashboard.
+
+    Query parameters: ``sort`` (roll_no, course or marks; prefix ``-`` for
+    descending), ``status`` (pass/fail), ``course_code``, ``min_marks``,
+    ``max_marks``, ``roll_prefix``, ``limit`` and ``cursor``, the
+    ``next_cursor`` returned with the previous page. With ``stream=1``
+    every matching row is streamed as one JSON document instead.
+    """
+    faculty = Faculty.objects.filter(user=request.user).first()
+    if not faculty:
+        return JsonResponse({'error': 'Faculty profile not found.'}, status=400)
+    
+    sort = request.GET.get('sort', 'roll_no')
+    fields = STUDENT_RESULT_SORTS.get(sort.lstrip('-'))
+    if fields is None:
+        return JsonResponse({'error': f'Unknown sort "{sort}".'}, status=400)
+    status = request.GET.get('status', '').lower() or None
+    if status not in (None, 'pass', 'fail'):
+        return JsonResponse({'error': 'Status must be pass or fail.'}, status=400)
+    try:
+        limit = _int_param(request, 'limit', STUDENT_RESULTS_PAGE_SIZE)
+        min_marks = _int_param(request, 'min_marks')
+        max_marks = _int_param(request, 'max_marks')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    limit = max(1, min(limit, STUDENT_RESULTS_MAX_PAGE_SIZE))
+    
+    # Same scope as the analytics: the selected subject, else the department
+    selected_subject_id = request.session.get('selected_subject')
+    subjects = (Subject.objects.filter(id=selected_subject_id) if selected_subject_id
+               else Subject.objects.filter(department=faculty.department))
+    # Bound to the read database now, as the stream=1 response is consumed later
+    results = Result.objects.filter(subject__in=subjects)
+    results = annotate_outcome(filter_student_results(
+        results.using(results.db),
+        status=status,
+        course_code=request.GET.get('course_code', '').strip(),
+        min_marks=min_marks,
+        max_marks=max_marks,
+        roll_prefix=request.GET.get('roll_prefix', '').strip(),
+    ))
+    
+    if request.GET.get('stream') in ('1', 'true'):
+        ordering = [f'-{field}' if sort.startswith('-') else field for field in fields]
+        rows = iter_rows(results.order_by(*ordering).values_list(*STUDENT_RESULT_FIELDS))
+        return StreamingHttpResponse(
+            stream_json(student_result_rows(rows), extra={'next_cursor': None, 'has_more': False}),
+            content_type='application/json',
+        )
+    
+    results = results.values(*STUDENT_RESULT_FIELDS)
+    try:
+        rows, next_cursor = keyset_page(
+            results, fields, limit, cursor=request.GET.get('cursor'), descending=sort.startswith('-')
+        )
+    except CursorError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'results': [student_result_row(row) for row in rows],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+    })
@@ -0,0 +1,113 @@
+"""
+Pre-built xlsx templates for results uploads.
+
+The generic template never changes between releases, so its bytes are built
+once per ``TEMPLATE_VERSION`` and kept in process memory. Per-subject
+templates are pre-filled with the subject's roster and cached under a hash of
+that roster, so they are rebuilt only when a student joins, leaves or is
+renamed.
+"""
+import hashlib
+import io
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Q
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from .ingest import REQUIRED_HEADERS
+from .models import Student
+
+# Bump when the layout or sample rows below change; browsers revalidate on it.
+TEMPLATE_VERSION = 1
+TEMPLATE_UPDATED = datetime(2026, 10, 17, tzinfo=dt_timezone.utc)
+
+SAMPLE_ROWS = [
+    ['21CS001', 'John Doe', 'CS201', 85],
+    ['21CS002', 'Jane Smith', 'CS201', 92],
+    ['21CS003', 'Bob Johnson', 'CS201', 78],
+    ['21CS004', 'Alice Brown', 'CS201', 65],
+    ['21CS005', 'Charlie Wilson', 'CS201', 88],
+]
+
+SUBJECT_TEMPLATE_TIMEOUT = 24 * 60 * 60
+
+_template_bytes = {}
+
+
+def build_template(rows):
+    """Render the styled results template with ``rows`` under the header."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Results Template")
+
+    # Column widths are derived from the data up front; write-only sheets
+    # cannot be scanned after the fact.
+    for col, header in enumerate(REQUIRED_HEADERS):
+        max_length = max([len(str(header))] + [len(str(row[col])) for row in rows if row[col] is not None])
+        ws.column_dimensions[chr(ord('A') + col)].width = min(max_length + 2, 20)
+
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    header_cells = []
+    for header in REQUIRED_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    for row in rows:
+        ws.append(row)
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def generic_template():
+    """Bytes of the sample template for the current ``TEMPLATE_VERSION``."""
+    if TEMPLATE_VERSION not in _template_bytes:
+        _template_bytes[TEMPLATE_VERSION] = build_template(SAMPLE_ROWS)
+    return _template_bytes[TEMPLATE_VERSION]
+
+
+def generic_template_etag():
+    return f'results-template-v{TEMPLATE_VERSION}'
+
+
+def subject_roster(subject):
+    """
+    Students expected in ``subject``: everyone in its department, year and
+    scheme, plus anyone who already has a result recorded for it.
+    """
+    return list(
+        Student.objects.filter(
+            Q(department_id=subject.department_id, year=subject.year, scheme=subject.scheme)
+            | Q(result__subject=subject)
+        ).distinct().order_by('roll_number').values_list('roll_number', 'name')
+    )
+
+
+def subject_template(subject):
+    """
+    Return ``(etag, bytes)`` of a template pre-filled with the subject roster.
+
+    Marks are left blank for faculty to fill in.
+    """
+    roster = subject_roster(subject)
+    digest = hashlib.sha1()
+    digest.update(f'v{TEMPLATE_VERSION}:{subject.pk}:{subject.code}'.encode())
+    for roll_number, name in roster:
+        digest.update(f'\x1e{roll_number}\x1f{name}'.encode())
+    etag = f'results-template-{subject.pk}-{digest.hexdigest()}'
+
+    key = f'dashboard:{etag}'
+    data = cache.get(key)
+    if data is None:
+        data = build_template([[roll_number, name, subject.code, None] for roll_number, name in roster])
+        cache.set(key, data, SUBJECT_TEMPLATE_TIMEOUT)
+    return etag, data
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
 try:
     import dj_database_url  # type: ignore
@@ -95,6 +95,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'dashboard.routers.PrimaryAfterWriteMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_browser_reload.middleware.BrowserReloadMiddleware',
@@ -166,6 +167,82 @@ else:
         'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', cast=int, default=60),
     }
 
+# The covering index on Result INCLUDEs columns that only PostgreSQL stores;
+# other backends build it on the key columns alone, which is intended
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+# Optional read replica for analytics, exports and reports (dashboard.routers).
+# Tests run the replica alias against the default test database.
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default=None)
+if DATABASE_REPLICA_URL and dj_database_url:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=config('DB_CONN_MAX_AGE', cast=int, default=60)
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['dashboard.routers.ReplicaRouter']
+# Seconds a session reads from the primary after it writes; cover the replication lag
+DATABASE_REPLICA_LAG = config('DATABASE_REPLICA_LAG', cast=int, default=30)
+
+# Optional psycopg3 connection pool for the PostgreSQL databases (needs
+# psycopg[pool]). Threads borrow an open connection instead of each paying a
+# TLS and auth handshake; pooled connections replace persistent ones, so
+# CONN_MAX_AGE is 0 while it is on. Usage counters: /api/db/pool/.
+DB_POOL = _get_bool('DB_POOL', False)
+DB_POOL_OPTIONS = {
+    'min_size': config('DB_POOL_MIN_SIZE', cast=int, default=2),
+    'max_size': config('DB_POOL_MAX_SIZE', cast=int, default=10),
+    # Seconds a request waits for a free connection before it fails
+    'timeout': config('DB_POOL_TIMEOUT', cast=float, default=10.0),
+    # Seconds before a connection is replaced, and before an idle one above min_size is closed
+    'max_lifetime': config('DB_POOL_MAX_LIFETIME', cast=float, default=30 * 60.0),
+    'max_idle': config('DB_POOL_MAX_IDLE', cast=float, default=5 * 60.0),
+}
+if DB_POOL:
+    for database in DATABASES.values():
+        if database['ENGINE'] == 'django.db.backends.postgresql':
+            database['OPTIONS'] = {**database.get('OPTIONS', {}), 'pool': dict(DB_POOL_OPTIONS)}
+            database['CONN_MAX_AGE'] = 0
+
+
+# Results upload tuning
+# Rows are written in batches of RESULTS_UPLOAD_BATCH_SIZE; workbooks at or
+# above RESULTS_UPLOAD_STREAMING_THRESHOLD bytes are parsed in read-only mode.
+RESULTS_UPLOAD_BATCH_SIZE = config('RESULTS_UPLOAD_BATCH_SIZE', cast=int, default=1000)
+RESULTS_UPLOAD_STREAMING_THRESHOLD = config('RESULTS_UPLOAD_STREAMING_THRESHOLD', cast=int, default=5 * 1024 * 1024)
+# Worker processes used to parse multi-sheet workbooks (mode=sheets); 0 = CPU count
+RESULTS_UPLOAD_SHEET_WORKERS = config('RESULTS_UPLOAD_SHEET_WORKERS', cast=int, default=0)
+# Uploads are queued for `manage.py process_result_uploads`; set this to
+# process them inside the request instead (handy without a worker running).
+RESULTS_UPLOAD_INLINE = _get_bool('RESULTS_UPLOAD_INLINE', default=False)
+# A running job without progress for this many seconds is taken to have lost
+# its worker and is requeued, up to RESULTS_UPLOAD_MAX_ATTEMPTS runs in all
+RESULTS_UPLOAD_JOB_TIMEOUT = config('RESULTS_UPLOAD_JOB_TIMEOUT', cast=int, default=15 * 60)
+RESULTS_UPLOAD_MAX_ATTEMPTS = config('RESULTS_UPLOAD_MAX_ATTEMPTS', cast=int, default=3)
+
+
+# Cache
+# Local memory by default. Set DJANGO_CACHE_DIR to use the file-based cache,
+# which upload workers running in separate processes share with the web
+# server, so their writes invalidate the cached analytics straight away.
+DJANGO_CACHE_DIR = config('DJANGO_CACHE_DIR', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': DJANGO_CACHE_DIR,
+    } if DJANGO_CACHE_DIR else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Upper bound on how long an analytics payload is served without a write
+ANALYTICS_CACHE_TIMEOUT = config('ANALYTICS_CACHE_TIMEOUT', cast=int, default=60 * 60)
+
+# Academic terms start on the first day of these months; every result
+# records the term it was entered in (see dashboard.terms)
+RESULT_TERM_START_MONTHS = config('RESULT_TERM_START_MONTHS', cast=Csv(int), default='1,7')
+# Upcoming terms manage.py result_partitions keeps partitions ready for
+RESULT_PARTITIONS_AHEAD = config('RESULT_PARTITIONS_AHEAD', cast=int, default=2)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators